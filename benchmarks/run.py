@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runs the benchmark scenarios and compares the results with a stored baseline.
+
+For every scenario we measure, each in a fresh subprocess:
+
+* generation: wall time and peak memory of "build.py ninja"
+* the size of the generated Ninja file
+* no-op: wall time of running Ninja again after a complete build
+
+The "startup" pseudo-scenario measures the time it takes to import the modules every build script
+imports. It fails if that takes longer than ``--startup-budget`` or if any of :data:`LAZY_MODULES`
+are imported, because Python startup is a big part of every Ninja-driven regeneration.
+
+Times are the best of ``--repeat`` runs. Run from the repository root, for example::
+
+    python -m benchmarks --sources 10000 --save-baseline
+    python -m benchmarks --sources 10000
+
+The second run exits with a non-zero code if any result is worse than the baseline by more than
+``--threshold``.
+"""
+
+from __future__ import unicode_literals
+from .scenarios import SCENARIOS, TOOLS
+from subprocess import Popen, STDOUT
+import sys, os, io, json, glob, time, shutil, tempfile, argparse, errno
+
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub.py')
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     'baseline.json')
+
+DEFAULT_SOURCES = 1000
+DEFAULT_DEPTH = 100
+DEFAULT_EXTENSIONS = 20
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+DEFAULT_STARTUP_BUDGET = 0.1
+
+STARTUP = 'startup'
+
+STARTUP_MODULES = ('ronin.cli', 'ronin.contexts', 'ronin.phases', 'ronin.projects',
+                   'ronin.utils.paths', 'ronin.gcc', 'ronin.vala')
+
+LAZY_MODULES = ('blessings', 'colorama', 'inspect', 'multiprocessing', 'sqlite3', 'urllib.request',
+                'http.client', 'ronin.critical_path', 'ronin.launcher', 'ronin.resources')
+"""
+Modules that must not be imported by :data:`STARTUP_MODULES`.
+"""
+
+METRICS = (
+    ('import_time', 'import', 's'),
+    ('generation_time', 'generation', 's'),
+    ('generation_max_rss', 'peak memory', 'B'),
+    ('manifest_size', 'Ninja file', 'B'),
+    ('noop_time', 'no-op', 's'))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Rōnin generation and no-op benchmarks')
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help='scenarios to run (defaults to all: {}, {})'.format(
+                            STARTUP, ', '.join(v[0] for v in SCENARIOS)))
+    parser.add_argument('--sources', type=int, default=DEFAULT_SOURCES, metavar='N',
+                        help='number of source files, e.g. 1000, 10000 or 100000 (default: '
+                             '%(default)s)')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, metavar='N',
+                        help='length of the "inputs_from" chain (default: %(default)s)')
+    parser.add_argument('--extensions', type=int, default=DEFAULT_EXTENSIONS, metavar='N',
+                        help='number of extensions per phase (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, metavar='N',
+                        help='runs per measurement, keeping the best (default: %(default)s)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, metavar='PATH',
+                        help='baseline results file (default: benchmarks/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, metavar='N',
+                        help='relative change counted as a regression (default: %(default)s)')
+    parser.add_argument('--startup-budget', type=float, default=DEFAULT_STARTUP_BUDGET,
+                        metavar='SECONDS',
+                        help='longest acceptable import time of the "{}" scenario (default: '
+                             '%(default)s)'.format(STARTUP))
+    parser.add_argument('--ninja', default='ninja', metavar='PATH',
+                        help='Ninja command (default: %(default)s)')
+    parser.add_argument('--work-path', metavar='PATH',
+                        help='where to generate projects (defaults to a temporary directory, '
+                             'which is deleted afterwards)')
+    args = parser.parse_args(args)
+
+    scenarios = [v for v in SCENARIOS if (not args.scenarios) or (v[0] in args.scenarios)]
+    unknown = set(args.scenarios) - set(v[0] for v in SCENARIOS) - set([STARTUP])
+    if unknown:
+        parser.error('unknown scenarios: {}'.format(', '.join(sorted(unknown))))
+
+    work_path = args.work_path or tempfile.mkdtemp(prefix='ronin-benchmarks-')
+    try:
+        tools = _write_tools(os.path.join(work_path, 'bin'))
+        results = {}
+        if (not args.scenarios) or (STARTUP in args.scenarios):
+            sys.stdout.write('{}...\n'.format(STARTUP))
+            sys.stdout.flush()
+            results[STARTUP] = run_startup(work_path, args.repeat, args.startup_budget)
+        for name, write in scenarios:
+            path = os.path.join(work_path, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            write(path, tools, sources=args.sources, depth=args.depth,
+                  extensions=args.extensions)
+            sys.stdout.write('{}...\n'.format(name))
+            sys.stdout.flush()
+            results[name] = run_scenario(path, args.ninja, args.repeat)
+    finally:
+        if not args.work_path:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    results = {
+        'parameters': {
+            'sources': args.sources,
+            'depth': args.depth,
+            'extensions': args.extensions},
+        'python': sys.version.split()[0],
+        'scenarios': results}
+
+    baseline = None
+    if os.path.isfile(args.baseline):
+        with io.open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != results['parameters']:
+            sys.stdout.write('Baseline was measured with different parameters; not comparing\n')
+            baseline = None
+
+    regressions = write_results(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with io.open(args.baseline, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(results, indent=2, sort_keys=True, ensure_ascii=False))
+            f.write('\n')
+        sys.stdout.write('Baseline saved to: {}\n'.format(args.baseline))
+        return 0
+
+    return 1 if regressions else 0
+
+
+def run_startup(path, repeat, budget=DEFAULT_STARTUP_BUDGET):
+    """
+    Measures the import time of :data:`STARTUP_MODULES`.
+
+    :param path: working directory
+    :type path: str
+    :param repeat: runs per measurement
+    :type repeat: int
+    :param budget: longest acceptable import time in seconds
+    :type budget: float
+    :returns: results
+    :rtype: dict
+    :raises RuntimeError: if any of :data:`LAZY_MODULES` were imported, or if the import time is
+     over budget
+    """
+
+    script = \
+        'import sys, time\n' \
+        'start = time.time()\n' \
+        'import {}\n' \
+        'end = time.time()\n' \
+        'sys.stdout.write("{{!r}}\\n".format(end - start))\n' \
+        'sys.stdout.write(" ".join(m for m in {!r} if m in sys.modules))\n'.format(
+            ', '.join(STARTUP_MODULES), LAZY_MODULES)
+
+    import_time = None
+    for _ in range(repeat):
+        _, _, output = _run([sys.executable, '-c', script], path)
+        lines = output.splitlines()
+        wall = float(lines[0])
+        imported = lines[1].split() if len(lines) > 1 else []
+        if imported:
+            raise RuntimeError('modules imported at startup: {}'.format(', '.join(imported)))
+        import_time = wall if import_time is None else min(import_time, wall)
+
+    if import_time > budget:
+        raise RuntimeError('import time is over budget: {:.3f}s > {:.3f}s'.format(import_time,
+                                                                                  budget))
+    return {'import_time': import_time}
+
+
+def run_scenario(path, ninja_command, repeat):
+    """
+    Measures a generated scenario.
+
+    :param path: scenario path (containing "build.py")
+    :type path: str
+    :param ninja_command: Ninja command
+    :type ninja_command: str
+    :param repeat: runs per measurement
+    :type repeat: int
+    :returns: results
+    :rtype: dict
+    """
+
+    generation_time = None
+    generation_max_rss = None
+    for _ in range(repeat):
+        wall, max_rss, _ = _run([sys.executable, 'build.py', 'ninja', '--no-metrics'], path)
+        generation_time = wall if generation_time is None else min(generation_time, wall)
+        generation_max_rss = max_rss if generation_max_rss is None \
+            else min(generation_max_rss, max_rss)
+
+    ninja_files = glob.glob(os.path.join(path, 'build', '*', 'build.ninja'))
+    if len(ninja_files) != 1:
+        raise RuntimeError('expected one Ninja file in: {}'.format(path))
+    ninja_file = ninja_files[0]
+
+    # Complete build, so that the next Ninja run has nothing to do
+    _run([ninja_command, '-f', ninja_file], path)
+    noop_time = None
+    for _ in range(repeat):
+        wall, _, _ = _run([ninja_command, '-f', ninja_file], path, 'no work to do')
+        noop_time = wall if noop_time is None else min(noop_time, wall)
+
+    return {
+        'generation_time': generation_time,
+        'generation_max_rss': generation_max_rss,
+        'manifest_size': os.path.getsize(ninja_file),
+        'noop_time': noop_time}
+
+
+def write_results(results, baseline=None, threshold=DEFAULT_THRESHOLD, f=None):
+    """
+    Writes the results, compared with the baseline if there is one.
+
+    :returns: regressions as (scenario, metric, change) tuples
+    :rtype: [(str, str, float)]
+    """
+
+    if f is None:
+        f = sys.stdout
+    regressions = []
+    f.write('{:<8}  {:<12}  {:>12}  {:>12}  {:>8}\n'.format('scenario', 'metric', 'result',
+                                                            'baseline', 'change'))
+    for name, scenario in sorted(results['scenarios'].items()):
+        baseline_scenario = baseline['scenarios'].get(name, {}) if baseline else {}
+        for key, label, unit in METRICS:
+            if key not in scenario:
+                continue
+            value = scenario[key]
+            baseline_value = baseline_scenario.get(key)
+            change = None
+            if baseline_value:
+                change = float(value - baseline_value) / baseline_value
+                if change > threshold:
+                    regressions.append((name, key, change))
+            f.write('{:<8}  {:<12}  {:>12}  {:>12}  {:>8}{}\n'.format(
+                name, label, _format(value, unit), _format(baseline_value, unit),
+                '{:+.1f}%'.format(change * 100) if change is not None else '-',
+                '  REGRESSION' if (change is not None) and (change > threshold) else ''))
+    return regressions
+
+
+def _write_tools(path):
+    # Wrapper scripts, so that the build scripts can configure absolute tool paths
+    os.makedirs(path)
+    tools = {}
+    for tool in TOOLS:
+        tool_path = os.path.join(path, tool)
+        with io.open(tool_path, 'w', encoding='utf-8') as f:
+            f.write('#!/bin/sh\nexec "{}" "{}" {} "$@"\n'.format(sys.executable, STUB_PATH, tool))
+        os.chmod(tool_path, 0o755)
+        tools[tool] = tool_path
+    return tools
+
+
+def _run(args, path, expect=None):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT_PATH] + ([env['PYTHONPATH']]
+                                                       if env.get('PYTHONPATH') else []))
+    # We need the rusage of this specific child, hence wait4; the output goes to a temporary file
+    # so that the child can never block on a full pipe
+    with tempfile.TemporaryFile() as f:
+        start = time.time()
+        process = Popen(args, cwd=path, env=env, stdout=f, stderr=STDOUT)
+        _, status, rusage = _wait4(process.pid)
+        wall = time.time() - start
+        f.seek(0)
+        output = f.read().decode('utf-8', 'replace')
+    code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 128 + os.WTERMSIG(status)
+    process.returncode = code
+    if code != 0:
+        raise RuntimeError('"{}" failed in {} with code {:d}:\n{}'.format(
+            ' '.join(args), path, code, output))
+    if (expect is not None) and (expect not in output):
+        raise RuntimeError('"{}" in {} did not output "{}":\n{}'.format(' '.join(args), path,
+                                                                     expect, output))
+    max_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    return wall, max_rss, output
+
+
+def _wait4(pid):
+    while True:
+        try:
+            return os.wait4(pid, 0)
+        except OSError as ex:
+            if ex.errno != errno.EINTR:
+                raise
+
+
+def _format(value, unit):
+    if value is None:
+        return '-'
+    if unit == 's':
+        return '{:.3f}s'.format(value)
+    if value < 1024:
+        return '{:d}B'.format(value)
+    for prefix in ('KiB', 'MiB', 'GiB'):
+        value /= 1024.0
+        if (value < 1024) or (prefix == 'GiB'):
+            return '{:.1f}{}'.format(value, prefix)
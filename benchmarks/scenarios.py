@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Synthetic projects for benchmarking.
+
+Each scenario writes source files and a "build.py" script into a directory. The build scripts
+configure Rōnin to use stub tools (see "stub.py"), so no real compilers are needed.
+"""
+
+from __future__ import unicode_literals
+import os, io
+
+
+FILES_PER_DIRECTORY = 100
+
+VALA_MAX_SOURCES = 1000
+"""
+Every Vala transpile action depends on the fast VAPIs of all other sources, so the Ninja file grows
+quadratically with the number of sources. We cap it to keep the scenario practical.
+"""
+
+
+def write_gcc(path, tools, sources, extensions, **_):
+    """
+    gcc: compiles ``sources`` C files, each with ``extensions`` extensions adding defines and
+    include paths, and links them all into one executable (a very long link line).
+    """
+
+    for index in range(sources):
+        _write(path, _source_path('src', index, 'c'),
+               'int function_{:d}(void) {{ return {:d}; }}\n'.format(index, index))
+
+    _write_build_script(path, '''
+from ronin.extensions import ExplicitExtension
+from ronin.gcc import configure_gcc, GccCompile, GccLink
+
+configure_gcc(gcc_command={gcc!r}, ccache=False)
+
+extensions = [ExplicitExtension(defines=[('BENCHMARK_{{:d}}'.format(i), str(i))],
+                                include_paths=[join_path(ctx.paths.root, 'include', str(i))])
+              for i in range({extensions:d})]
+
+Phase(project=project,
+      name='compile',
+      executor=GccCompile(),
+      inputs=glob('src/**/*.c'),
+      extensions=extensions)
+
+Phase(project=project,
+      name='link',
+      executor=GccLink(),
+      inputs_from=['compile'],
+      extensions=extensions,
+      output='benchmark')
+'''.format(gcc=tools['gcc'], extensions=extensions))
+
+
+def write_chain(path, tools, depth, **_):
+    """
+    Chain: ``depth`` phases, each copying the output of the previous one via ``inputs_from``.
+    """
+
+    _write(path, 'src/start.txt', 'start\n')
+
+    _write_build_script(path, '''
+from ronin.files import configure_files, Copy
+
+configure_files(copy_command={cp!r})
+
+previous = None
+for index in range({depth:d}):
+    name = 'copy_{{:d}}'.format(index)
+    phase = Phase(project=project,
+                  name=name,
+                  executor=Copy(),
+                  output='stage_{{:d}}'.format(index))
+    if previous is None:
+        phase.inputs = glob('src/start.txt')
+    else:
+        phase.inputs_from.append(previous)
+    previous = name
+'''.format(cp=tools['cp'], depth=depth))
+
+
+def write_java(path, tools, sources, **_):
+    """
+    Java: compiles ``sources`` Java files in packages of 100 and packages all classes into one Jar.
+    """
+
+    for index in range(sources):
+        package = 'benchmark.p{:d}'.format(index // FILES_PER_DIRECTORY)
+        _write(path, os.path.join('src', package.replace('.', os.sep),
+                                  'Class{:d}.java'.format(index)),
+               'package {};\npublic class Class{:d} {{}}\n'.format(package, index))
+    _write(path, 'MANIFEST.MF', 'Manifest-Version: 1.0\n')
+
+    _write_build_script(path, '''
+from ronin.java import configure_java, JavaCompile, Jar, JavaClasses
+from ronin.utils.paths import input_path
+
+configure_java(javac_command={javac!r}, jar_command={jar!r})
+
+Phase(project=project,
+      name='compile',
+      executor=JavaCompile(),
+      input_path=join_path(ctx.paths.root, 'src'),
+      inputs=glob('**/*.java'))
+
+Phase(project=project,
+      name='jar',
+      executor=Jar(manifest=input_path('MANIFEST.MF')),
+      extensions=[JavaClasses(project, 'compile')],
+      output='benchmark')
+'''.format(javac=tools['javac'], jar=tools['jar']))
+
+
+def write_go(path, tools, sources, **_):
+    """
+    Go: compiles ``sources`` Go files and links them.
+    """
+
+    for index in range(sources):
+        _write(path, _source_path('src', index, 'go'),
+               'package main\nfunc function{:d}() int {{ return {:d} }}\n'.format(index, index))
+
+    _write_build_script(path, '''
+from ronin.go import configure_go, GoCompile, GoLink, GoPackage
+
+configure_go(go_command={go!r})
+
+Phase(project=project,
+      name='compile',
+      executor=GoCompile(),
+      inputs=glob('src/**/*.go'))
+
+Phase(project=project,
+      name='link',
+      executor=GoLink(),
+      inputs_from=['compile'],
+      extensions=[GoPackage(project, 'compile')],
+      output='benchmark')
+'''.format(go=tools['go']))
+
+
+def write_vala(path, tools, sources, **_):
+    """
+    Vala: the parallel build (fast VAPIs, transpile, C compile, link) of up to
+    :data:`VALA_MAX_SOURCES` Vala files.
+    """
+
+    for index in range(min(sources, VALA_MAX_SOURCES)):
+        _write(path, _source_path('src', index, 'vala'),
+               'int function_{:d}() {{ return {:d}; }}\n'.format(index, index))
+
+    _write_build_script(path, '''
+from ronin.gcc import configure_gcc, GccLink
+from ronin.pkg_config import configure_pkg_config
+from ronin.vala import configure_vala, ValaApi, ValaTranspile, ValaGccCompile, ValaPackage
+
+configure_gcc(gcc_command={gcc!r}, ccache=False)
+configure_pkg_config(pkg_config_command={pkg_config!r})
+configure_vala(valac_command={valac!r})
+
+inputs = glob('src/**/*.vala')
+extensions = [ValaPackage('glib-2.0')]
+
+Phase(project=project,
+      name='api',
+      executor=ValaApi(),
+      inputs=inputs)
+
+Phase(project=project,
+      name='transpile',
+      executor=ValaTranspile(apis=['api']),
+      inputs=inputs,
+      extensions=extensions)
+
+Phase(project=project,
+      name='compile',
+      executor=ValaGccCompile(),
+      inputs_from=['transpile'],
+      extensions=extensions)
+
+Phase(project=project,
+      name='link',
+      executor=GccLink(),
+      inputs_from=['compile'],
+      extensions=extensions,
+      output='benchmark')
+'''.format(gcc=tools['gcc'], pkg_config=tools['pkg-config'], valac=tools['valac']))
+
+
+SCENARIOS = (
+    ('gcc', write_gcc),
+    ('chain', write_chain),
+    ('java', write_java),
+    ('go', write_go),
+    ('vala', write_vala))
+
+TOOLS = ('gcc', 'javac', 'jar', 'go', 'valac', 'pkg-config', 'cp')
+
+
+def _source_path(directory, index, extension):
+    return os.path.join(directory, 'd{:d}'.format(index // FILES_PER_DIRECTORY),
+                        'f{:d}.{}'.format(index, extension))
+
+
+def _write_build_script(path, body):
+    _write(path, 'build.py', '''#!/usr/bin/env python
+# Generated by the Ronin benchmarks
+
+from ronin.cli import cli
+from ronin.contexts import new_context
+from ronin.phases import Phase
+from ronin.projects import Project
+from ronin.utils.paths import glob, join_path
+
+with new_context() as ctx:
+
+    project = Project('Benchmark')
+{}
+    cli(project)
+'''.format(_indent(body)))
+
+
+def _indent(text):
+    return '\n'.join(('    ' + line) if line else line for line in text.split('\n'))
+
+
+def _write(path, relative_path, content):
+    path = os.path.join(path, relative_path)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
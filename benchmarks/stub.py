@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+#
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Stands in for the real tools (gcc, javac, jar, go, valac, pkg-config, cp) in benchmarks. It does
+# no actual work, but creates the outputs (and deps files) that Ninja expects, so that builds
+# complete and no-op builds are really no-ops.
+#
+# Usage: stub.py TOOL [ARGUMENTS...]
+
+from __future__ import unicode_literals
+import sys, os, io, re
+
+
+_PACKAGE_RE = re.compile(r'^\s*package\s+([\w.]+)\s*;', re.MULTILINE)
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    if not args:
+        sys.stderr.write('usage: stub.py TOOL [ARGUMENTS...]\n')
+        return 2
+    tool = args[0]
+    args = _expand_response_files(args[1:])
+    fn = _TOOLS.get(tool)
+    if fn is None:
+        sys.stderr.write('stub.py: unsupported tool: {}\n'.format(tool))
+        return 2
+    return fn(args) or 0
+
+
+def _gcc(args):
+    output = _option(args, '-o')
+    deps_file = _option(args, '-MF')
+    inputs = [v for v in _positionals(args, ('-o', '-MF', '-I', '-D', '-L', '-l'))
+              if not v.startswith('-')]
+    if output:
+        _touch(output)
+    if deps_file:
+        _write(deps_file, '{}: {}\n'.format(output, ' '.join(inputs)))
+
+
+def _javac(args):
+    classes_path = _option(args, '-d') or '.'
+    for source in args:
+        if not source.endswith('.java'):
+            continue
+        with io.open(source, encoding='utf-8') as f:
+            match = _PACKAGE_RE.search(f.read())
+        package_path = match.group(1).replace('.', os.sep) if match else ''
+        name = os.path.splitext(os.path.basename(source))[0] + '.class'
+        _touch(os.path.join(classes_path, package_path, name))
+
+
+def _jar(args):
+    # "jar cf JAR ..." or "jar cfm JAR MANIFEST ..."
+    if (len(args) > 1) and ('f' in args[0]):
+        _touch(args[1])
+
+
+def _go(args):
+    output = _option(args, '-o')
+    if output:
+        _touch(output)
+
+
+def _valac(args):
+    options = dict(v[2:].split('=', 1) for v in args if v.startswith('--') and ('=' in v))
+    sources = [v for v in args if v.endswith('.vala') or v.endswith('.gs')]
+    for name in ('output', 'fast-vapi'):
+        if name in options:
+            _touch(options[name])
+    outputs = []
+    if '--ccode' in args:
+        directory = options.get('directory', '.')
+        base_path = options.get('basedir', '.')
+        for source in sources:
+            relative = os.path.relpath(source, base_path)
+            output = os.path.join(directory, os.path.splitext(relative)[0] + '.c')
+            _touch(output)
+            outputs.append(output)
+    if 'deps' in options:
+        _write(options['deps'], '{}: {}\n'.format(' '.join(outputs) or options.get('output', ''),
+                                                  ' '.join(sources)))
+
+
+def _pkg_config(args):
+    sys.stdout.write('\n')
+
+
+def _cp(args):
+    if len(args) >= 2:
+        _touch(args[-1])
+
+
+_TOOLS = {
+    'gcc': _gcc,
+    'javac': _javac,
+    'jar': _jar,
+    'go': _go,
+    'valac': _valac,
+    'pkg-config': _pkg_config,
+    'cp': _cp}
+
+
+def _expand_response_files(args):
+    expanded = []
+    for arg in args:
+        if arg.startswith('@') and os.path.isfile(arg[1:]):
+            with io.open(arg[1:], encoding='utf-8') as f:
+                expanded += f.read().split()
+        else:
+            expanded.append(arg)
+    return expanded
+
+
+def _option(args, name):
+    for index, arg in enumerate(args):
+        if arg == name:
+            return args[index + 1] if index + 1 < len(args) else None
+        if arg.startswith(name) and (len(arg) > len(name)) and (not name.startswith('--')):
+            return arg[len(name):]
+    return None
+
+
+def _positionals(args, options_with_values):
+    positionals = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in options_with_values:
+            skip = True
+        else:
+            positionals.append(arg)
+    return positionals
+
+
+def _touch(path):
+    _write(path, '')
+
+
+def _write(path, content):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Another action might have created it in the meantime
+            if not os.path.isdir(directory):
+                raise
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
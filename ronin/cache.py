@@ -0,0 +1,258 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .utils.strings import stringify, bool_stringify
+import os, io, time
+
+
+DEFAULT_CACHE_SIZE = 5 * 1024 * 1024 * 1024
+EVICTION_FRACTION = 0.9
+EVICTION_INTERVAL = 6 * 60 * 60
+EVICTION_STAMP_NAME = 'evicted'
+CACHE_ADDED_NAME = 'added' # must match ronin.launcher
+
+
+def configure_cache(path=None, size=None, salt=None, base_path=None, remote=None,
+                    remote_timeout=None):
+    """
+    Configures the current context's action cache (see :class:`~ronin.launcher.ActionCache`).
+
+    The cache is enabled by the context's ``build.cache`` (see the ``--cache`` command line
+    argument) or ``build.remote_cache`` (see the ``--remote-cache`` command line argument, which
+    also overrides ``remote``).
+
+    Whether we upload to the remote cache is set by the context's ``build.remote_upload`` (see the
+    ``--no-remote-upload`` command line argument), so that for example CI builds can populate the
+    cache while developer builds only read from it.
+
+    :param path: cache path; defaults to "ronin/actions" in ``$XDG_CACHE_HOME`` or "~/.cache"
+    :type path: str or ~types.FunctionType
+    :param size: maximum size in bytes; defaults to 5 GiB
+    :type size: int or ~types.FunctionType
+    :param salt: value to include in action keys, for changes to the toolchain that do not change
+     the executables run by the commands (which are already included), e.g. a new system header
+     package
+    :type salt: str or ~types.FunctionType
+    :param base_path: base path of the checkout, which is replaced in action keys so that
+     checkouts in different directories share entries; defaults to the context's ``paths.root``
+    :type base_path: str or ~types.FunctionType
+    :param remote: base URL of a remote cache (see :class:`~ronin.launcher.RemoteCache`)
+    :type remote: str or ~types.FunctionType
+    :param remote_timeout: timeout for each request to the remote cache in seconds; defaults to 10
+    :type remote_timeout: float or ~types.FunctionType
+    """
+
+    with current_context(False) as ctx:
+        ctx.cache.path = path
+        ctx.cache.size = size
+        ctx.cache.salt = salt
+        ctx.cache.base_path = base_path
+        ctx.cache.remote = remote
+        ctx.cache.remote_timeout = remote_timeout
+
+
+def action_cache_path():
+    """
+    The context's ``cache.path``, or the default path if not set.
+
+    :returns: absolute cache path, or None if the context's ``build.cache`` is not enabled and
+     there is no ``build.remote_cache``
+    :rtype: str
+    """
+
+    with current_context() as ctx:
+        if (not bool_stringify(ctx.get('build.cache', False))) and \
+            (stringify(ctx.get('build.remote_cache')) is None):
+            return None
+        path = stringify(ctx.get('cache.path'))
+    if path is None:
+        path = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(path, 'ronin', 'actions')
+    return os.path.abspath(path)
+
+
+def action_cache_size():
+    """
+    The context's ``cache.size``, or :data:`DEFAULT_CACHE_SIZE` if not set.
+
+    :returns: size in bytes
+    :rtype: int
+    """
+
+    with current_context() as ctx:
+        size = stringify(ctx.get('cache.size'))
+    return int(size) if size is not None else DEFAULT_CACHE_SIZE
+
+
+def action_cache_salt():
+    """
+    The context's ``cache.salt``.
+
+    :returns: salt, or None
+    :rtype: str
+    """
+
+    with current_context() as ctx:
+        return stringify(ctx.get('cache.salt'))
+
+
+def action_cache_base_path():
+    """
+    The context's ``cache.base_path`` or ``paths.root``.
+
+    :returns: absolute base path, or None if the action cache is not enabled
+    :rtype: str
+    """
+
+    if action_cache_path() is None:
+        return None
+    with current_context() as ctx:
+        base_path = stringify(ctx.fallback(ctx.get('cache.base_path'), 'paths.root'))
+    return os.path.abspath(base_path) if base_path is not None else None
+
+
+def remote_cache():
+    """
+    The context's ``build.remote_cache`` or ``cache.remote``, ``cache.remote_timeout`` and
+    ``build.remote_upload``.
+
+    :returns: URL, timeout (or None for the default) and whether to upload, or None if there is no
+     remote cache or the action cache is not enabled
+    :rtype: (str, float, bool)
+    """
+
+    if action_cache_path() is None:
+        return None
+    with current_context() as ctx:
+        url = stringify(ctx.fallback(ctx.get('build.remote_cache'), 'cache.remote'))
+        if url is None:
+            return None
+        timeout = stringify(ctx.get('cache.remote_timeout'))
+        upload = bool_stringify(ctx.get('build.remote_upload', True))
+    return url, float(timeout) if timeout is not None else None, upload
+
+
+def maybe_evict(path, size, interval=EVICTION_INTERVAL):
+    """
+    Calls :func:`evict` only if the last eviction was more than ``interval`` seconds ago, or if
+    the size of the cache then plus the size of the entries added since (as counted by
+    :class:`~ronin.launcher.ActionCache`) is larger than ``size``. This avoids walking the whole
+    cache after every build.
+
+    The size after the last eviction is recorded in the cache's "evicted" file.
+
+    :param path: cache path
+    :type path: str
+    :param size: maximum size in bytes
+    :type size: int
+    :param interval: seconds
+    :type interval: float
+    :returns: number of bytes deleted
+    :rtype: int
+    """
+
+    stamp_path = os.path.join(path, EVICTION_STAMP_NAME)
+    added_path = os.path.join(path, CACHE_ADDED_NAME)
+    try:
+        with io.open(stamp_path, 'r', encoding='utf-8') as f:
+            recorded = int(f.read().strip())
+        age = time.time() - os.path.getmtime(stamp_path)
+    except (IOError, OSError, ValueError):
+        recorded = None
+    if (recorded is not None) and (age < interval) and (recorded + _added(added_path) <= size):
+        return 0
+
+    # Entries added while we walk will be counted by the walk, or by the next call
+    _remove(added_path)
+    total, deleted = _evict(path, size)
+    if os.path.isdir(path):
+        with io.open(stamp_path, 'w', encoding='utf-8') as f:
+            f.write('{:d}\n'.format(total - deleted))
+    return deleted
+
+
+def evict(path, size):
+    """
+    Deletes the least recently used files in the action cache until it is smaller than
+    :data:`EVICTION_FRACTION` of ``size``, if it is larger than ``size``.
+
+    :param path: cache path
+    :type path: str
+    :param size: maximum size in bytes
+    :type size: int
+    :returns: number of bytes deleted
+    :rtype: int
+    """
+
+    return _evict(path, size)[1]
+
+
+def _evict(path, size):
+    # Returns the total size and the number of bytes deleted
+    files = []
+    total = 0
+    now = time.time()
+    for directory, _, names in os.walk(path):
+        for name in names:
+            if (directory == path) and (name in (EVICTION_STAMP_NAME, CACHE_ADDED_NAME)):
+                continue
+            file_path = os.path.join(directory, name)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            if name.endswith('.tmp'):
+                # Left over by an interrupted action
+                if now - st.st_mtime > 3600:
+                    _remove(file_path)
+                continue
+            files.append((st.st_mtime, st.st_size, file_path))
+            total += st.st_size
+    if total <= size:
+        return total, 0
+
+    deleted = 0
+    target = total - size * EVICTION_FRACTION
+    files.sort()
+    for _, file_size, file_path in files:
+        if deleted >= target:
+            break
+        if _remove(file_path):
+            deleted += file_size
+    return total, deleted
+
+
+def _added(path):
+    # Sum of the sizes appended by the launchers
+    added = 0
+    try:
+        with io.open(path, 'rb') as f:
+            for line in f:
+                try:
+                    added += int(line)
+                except ValueError:
+                    pass
+    except (IOError, OSError):
+        pass
+    return added
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# See:
+# https://bazel.build/remote/caching#http-caching
+
+from __future__ import unicode_literals
+from .cache import DEFAULT_CACHE_SIZE, evict
+from argparse import ArgumentParser
+import sys, os, io, re, errno, hashlib, threading
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler # Python 3
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler # Python 2
+    from SocketServer import ThreadingMixIn
+
+
+DEFAULT_HOST = 'localhost'
+DEFAULT_PORT = 8287
+EVICTION_INTERVAL = 60
+
+_PATH = re.compile(r'^(?:/.*)?/(ac|cas)/([0-9a-f]{64})$')
+
+
+def serve_cache(path, host=DEFAULT_HOST, port=DEFAULT_PORT, size=DEFAULT_CACHE_SIZE):
+    """
+    Runs a remote cache server (see :class:`~ronin.launcher.RemoteCache`) until interrupted.
+
+    Entries are stored as files under the path. Uploaded blobs are verified against their hash.
+    Every :data:`EVICTION_INTERVAL` seconds the least recently used entries are deleted if the
+    cache is larger than its size (see :func:`~ronin.cache.evict`).
+
+    The server has no authentication, so it should only be exposed to trusted networks.
+
+    Can also be run from the command line: ``python -m ronin.cache_server PATH``.
+
+    :param path: cache path
+    :type path: str
+    :param host: host name or address to listen on
+    :type host: str
+    :param port: port to listen on
+    :type port: int
+    :param size: maximum size in bytes
+    :type size: int
+    """
+
+    path = os.path.abspath(path)
+    server = _Server((host, port), _Handler)
+    server.cache_path = path
+    stop = threading.Event()
+    thread = threading.Thread(target=_evict, args=(path, size, stop))
+    thread.daemon = True
+    thread.start()
+    sys.stdout.write("Serving cache '{}' on http://{}:{:d}/\n".format(path, host,
+                                                                     server.server_address[1]))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+def main(args=None):
+    parser = ArgumentParser(prog='python -m ronin.cache_server',
+                            description='Remote cache server for Rōnin')
+    parser.add_argument('path', help='cache path')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='host name or address to listen on (defaults to "localhost")')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='port to listen on (defaults to {:d})'.format(DEFAULT_PORT))
+    parser.add_argument('--size', type=int, default=DEFAULT_CACHE_SIZE, metavar='BYTES',
+                        help='maximum size (defaults to 5 GiB)')
+    args = parser.parse_args(args)
+    serve_cache(args.path, args.host, args.port, args.size)
+    return 0
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    cache_path = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.get(False)
+
+    def do_GET(self):
+        self.get(True)
+
+    def do_PUT(self):
+        entry = self.entry()
+        if entry is None:
+            return
+        kind, h, path = entry
+        try:
+            length = int(self.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            self.respond(411)
+            return
+
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as ex:
+                if ex.errno != errno.EEXIST:
+                    raise
+        temporary = '{}.{:d}.tmp'.format(path, threading.current_thread().ident)
+        hasher = hashlib.sha256()
+        try:
+            with io.open(temporary, 'wb') as f:
+                while length > 0:
+                    chunk = self.rfile.read(min(length, 1 << 20))
+                    if not chunk:
+                        break
+                    length -= len(chunk)
+                    hasher.update(chunk)
+                    f.write(chunk)
+            if length > 0:
+                self.close_connection = True
+                self.respond(400)
+                return
+            if (kind == 'cas') and (hasher.hexdigest() != h):
+                self.respond(422)
+                return
+            os.rename(temporary, path)
+            temporary = None
+        finally:
+            if temporary is not None:
+                _remove(temporary)
+        self.respond(200)
+
+    def get(self, body):
+        entry = self.entry()
+        if entry is None:
+            return
+        _, _, path = entry
+        try:
+            f = io.open(path, 'rb')
+        except IOError:
+            self.respond(404)
+            return
+        with f:
+            length = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', '{:d}'.format(length))
+            self.end_headers()
+            if body:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+        try:
+            # For eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def entry(self):
+        match = _PATH.match(self.path.split('?', 1)[0])
+        if match is None:
+            self.respond(404)
+            return None
+        kind, h = match.groups()
+        return kind, h, os.path.join(self.server.cache_path, kind, h[:2], h)
+
+    def respond(self, code):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Too many requests to log
+        pass
+
+
+def _evict(path, size, stop):
+    while not stop.wait(EVICTION_INTERVAL):
+        evict(path, size)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,6 +18,10 @@ from __future__ import unicode_literals
 from .contexts import current_context
 from .projects import Project
 from .ninja import NinjaFile
+from .ninja_log import ninja_log_path, read_ninja_log, latest_ninja_log_entries
+from .trace import current_tracer, trace_span
+from .metrics import write_stats
+from .launcher_log import read_launcher_log
 from .utils.strings import stringify_list
 from .utils.types import verify_type
 from .utils.messages import announce, error
@@ -41,8 +45,9 @@ def cli(*projects):
     try:
         for project in projects:
             verify_type(project, Project)
-            for hook in project.hooks:
-                hook(project)
+            with trace_span('hooks', project='{}'.format(project)):
+                for hook in project.hooks:
+                    hook(project)
 
         with current_context() as ctx:
             if ctx.get('cli.verbose', False):
@@ -50,7 +55,20 @@ def cli(*projects):
             operations = ctx.cli.args.operation
 
         for operation in operations:
-            if operation in ('build', 'clean', 'ninja'):
+            if operation == 'watch':
+                from .watch import watch
+                watch(projects)
+                sys.exit(0)
+            elif operation == 'serve':
+                from .server import serve
+                serve(projects)
+                sys.exit(0)
+            elif operation == 'pgo':
+                from .pgo import pgo
+                r = pgo(projects)
+                if r != 0:
+                    sys.exit(r)
+            elif operation in ('build', 'clean', 'ninja', 'critical-path', 'stats', 'resources'):
                 for project in projects:
                     announce('{}'.format(project))
                     ninja_file = NinjaFile(project)
@@ -65,6 +83,21 @@ def cli(*projects):
                             sys.exit(r)
                     elif operation == 'ninja':
                         ninja_file.generate()
+                    elif operation == 'critical-path':
+                        # Report modules are imported only when used, to keep startup fast
+                        from .critical_path import critical_path, write_critical_path
+                        ninja_file.generate()
+                        entries = latest_ninja_log_entries(
+                            read_ninja_log(ninja_log_path(project)))
+                        write_critical_path(project, critical_path(project, entries))
+                    elif operation == 'stats':
+                        with current_context() as ctx:
+                            compare = ctx.get('build.compare')
+                        write_stats(project, compare)
+                    elif operation == 'resources':
+                        from .resources import launcher_log_path, write_resources
+                        write_resources(project,
+                                        read_launcher_log(launcher_log_path(project)))
             else:
                 error("Unsupported operation: '{}'".format(operation))
                 sys.exit(1)
@@ -78,7 +111,14 @@ def cli(*projects):
             except CalledProcessError as ex:
                 error("'{}' failed with code: {:d}".format(run_string, ex.returncode))
                 sys.exit(ex.returncode)
+
+        _write_glob_cache()
+        _write_trace()
+        _write_profile()
     except BaseException as ex:
+        _write_glob_cache()
+        _write_trace()
+        _write_profile()
         if isinstance(ex, SystemExit):
             code = ex.code
         else:
@@ -88,3 +128,40 @@ def cli(*projects):
         elif not isinstance(ex, SystemExit):
             error(ex)
         sys.exit(code)
+
+
+def _write_glob_cache():
+    with current_context() as ctx:
+        glob_caches = ctx.get('current.glob_caches')
+        args = ctx.get('cli.args')
+    if not glob_caches:
+        return
+    if (args is not None) and args.operation and (args.operation[-1] == 'clean'):
+        # Would recreate what clean just deleted
+        return
+    for glob_cache in glob_caches.values():
+        try:
+            glob_cache.save()
+        except (IOError, OSError):
+            # The cache is only an optimization
+            pass
+
+
+def _write_trace():
+    tracer = current_tracer()
+    if tracer is None:
+        return
+    with current_context() as ctx:
+        path = ctx.build.trace
+    # Make sure we write the trace only once
+    with current_context(False) as ctx:
+        ctx.current.tracer = None
+    tracer.write(path)
+    announce("Trace written to '{}'".format(path))
+
+
+def _write_profile():
+    from .profiling import stop_profiler
+    profiler = stop_profiler()
+    if profiler is not None:
+        profiler.write()
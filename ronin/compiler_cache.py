@@ -0,0 +1,322 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# See:
+# https://ccache.dev/manual/latest.html#_compiling_in_different_directories
+# https://ccache.dev/manual/latest.html#config_stats_log
+# https://github.com/mozilla/sccache
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .cache import remote_cache
+from .utils.paths import join_path
+from .utils.platform import which
+from .utils.strings import stringify, bool_stringify
+from .utils.messages import announce
+from subprocess import Popen, PIPE
+import sys, os, io, json
+
+try:
+    from shlex import quote # Python 3
+except ImportError:
+    from pipes import quote # Python 2
+
+
+STATS_LOG_NAME = '.ronin_compiler_cache_stats'
+ALL_PHASES = 'all phases'
+
+CCACHE_HITS = ('direct_cache_hit', 'preprocessed_cache_hit')
+CCACHE_MISSES = ('cache_miss',)
+
+
+def configure_compiler_cache(launcher=None, base_path=None, prefix_map=True, stats=True):
+    """
+    Configures the current context's compiler cache, which runs the commands of executors that
+    support it (for example :class:`~ronin.gcc.GccCompile` and :class:`~ronin.rust.RustBuild`) via
+    a compiler launcher, such as `ccache <https://ccache.dev/>`__ or
+    `sccache <https://github.com/mozilla/sccache>`__.
+
+    The context's ``build.compiler_cache`` (see the ``--compiler-cache`` command line argument)
+    overrides ``launcher``.
+
+    Absolute paths in the commands would otherwise prevent hits across checkouts in different
+    directories. So with ``prefix_map`` the executors map the base path to "." in their outputs
+    (e.g. gcc's ``-ffile-prefix-map``), and ccache is told to hash paths relative to it
+    (``CCACHE_BASEDIR``). Note that sccache has no equivalent of the latter.
+
+    :param launcher: launcher command, e.g. "ccache" or "sccache"; defaults to none
+    :type launcher: str or ~types.FunctionType
+    :param base_path: base path of the checkout; defaults to the context's ``paths.root``
+    :type base_path: str or ~types.FunctionType
+    :param prefix_map: set to False to keep absolute paths
+    :type prefix_map: bool or ~types.FunctionType
+    :param stats: set to False to not report hits and misses per phase after building
+    :type stats: bool or ~types.FunctionType
+    """
+
+    with current_context(False) as ctx:
+        ctx.compiler_cache.launcher = launcher
+        ctx.compiler_cache.base_path = base_path
+        ctx.compiler_cache.prefix_map = prefix_map
+        ctx.compiler_cache.stats = stats
+
+
+def compiler_launcher():
+    """
+    The context's ``build.compiler_cache`` or ``compiler_cache.launcher``.
+
+    :returns: absolute path to the launcher and its kind (e.g. "ccache"), or None if not configured
+    :rtype: (str, str)
+    :raises ~ronin.utils.platform.WhichException: if could not find the launcher
+    """
+
+    with current_context() as ctx:
+        launcher = stringify(ctx.fallback(ctx.get('build.compiler_cache'),
+                                          'compiler_cache.launcher'))
+    if launcher is None:
+        return None
+    path = which(launcher)
+    kind = os.path.splitext(os.path.basename(path))[0]
+    return path, kind
+
+
+def compiler_cache_base_path():
+    """
+    The context's ``compiler_cache.base_path`` or ``paths.root``, if there is a compiler launcher
+    or a remote action cache (see :func:`~ronin.cache.remote_cache`) and
+    ``compiler_cache.prefix_map`` is enabled.
+
+    :returns: absolute base path, or None
+    :rtype: str
+    """
+
+    if (compiler_launcher() is None) and (remote_cache() is None):
+        return None
+    with current_context() as ctx:
+        if not bool_stringify(ctx.get('compiler_cache.prefix_map', True)):
+            return None
+        base_path = stringify(ctx.fallback(ctx.get('compiler_cache.base_path'), 'paths.root'))
+    return os.path.abspath(base_path) if base_path is not None else None
+
+
+def compiler_launcher_prefix(executor, project):
+    """
+    The command line prefix that runs the executor's command via the compiler launcher.
+
+    Executors support launchers by setting ``_compiler_launchers`` to the kinds they support. If
+    they set ``_compiler_launcher_variable``, the launcher is set in that environment variable
+    instead of prefixing the command (e.g. "RUSTC_WRAPPER" for Cargo).
+
+    :param executor: executor
+    :type executor: ~ronin.executors.Executor
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: shell command line prefix (to be followed by a space and the command), or None if
+     the executor does not support the launcher or there is none
+    :rtype: str
+    """
+
+    launcher = compiler_launcher()
+    if launcher is None:
+        return None
+    path, kind = launcher
+    if kind not in executor._compiler_launchers:
+        return None
+
+    variables = []
+    if kind == 'ccache':
+        base_path = compiler_cache_base_path()
+        if base_path is not None:
+            variables.append(('CCACHE_BASEDIR', base_path))
+            # The current directory is not in the outputs, thanks to the prefix map
+            variables.append(('CCACHE_NOHASHDIR', '1'))
+        if _stats_enabled():
+            variables.append(('CCACHE_STATSLOG', compiler_cache_stats_log_path(project)))
+    variable = stringify(executor._compiler_launcher_variable)
+    if variable is not None:
+        variables.append((variable, path))
+        path = None
+
+    prefix = []
+    if variables:
+        prefix.append('env')
+        prefix += ['{}={}'.format(k, quote(v)) for k, v in variables]
+    if path is not None:
+        prefix.append(quote(path))
+    return ' '.join(prefix)
+
+
+def compiler_cache_stats_log_path(project):
+    """
+    Path to the ccache statistics log, in the project's output path.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: absolute path
+    :rtype: str
+    """
+
+    return os.path.abspath(join_path(project.output_path, STATS_LOG_NAME))
+
+
+def compiler_cache_snapshot(project):
+    """
+    Records the state of the compiler cache's statistics before a build, for
+    :func:`phase_compiler_cache_stats`.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: snapshot, or None if there is no compiler launcher or statistics are disabled
+    """
+
+    launcher = compiler_launcher()
+    if (launcher is None) or not _stats_enabled():
+        return None
+    path, kind = launcher
+    if kind == 'ccache':
+        try:
+            offset = os.path.getsize(compiler_cache_stats_log_path(project))
+        except OSError:
+            offset = 0
+        return kind, offset
+    elif kind == 'sccache':
+        return kind, _sccache_counters(path)
+    return None
+
+
+def phase_compiler_cache_stats(project, snapshot):
+    """
+    Hits, misses, and uncacheable calls of the compiler cache since the snapshot, per phase.
+
+    For ccache these are read from its statistics log, and are attributed to phases according to
+    the input files of their actions. For sccache we can only compare its global counters, so
+    they are reported for :data:`ALL_PHASES`, and include compilations by other builds that ran
+    at the same time.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param snapshot: as returned by :func:`compiler_cache_snapshot`
+    :returns: hits, misses and uncacheable per phase name
+    :rtype: {:obj:`str`: [:obj:`int`]}
+    """
+
+    stats = {}
+    if snapshot is None:
+        return stats
+    kind, before = snapshot
+    if kind == 'ccache':
+        input_phases = _input_phases(project)
+        for input_path, counters in _read_stats_log(compiler_cache_stats_log_path(project),
+                                                    before):
+            phase_name = input_phases.get(os.path.normcase(os.path.abspath(input_path)))
+            if phase_name is None:
+                continue
+            if any(v in CCACHE_HITS for v in counters):
+                index = 0
+            elif any(v in CCACHE_MISSES for v in counters):
+                index = 1
+            else:
+                index = 2
+            stats.setdefault(phase_name, [0, 0, 0])[index] += 1
+    elif kind == 'sccache':
+        launcher = compiler_launcher()
+        after = _sccache_counters(launcher[0]) if launcher is not None else None
+        if (before is not None) and (after is not None):
+            delta = [a - b for a, b in zip(after, before)]
+            if any(delta):
+                stats[ALL_PHASES] = delta
+    return stats
+
+
+def write_compiler_cache_stats(project, stats, f=None):
+    """
+    Writes a compiler cache report.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param stats: as returned by :func:`phase_compiler_cache_stats`
+    :type stats: {:obj:`str`: [:obj:`int`]}
+    :param f: where to write; defaults to stdout
+    :type f: file-like
+    """
+
+    if not stats:
+        return
+    if f is None:
+        f = sys.stdout
+    announce('Compiler cache for {}:'.format(project))
+    width = max(len('phase'), max(len(v) for v in stats.keys()))
+    f.write('  {:<{width}}  {:>8}  {:>8}  {:>11}  {:>8}\n'.format('phase', 'hits', 'misses',
+                                                                 'uncacheable', 'hit rate',
+                                                                 width=width))
+    for phase_name, (hits, misses, uncacheable) in sorted(stats.items()):
+        total = hits + misses
+        rate = '{:.0f}%'.format(100.0 * hits / total) if total else '-'
+        f.write('  {:<{width}}  {:>8d}  {:>8d}  {:>11d}  {:>8}\n'.format(
+            phase_name, hits, misses, uncacheable, rate, width=width))
+
+
+def _stats_enabled():
+    with current_context() as ctx:
+        return bool_stringify(ctx.get('compiler_cache.stats', True))
+
+
+def _input_phases(project):
+    # Maps the inputs of the project's actions to the names of their phases
+    with current_context() as ctx:
+        project_actions = ctx.get('current.project_actions')
+    actions = project_actions.get(project) if project_actions is not None else None
+    phases = {}
+    for action in (actions or {}).values():
+        for input_path in action.inputs:
+            phases[os.path.normcase(os.path.abspath(input_path))] = action.phase_name
+    return phases
+
+
+def _read_stats_log(path, offset):
+    # Each compilation is a "# input" line followed by the names of the counters it incremented
+    entries = []
+    try:
+        with io.open(path, 'rb') as f:
+            f.seek(offset)
+            content = f.read().decode('utf-8', 'replace')
+    except (IOError, OSError):
+        return entries
+    for line in content.splitlines():
+        if line.startswith('# '):
+            entries.append((line[2:], []))
+        elif line and entries:
+            entries[-1][1].append(line.strip())
+    return entries
+
+
+def _sccache_counters(path):
+    # Hits, misses and uncacheable calls over all languages
+    try:
+        process = Popen([path, '--show-stats', '--stats-format=json'], stdout=PIPE, stderr=PIPE)
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            return None
+        stats = json.loads(output.decode('utf-8')).get('stats') or {}
+    except (OSError, ValueError):
+        return None
+
+    def total(name):
+        value = stats.get(name)
+        if isinstance(value, dict):
+            return sum((value.get('counts') or {}).values())
+        return value or 0
+
+    return [total('cache_hits'), total('cache_misses'),
+            total('requests_not_cacheable') + total('requests_not_compile')]
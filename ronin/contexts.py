@@ -22,11 +22,13 @@ from .utils.messages import error
 from .utils.collections import StrictList, StrictDict
 from io import StringIO
 from collections import OrderedDict
-import threading, sys, inspect, os
+import threading, sys, os, time
 
 
 _thread_locals = threading.local()
 
+_profiling = False # set by ronin.profiling
+
 
 def new_context(**kwargs):
     """
@@ -131,17 +133,50 @@ def configure_context(root_path=None,
     """
 
     from .utils.paths import join_path, base_path
+
+    start = time.time()
     
     with current_context(False) as ctx:
         ctx.cli.args, _ = _ArgumentParser(name, frame + 1).parse_known_args()
         ctx.cli.verbose = ctx.cli.args.verbose
 
+        profile_generation = ctx.cli.args.profile_generation
+        if profile_generation:
+            from .profiling import start_profiler
+            start_profiler(profile_generation if profile_generation is not True else None)
+
+        if ctx.cli.args.trace:
+            from .trace import Tracer
+            ctx.build.trace = ctx.cli.args.trace
+            ctx.current.tracer = Tracer(start)
+        else:
+            ctx.current.tracer = None
+
         ctx.build.debug = ctx.cli.args.debug
+        ctx.build.lto = ctx.cli.args.lto
         ctx.build.install = ctx.cli.args.install
         ctx.build.test = ctx.cli.args.test
         ctx.build.run = ctx.cli.args.run
+        ctx.build.measure = ctx.cli.args.measure
+        ctx.build.cache = ctx.cli.args.cache
+        ctx.build.remote_cache = ctx.cli.args.remote_cache
+        ctx.build.remote_upload = ctx.cli.args.remote_upload
+        ctx.build.compiler_cache = ctx.cli.args.compiler_cache
+        ctx.build.jobs = ctx.cli.args.jobs
+        ctx.build.load_average = ctx.cli.args.load_average
+        ctx.build.keep_going = ctx.cli.args.keep_going
+        ctx.build.timings = ctx.cli.args.timings
+        ctx.build.metrics = ctx.cli.args.metrics
+        ctx.build.compare = ctx.cli.args.compare
+        ctx.watch.debounce = ctx.cli.args.debounce
+        ctx.watch.poll = ctx.cli.args.poll
+        ctx.serve.socket = ctx.cli.args.socket
 
         ctx.current.project_outputs = StrictDict(key_type='ronin.projects.Project', value_type=dict)
+        ctx.current.project_dependencies = StrictDict(key_type='ronin.projects.Project',
+                                                      value_type=dict)
+        ctx.current.project_actions = StrictDict(key_type='ronin.projects.Project',
+                                                 value_type=dict)
 
         if ctx.cli.args.variant:
             ctx.projects.default_variant = ctx.cli.args.variant
@@ -163,7 +198,7 @@ def configure_context(root_path=None,
                 setattr(namespace, k, v)
         
         if root_path is None:
-            root_path = base_path(inspect.getfile(sys._getframe(frame)))
+            root_path = base_path(sys._getframe(frame).f_code.co_filename)
 
         ctx.paths.root = root_path
         ctx.paths.input = join_path(root_path, input_path_relative)
@@ -172,6 +207,20 @@ def configure_context(root_path=None,
         ctx.paths.object_relative = object_path_relative or 'obj'
         ctx.paths.source_relative = source_path_relative or 'src'
 
+        # The "watch" and "serve" operations need to know which globs to redo
+        operations = ctx.cli.args.operation
+        ctx.current.glob_calls = [] if ('watch' in operations) or ('serve' in operations) \
+            else None
+
+        # Created when first used (see glob_cache), so that the build script can configure them
+        ctx.current.glob_caches = StrictDict(key_type=str, value_type='ronin.utils.paths.GlobCache')
+
+        if ctx.current.tracer is not None:
+            ctx.current.tracer.span('configure_context', 'context', 0, ctx.current.tracer.now())
+        if _profiling:
+            from .profiling import current_profiler
+            current_profiler().add_span('configure_context', 'context', time.time() - start)
+
 
 class Context(object):
     """
@@ -252,6 +301,9 @@ class Context(object):
         :returns: value, default, or None
         """
         
+        if _profiling:
+            from .profiling import count, CONTEXT_LOOKUPS
+            count(CONTEXT_LOOKUPS)
         if '.' not in name:
             return default
         namespace_name, name = name.split('.', 1)
@@ -464,16 +516,57 @@ class _ArgumentParser(ArgumentParser):
         name = stringify(name)
         description = 'Build {} using Rōnin {}'.format(name, VERSION) if name is not None else \
                       'Build using Rōnin {}'.format(VERSION)
-        prog = os.path.basename(inspect.getfile(sys._getframe(frame)))
+        prog = os.path.basename(sys._getframe(frame).f_code.co_filename)
         super(_ArgumentParser, self).__init__(description=description, prog=prog)
         self.add_argument('operation', nargs='*', default=['build'],
-                          help='"build", "clean", "ninja"')
+                          help='"build", "clean", "ninja", "watch", "serve", "pgo", '
+                               '"critical-path", "stats", "resources"')
         self.add_flag_argument('debug', help_true='enable debug build',
                                help_false='disable debug build')
+        self.add_flag_argument('lto', help_true='enable link-time optimization',
+                               help_false='disable link-time optimization')
         self.add_flag_argument('install', help_true='enable installing',
                                help_false='disable installing')
         self.add_flag_argument('test', help_true='enable testing',help_false='disable testing')
         self.add_flag_argument('run', help_true='enable running', help_false='disable running')
+        self.add_flag_argument('measure', help_true='enable measuring resource use of actions '
+                                                    '(see "resources")',
+                               help_false='disable measuring resource use of actions')
+        self.add_flag_argument('cache', help_true='enable the action cache',
+                               help_false='disable the action cache')
+        self.add_argument('--remote-cache', metavar='URL',
+                          help='read from and write to this remote action cache (enables the '
+                               'action cache)')
+        self.add_flag_argument('remote-upload', help_true='enable writing to the remote cache',
+                               help_false='disable writing to the remote cache', default=True)
+        self.add_argument('--compiler-cache', metavar='LAUNCHER',
+                          help='run compilers via this launcher, e.g. "ccache" or "sccache"')
+        self.add_argument('--jobs', '-j', metavar='N',
+                          help='number of parallel jobs or "auto" to match the available CPUs '
+                               '(defaults to Ninja\'s choice)')
+        self.add_argument('--load-average', '-l', metavar='N', type=float,
+                          help='do not start new jobs if the load average is greater than this')
+        self.add_flag_argument('keep-going', help_true='keep building after failures',
+                               help_false='stop building after the first failure')
+        self.add_argument('--timings', nargs='?', const='text', choices=('text', 'json'),
+                          help='report the time spent in each phase after building')
+        self.add_argument('--trace', metavar='PATH',
+                          help='write a Chrome trace of generation and build to this file')
+        self.add_argument('--profile-generation', nargs='?', const=True, metavar='PATH',
+                          help='report where generation spends its time, and optionally write '
+                               'cProfile statistics to this file')
+        self.add_flag_argument('metrics', help_true='enable recording builds for "stats"',
+                               help_false='disable recording builds for "stats"', default=True)
+        self.add_argument('--compare', nargs=2, type=int, metavar='ID',
+                          help='build IDs to compare for "stats" (defaults to the last two)')
+        self.add_argument('--debounce', type=float, metavar='SECONDS',
+                          help='how long "watch" waits for changes to settle (defaults to 0.2)')
+        self.add_argument('--poll', action='store_true',
+                          help='make "watch" and "serve" poll for changes instead of using '
+                               'inotify')
+        self.add_argument('--socket', metavar='PATH',
+                          help='Unix socket path for "serve" (defaults to ".ronin.sock" in the '
+                               'output path)')
         self.add_argument(
             '--variant',
             help='override default project variant (defaults to host platform, e.g. "linux64")')
@@ -0,0 +1,242 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .timings import output_phases
+from .utils.collections import StrictDict
+from .utils.messages import announce
+from .utils.types import verify_type
+import sys
+
+
+DEFAULT_SPEEDUP = 2.0
+
+
+def output_dependencies(project):
+    """
+    The dependencies of every output, as stored in the context when the project's Ninja file was
+    last written. These include inputs, implicit dependencies (``rebuild_on``) and order
+    dependencies (``build_if``).
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: dependency paths per output path
+    :rtype: {:obj:`str`: [:obj:`str`]}
+    """
+
+    with current_context() as ctx:
+        project_dependencies = ctx.get('current.project_dependencies')
+    if project_dependencies is None:
+        return {}
+    return project_dependencies.get(project) or {}
+
+
+def critical_path(project, entries, speedup=DEFAULT_SPEEDUP):
+    """
+    Finds the critical path: the chain of dependent actions with the longest total wall time.
+    No amount of parallelism can make a full build shorter than this path.
+
+    Each action is weighed by its latest duration in the Ninja log, so the result estimates a full
+    build even if the last build was incremental. Actions that have never run weigh nothing.
+
+    For every action on the path we also estimate how much shorter the critical path would be if
+    that action alone were ``speedup`` times faster, and if it took no time at all. Note that the
+    saving can be less than the time shaved off the action, because another path might then
+    become the critical one.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param entries: Ninja log entries
+    :type entries: [:class:`~ronin.ninja_log.NinjaLogEntry`]
+    :param speedup: speedup factor for estimating savings
+    :type speedup: float
+    :returns: critical path
+    :rtype: :class:`CriticalPath`
+    """
+
+    phases = output_phases(project)
+    dependencies = output_dependencies(project)
+    durations = {}
+    for entry in entries:
+        if entry.output in dependencies:
+            durations[entry.output] = entry.duration
+    if not durations:
+        return CriticalPath(0, [], speedup)
+    order = _topological_order(dependencies)
+
+    length, outputs = _longest_path(order, dependencies, durations)
+
+    actions = []
+    for output in outputs:
+        duration = durations.get(output, 0)
+        saving = length - _longest_path(order, dependencies, durations,
+                                        {output: int(duration / speedup)})[0]
+        saving_all = length - _longest_path(order, dependencies, durations, {output: 0})[0]
+        actions.append(CriticalPathAction(output, phases.get(output), duration, saving,
+                                          saving_all))
+
+    return CriticalPath(length, actions, speedup)
+
+
+def write_critical_path(project, path, f=None):
+    """
+    Writes a critical path report.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param path: critical path, as returned by :func:`critical_path`
+    :type path: :class:`CriticalPath`
+    :param f: where to write; defaults to stdout
+    :type f: file-like
+    """
+
+    verify_type(project, 'ronin.projects.Project')
+    if f is None:
+        f = sys.stdout
+
+    if not path.actions:
+        announce('No critical path: the project has not been built yet')
+        return
+
+    announce('Critical path of {} through {:d} actions:'.format(_seconds(path.length),
+                                                              len(path.actions)))
+    phases = path.phases
+    width = max(len('phase'), max(len(v) for v in phases.keys()))
+    f.write('  {:>10}  {:<{width}}  {:>10}  {:>10}  {}\n'.format(
+        'duration', 'phase', 'x{:g}'.format(path.speedup), 'instant', 'output', width=width))
+    for action in path.actions:
+        f.write('  {:>10}  {:<{width}}  {:>10}  {:>10}  {}\n'.format(
+            _seconds(action.duration), action.phase_name or '', '-' + _seconds(action.saving),
+            '-' + _seconds(action.saving_all), action.output, width=width))
+
+    announce('Critical path per phase:')
+    for phase_name, duration in phases.items():
+        f.write('  {:<{width}}  {:>10}  {:>5.1f}%\n'.format(
+            phase_name, _seconds(duration), 100.0 * duration / path.length if path.length else 0,
+            width=width))
+
+
+class CriticalPath(object):
+    """
+    Critical path.
+
+    All times are in milliseconds.
+
+    :ivar length: total wall time of the path
+    :vartype length: int
+    :ivar actions: actions on the path, in build order
+    :vartype actions: [:class:`CriticalPathAction`]
+    :ivar speedup: speedup factor used for :attr:`CriticalPathAction.saving`
+    :vartype speedup: float
+    """
+
+    def __init__(self, length, actions, speedup):
+        self.length = length
+        self.actions = actions
+        self.speedup = speedup
+
+    @property
+    def phases(self):
+        """
+        Wall time on the path per phase, in build order. Actions that do not belong to a phase
+        are listed under an empty phase name.
+
+        :type: {:obj:`str`: :obj:`int`}
+        """
+
+        phases = StrictDict(key_type=str, value_type=int)
+        for action in self.actions:
+            phase_name = action.phase_name or ''
+            phases[phase_name] = phases.get(phase_name, 0) + action.duration
+        return phases
+
+
+class CriticalPathAction(object):
+    """
+    An action on the critical path.
+
+    All times are in milliseconds.
+
+    :ivar output: output path
+    :vartype output: str
+    :ivar phase_name: phase name, or None if unknown
+    :vartype phase_name: str
+    :ivar duration: wall time
+    :vartype duration: int
+    :ivar saving: how much shorter the path would be if the action were faster by the path's
+     speedup factor
+    :vartype saving: int
+    :ivar saving_all: how much shorter the path would be if the action took no time
+    :vartype saving_all: int
+    """
+
+    def __init__(self, output, phase_name, duration, saving, saving_all):
+        self.output = output
+        self.phase_name = phase_name
+        self.duration = duration
+        self.saving = saving
+        self.saving_all = saving_all
+
+
+def _topological_order(dependencies):
+    # Iterative depth-first search, so that deep graphs won't hit the recursion limit
+    order = []
+    visited = set()
+    for root in sorted(dependencies):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(dependencies[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if (child in dependencies) and (child not in visited):
+                    visited.add(child)
+                    stack.append((child, iter(dependencies[child])))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    return order
+
+
+def _longest_path(order, dependencies, durations, overrides=None):
+    finish = {}
+    previous = {}
+    for node in order:
+        start = 0
+        for dependency in dependencies[node]:
+            dependency_finish = finish.get(dependency)
+            if (dependency_finish is not None) and (dependency_finish > start):
+                start = dependency_finish
+                previous[node] = dependency
+        duration = overrides.get(node) if overrides and (node in overrides) \
+            else durations.get(node, 0)
+        finish[node] = start + duration
+
+    if not finish:
+        return 0, []
+    node = max(order, key=lambda v: finish[v])
+    length = finish[node]
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous.get(node)
+    path.reverse()
+    return length, path
+
+
+def _seconds(milliseconds):
+    return '{:.3f}s'.format(milliseconds / 1000.0)
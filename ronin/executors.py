@@ -15,6 +15,7 @@
 from __future__ import unicode_literals
 from .utils.strings import stringify, join_later
 from .utils.collections import StrictList
+from .trace import trace_span
 from io import StringIO
 
 
@@ -32,6 +33,36 @@ class Executor(object):
     :vartype output_prefix: str or ~types.FunctionType
     :ivar hooks: called when generating the Ninja file
     :vartype hooks: [:obj:`~types.FunctionType`]
+    
+    Executors for tools that can read arguments from a file may set ``_response_file_format`` to
+    the tool's syntax for it (e.g. "@{}"). When the command gets too long, the Ninja file will then
+    replace the ``_response_file_argument`` in the command (defaults to "$in") with that syntax,
+    and the file will contain ``_response_file_content`` (defaults to the argument itself).
+
+    Executors for compilers set ``_compilation_database`` to True, so that their commands are
+    included in the generated "compile_commands.json".
+
+    Executors may set ``_inputs_transform`` to a function that is called with the phase and its
+    inputs when generating the Ninja file. It returns the inputs to build instead, and a dict
+    mapping each of those to the original inputs it stands for (they become its dependencies).
+
+    Commands are stored in the action cache (see :mod:`ronin.cache`) if it is enabled, unless the
+    executor sets ``_cache`` to False, which it should do if the command writes files other than
+    its output and deps file. Executors may also set ``_uncacheable_arguments`` to prefixes of
+    arguments with such effects (or that make the command read files that are not in its deps
+    file), in which case commands with those arguments are not cached.
+
+    Executors for compilers that can run via a compiler launcher (see :mod:`ronin.compiler_cache`)
+    set ``_compiler_launchers`` to the kinds of launchers they support (e.g. "ccache"), and may set
+    ``_compiler_launcher_variable`` to the environment variable with which their tool runs it.
+
+    Executors for tools that update an existing output rather than replace it (such as ``ar``) set
+    ``_remove_output`` to True, so that the output is deleted before the command runs (with
+    ``rm -f``, or by the launcher if it is used anyway, see :mod:`ronin.launcher`).
+
+    Executors whose actions should be limited by a pool unless their phase sets one (such as
+    link-time optimized links) set ``_default_pool`` to a function that returns the
+    :class:`~ronin.pools.Pool`, or None.
     """
     
     def __init__(self):
@@ -43,10 +74,22 @@ class Executor(object):
         self.hooks = StrictList(value_type='types.FunctionType')
         self._deps_file = None
         self._deps_type = None
+        self._response_file_format = None
+        self._response_file_argument = '$in'
+        self._response_file_content = None
+        self._compilation_database = False
+        self._inputs_transform = None
+        self._cache = True
+        self._uncacheable_arguments = ()
+        self._compiler_launchers = ()
+        self._compiler_launcher_variable = None
+        self._remove_output = False
+        self._default_pool = None
 
     def write_command(self, f, argument_filter=None):
-        for hook in self.hooks:
-            hook(self)
+        with trace_span('hooks', 'hooks'):
+            for hook in self.hooks:
+                hook(self)
         f.write(stringify(self.command))
     
     def command_as_str(self, argument_filter=None):
@@ -72,17 +115,23 @@ class ExecutorWithArguments(Executor):
         self._arguments = []
 
     def write_command(self, f, argument_filter=None):
-        super(ExecutorWithArguments, self).write_command(f, argument_filter)
-        arguments = []
-        for append, to_filter, argument in self._arguments:
-            argument = stringify(argument)
-            if to_filter and argument_filter:
-                argument = argument_filter(argument)
-            if append:
-                if argument not in arguments:
-                    arguments.append(argument)
-            else:
-                arguments.remove(argument)
+        # Arguments added by hooks apply only to this command, because the context might differ
+        # the next time
+        saved_arguments = list(self._arguments)
+        try:
+            super(ExecutorWithArguments, self).write_command(f, argument_filter)
+            arguments = []
+            for append, to_filter, argument in self._arguments:
+                argument = stringify(argument)
+                if to_filter and argument_filter:
+                    argument = argument_filter(argument)
+                if append:
+                    if argument not in arguments:
+                        arguments.append(argument)
+                else:
+                    arguments.remove(argument)
+        finally:
+            self._arguments = saved_arguments
         if arguments:
             f.write(' ')
             f.write(' '.join(arguments))
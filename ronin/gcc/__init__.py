@@ -14,22 +14,36 @@
 
 from __future__ import unicode_literals
 from ..executors import ExecutorWithArguments
+from ..extensions import Extension
 from ..contexts import current_context
 from ..projects import Project
+from ..phases import Phase
+from ..pools import Pool
+from ..compiler_cache import compiler_launcher, compiler_cache_base_path
 from ..utils.strings import stringify, stringify_list, bool_stringify, format_later, join_later
 from ..utils.paths import join_path, join_path_later
 from ..utils.platform import which, platform_command, platform_executable_extension, \
-    platform_shared_library_extension, platform_shared_library_prefix
-import os
+    platform_shared_library_extension, platform_shared_library_prefix, host_cpu_count
+from ..utils.types import verify_type, isclass
+from ..utils.messages import announce
+from subprocess import Popen, PIPE
+import os, io, copy, json, zlib, fnmatch, tempfile, shutil
 
 
 DEFAULT_GCC_COMMAND = 'gcc'
 DEFAULT_CCACHE_PATH = '/usr/lib/ccache'
+DEFAULT_LTO_LINKS = 1
+FAST_LINKERS = ('mold', 'lld', 'gold')
+FAST_LINKER_CACHE_NAME = '.ronin_fast_linker'
+DEFAULT_UNITY_FILES = 8
+UNITY_EXTENSIONS = ('.c', '.cc', '.cp', '.cpp', '.cxx', '.c++', '.C')
 
 
 def configure_gcc(gcc_command=None,
                   ccache=None,
-                  ccache_path=None):
+                  ccache_path=None,
+                  lto_jobs=None,
+                  lto_links=None):
     """
     Configures the current context's `gcc <https://gcc.gnu.org/>`__ support.
     
@@ -39,12 +53,19 @@ def configure_gcc(gcc_command=None,
     :type ccache: bool
     :param ccache_path: ccache path; defaults to "/usr/lib/ccache"
     :type ccache_path: str or ~types.FunctionType
+    :param lto_jobs: parallel LTRANS jobs per link-time optimized link, or "jobserver" to let gcc
+     use the Make jobserver; defaults to our jobs divided by ``lto_links``
+    :type lto_jobs: int or str or ~types.FunctionType
+    :param lto_links: how many link-time optimized links can run in parallel; defaults to 1
+    :type lto_links: int or ~types.FunctionType
     """
     
     with current_context(False) as ctx:
         ctx.gcc.gcc_command = gcc_command or DEFAULT_GCC_COMMAND
         ctx.gcc.ccache = ccache
         ctx.gcc.ccache_path = ccache_path or DEFAULT_CCACHE_PATH
+        ctx.gcc.lto_jobs = lto_jobs
+        ctx.gcc.lto_links = lto_links
 
 
 def which_gcc(command, ccache, platform, exception=True):
@@ -57,7 +78,8 @@ def which_gcc(command, ccache, platform, exception=True):
     :param command: ``gcc`` (or ``g++``, etc.) command
     :type command: str or ~types.FunctionType
     :param ccache: set to True to attempt to use ccache; if a ccache version is not found, will
-     silently try to use the standard gcc command
+     silently try to use the standard gcc command; ignored if a compiler launcher is configured
+     (see :mod:`ronin.compiler_cache`), which is used instead
     :type ccache: bool
     :param platform: target platform or project
     :type platform: str or ~types.FunctionType or ~ronin.projects.Project
@@ -73,7 +95,7 @@ def which_gcc(command, ccache, platform, exception=True):
     ccache = bool_stringify(ccache)
     if platform:
         command = gcc_platform_command(command, platform)
-    if ccache:
+    if ccache and (compiler_launcher() is None):
         with current_context() as ctx:
             ccache_path = stringify(ctx.get('gcc.ccache_path', DEFAULT_CCACHE_PATH))
         r = which(join_path(ccache_path, command), exception=False)
@@ -82,6 +104,122 @@ def which_gcc(command, ccache, platform, exception=True):
     return which(command, exception=exception)
 
 
+def which_gcc_tool(tool, command, platform, lto=True, exception=True):
+    """
+    Finds a binutils tool, such as ``ar`` or ``ranlib``, that matches a
+    `gcc <https://gcc.gnu.org/>`__ command.
+
+    With ``lto`` we use gcc's wrapper for the tool (e.g. "gcc-ar" for "gcc"), which loads the
+    linker plugin so that the tool can handle link-time optimized objects. Otherwise we use the
+    plain tool for the platform.
+
+    :param tool: tool, e.g. "ar", "nm" or "ranlib"
+    :type tool: str or ~types.FunctionType
+    :param command: ``gcc`` (or ``g++``, etc.) command
+    :type command: str or ~types.FunctionType
+    :param platform: target platform or project
+    :type platform: str or ~types.FunctionType or ~ronin.projects.Project
+    :param lto: set to True to use gcc's wrapper for the tool
+    :type lto: bool
+    :param exception: set to False in order to return None upon failure, instead of raising an
+     exception
+    :type exception: bool
+    :returns: absolute path to command
+    :rtype: str
+    :raises ~ronin.utils.platform.WhichException: if ``exception`` is True and could not find
+     command
+    """
+
+    tool = stringify(tool)
+    if bool_stringify(lto):
+        command = stringify(command)
+        if platform:
+            command = gcc_platform_command(command, platform)
+        return which('{}-{}'.format(command.replace('g++', 'gcc'), tool), exception=exception)
+    if platform:
+        tool = gcc_platform_command(tool, platform)
+    return which(tool, exception=exception)
+
+
+def gcc_lto_jobs(pool):
+    """
+    The number of parallel LTRANS jobs for a link-time optimized link, according to the context's
+    ``gcc.lto_jobs``. By default we divide our jobs (see :func:`~ronin.ninja.build_jobs`) among
+    the links that can run in parallel in the pool, so that together they do not oversubscribe
+    the machine.
+
+    :param pool: pool of the link phase
+    :type pool: ~ronin.pools.Pool
+    :returns: number of jobs, or "jobserver"
+    :rtype: int or str
+    """
+
+    from ..ninja import build_jobs
+    with current_context() as ctx:
+        jobs = stringify(ctx.get('gcc.lto_jobs'))
+    if jobs == 'jobserver':
+        return jobs
+    if jobs is not None:
+        return int(jobs)
+    jobs = build_jobs() or host_cpu_count()
+    depth = int(stringify(pool.depth)) if pool is not None else 1
+    return max(1, jobs // max(1, depth))
+
+
+def gcc_fast_linker(command):
+    """
+    Finds the fastest linker that works with a `gcc <https://gcc.gnu.org/>`__ command, trying
+    :data:`FAST_LINKERS` in order by linking an empty program with each.
+
+    The result is cached in :data:`FAST_LINKER_CACHE_NAME` in the context's ``paths.output``
+    until the command changes.
+
+    :param command: absolute path to ``gcc`` (or ``g++``, etc.) command
+    :type command: str or ~types.FunctionType
+    :returns: linker for ``-fuse-ld``, or None if none of them work
+    :rtype: str
+    """
+
+    command = stringify(command)
+    if command in _fast_linkers:
+        return _fast_linkers[command]
+
+    with current_context() as ctx:
+        cache_path = join_path(ctx.get('paths.output'), FAST_LINKER_CACHE_NAME)
+    try:
+        mtime = os.stat(os.path.realpath(command)).st_mtime
+    except OSError:
+        mtime = None
+    try:
+        with io.open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        cache = {}
+
+    entry = cache.get(command)
+    if (entry is not None) and (entry.get('mtime') == mtime):
+        linker = entry.get('linker')
+    else:
+        linker = None
+        for candidate in FAST_LINKERS:
+            if _probe_linker(command, candidate):
+                linker = candidate
+                break
+        cache[command] = {'mtime': mtime, 'linker': linker}
+        try:
+            directory = os.path.dirname(cache_path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with io.open(cache_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(cache, ensure_ascii=False))
+        except (IOError, OSError):
+            # The cache is only an optimization
+            pass
+
+    _fast_linkers[command] = linker
+    return linker
+
+
 def gcc_platform_command(command, platform):
     """
     Finds the `gcc <https://gcc.gnu.org/>`__ command name for a specific target platform. 
@@ -151,6 +289,13 @@ class GccExecutor(ExecutorWithArguments):
         self.add_argument_unfiltered('$in')
         self.add_argument_unfiltered('-o', '$out')
         self._platform = platform
+        self._response_file_format = '@{}'
+        self._fast_link = False
+        self._uncacheable_arguments = ('-gsplit-dwarf', '-fprofile-generate', '-fprofile-use',
+                                       '-fprofile-arcs', '-ftest-coverage', '--coverage',
+                                       '-save-temps')
+        self._compiler_launchers = ('ccache', 'sccache')
+        self.hooks.append(_prefix_map_hook)
 
     def enable_threads(self):
         self.add_argument('-pthread') # both compiler flags and linker libraries
@@ -198,7 +343,64 @@ class GccExecutor(ExecutorWithArguments):
 
     def pic(self, compact=False):
         self.add_argument('-fpic' if compact else '-fPIC')
+
+    def map_file_prefix(self, old, new='.'):
+        """
+        Replaces a path prefix in the outputs (debug information, ``__FILE__``, etc.), so that they
+        do not depend on where the sources are.
+
+        :param old: path prefix
+        :type old: str or ~types.FunctionType
+        :param new: replacement
+        :type new: str or ~types.FunctionType
+        """
+
+        self.add_argument(format_later('-ffile-prefix-map={old}={new}', old=old, new=new))
+
+    def enable_lto(self, jobs=None):
+        """
+        Enables link-time optimization. Must be enabled for both compiling and linking.
+
+        Also see the context's ``build.lto``, which enables it for all gcc executors.
+
+        :param jobs: for linking, the number of parallel LTRANS jobs, "auto" to let gcc decide,
+         or "jobserver" to let gcc use the Make jobserver
+        :type jobs: int or str or ~types.FunctionType
+        """
+
+        if jobs is None:
+            self.add_argument('-flto')
+        else:
+            self.add_argument(format_later('-flto={}', jobs))
     
+    def profile_generate(self, path):
+        """
+        Instruments the code to write profiles for profile-guided optimization (see
+        :func:`~ronin.pgo.pgo`). Must be enabled for both compiling and linking.
+
+        :param path: profiles path
+        :type path: str or ~types.FunctionType
+        """
+
+        self.add_argument(format_later('-fprofile-generate={}', path))
+        self.add_argument('-fprofile-update=prefer-atomic')
+
+    def profile_use(self, path, partial_training=True):
+        """
+        Optimizes the code using profiles written by an instrumented build (see
+        :func:`~ronin.pgo.pgo`).
+
+        :param path: profiles path
+        :type path: str or ~types.FunctionType
+        :param partial_training: set to False to optimize code that was not run during training
+         for size rather than for speed
+        :type partial_training: bool
+        """
+
+        self.add_argument(format_later('-fprofile-use={}', path))
+        if partial_training:
+            self.add_argument('-fprofile-partial-training')
+
     # Linker
 
     def add_input(self, value):
@@ -221,6 +423,20 @@ class GccExecutor(ExecutorWithArguments):
     def use_linker(self, value):
         self.add_argument(format_later('-fuse-ld={}', value))
 
+    def enable_fast_link(self):
+        """
+        Links with the fastest linker available (see :func:`gcc_fast_linker`), with threads.
+
+        In debug builds (the context's ``build.debug``) also splits the debug information out of
+        the objects (``-gsplit-dwarf``) and has the linker create a ``.gdb_index`` section, so
+        that it moves far less data and the debugger starts faster. Compile phases whose outputs
+        are inputs of our phase (see ``inputs_from``) are split, too.
+        """
+
+        self._fast_link = True
+        if _fast_link_hook not in self.hooks:
+            self.hooks.append(_fast_link_hook)
+
     def link_static_only(self):
         self.add_argument('-static')
 
@@ -355,12 +571,16 @@ class GccBuild(_GccWithMakefile):
 
         super(GccBuild, self).__init__(command, ccache, platform)
         self.command_types = ['gcc_compile', 'gcc_link']
+        self._compilation_database = True
         if platform is not None:
             if isinstance(self._platform, Project):
                 self.output_extension = lambda _: self._platform.executable_extension
             else:
                 self.output_extension = lambda _: platform_executable_extension(platform)
         self.hooks.append(_debug_hook)
+        self.hooks.append(_lto_hook)
+        self.hooks.append(_pgo_hook)
+        self._default_pool = _lto_pool
 
 
 class GccCompile(_GccWithMakefile):
@@ -385,8 +605,46 @@ class GccCompile(_GccWithMakefile):
         self.command_types = ['gcc_compile']
         self.output_type = 'object'
         self.output_extension = 'o'
+        self._compilation_database = True
         self.compile_only()
         self.hooks.append(_debug_hook)
+        self.hooks.append(_lto_hook)
+        self.hooks.append(_pgo_hook)
+        self.hooks.append(_split_dwarf_hook)
+
+    def enable_unity(self, files=None, size=None, by_directory=True, exclude=None):
+        """
+        Enables unity (a.k.a. "jumbo") builds: instead of compiling the source files one by one,
+        we generate bundle source files that ``#include`` several of them each, and compile those.
+        Headers shared by the sources are then parsed once per bundle rather than once per source.
+
+        The bundles are generated into a "unity" directory in the phase's ``output_path``, and
+        are only rewritten if their content changed. Sources are bundled only with others in the
+        same directory (unless ``by_directory`` is False) and with the same extension.
+
+        Bundle membership is stable: whether a bundle ends after a source depends on a hash of
+        that source's path, so that adding or removing a source only changes its own bundle,
+        rather than reshuffling all the ones after it. The exception is ``size``, which depends
+        on the sources' sizes and so may move sources between neighboring bundles as they grow.
+
+        Note that the sources in a bundle share a translation unit, so that ``static`` names and
+        macros in one source can clash with those in the others. Use ``exclude`` to opt out such
+        sources, which will then be compiled on their own.
+
+        :param files: average number of sources per bundle (at most twice this); defaults to
+         :data:`DEFAULT_UNITY_FILES`
+        :type files: int
+        :param size: also end bundles once their sources reach this total size in bytes
+        :type size: int
+        :param by_directory: set to False to bundle sources from different directories together
+        :type by_directory: bool
+        :param exclude: sources to compile on their own; :mod:`fnmatch` patterns matched against
+         the source path relative to the phase's ``input_path`` and against its filename
+        :type exclude: [:obj:`str`]
+        """
+
+        self._inputs_transform = _Unity(files or DEFAULT_UNITY_FILES, size, by_directory,
+                                        exclude)
 
 
 class GccLink(GccExecutor):
@@ -410,11 +668,154 @@ class GccLink(GccExecutor):
 
         super(GccLink, self).__init__(command, ccache, platform)
         self.command_types = ['gcc_link']
+        self._compiler_launchers = () # linking is not cached
         if platform is not None:
             if isinstance(self._platform, Project):
                 self.output_extension = lambda _: self._platform.executable_extension
             else:
                 self.output_extension = lambda _: platform_executable_extension(platform)
+        self.hooks.append(_lto_hook)
+        self.hooks.append(_pgo_hook)
+        self._default_pool = _lto_pool
+
+
+class GccArchive(ExecutorWithArguments):
+    """
+    ``ar`` executor for static libraries of objects compiled by `gcc <https://gcc.gnu.org/>`__.
+
+    The phase inputs are ".o" object files. The phase output is a static library (".a"), which
+    can be an input of a :class:`GccLink` phase.
+
+    If the context's ``build.lto`` is enabled we use gcc's wrapper (e.g. "gcc-ar", see
+    :func:`which_gcc_tool`), so that the symbol index covers link-time optimized objects.
+
+    Thin archives contain only the paths of the objects and the symbol index, instead of copies
+    of the objects, so they are much faster to write. However, they cannot be used without the
+    objects, so they are only suitable for libraries used within the build.
+    """
+
+    def __init__(self, command=None, thin=False, deterministic=True, incremental=False,
+                 platform=None):
+        """
+        :param command: ``gcc`` (or ``g++``, etc.) command with which to match ``ar``; defaults to
+         the context's ``gcc.gcc_command``
+        :type command: str or ~types.FunctionType
+        :param thin: set to True to create a thin archive
+        :type thin: bool
+        :param deterministic: set to False to store the real timestamps, owners and modes of the
+         members, which makes the archive differ between otherwise identical builds
+        :type deterministic: bool
+        :param incremental: set to True to update the existing archive instead of recreating it;
+         faster for large fat archives, but members of objects that are no longer inputs remain
+         until the archive is cleaned
+        :type incremental: bool
+        :param platform: target platform or project
+        :type platform: str or ~types.FunctionType or ~ronin.projects.Project
+        """
+
+        super(GccArchive, self).__init__()
+        self.command = lambda ctx: which_gcc_tool('ar',
+                                                  ctx.fallback(command, 'gcc.gcc_command',
+                                                               DEFAULT_GCC_COMMAND),
+                                                  platform,
+                                                  lto=ctx.get('build.lto', False))
+        self.command_types = ['gcc_archive']
+        self.output_extension = 'a'
+        self.output_prefix = 'lib'
+        operation = 'rcs'
+        if deterministic:
+            operation += 'D'
+        if thin:
+            operation += 'T'
+        self.add_argument_unfiltered(operation)
+        self.add_argument_unfiltered('$out')
+        self.add_argument_unfiltered('$in')
+        self._response_file_format = '@{}'
+        self._remove_output = not incremental
+
+
+class PrecompiledHeader(Extension):
+    """
+    Precompiles a header for a :class:`GccCompile` phase, and includes it before every source.
+
+    Adds a phase named "[phase name] pch" to the project, which compiles the header into a ".gch"
+    file with the same executor arguments and extensions. Our phase then rebuilds when the ".gch"
+    changes, and the ".gch" itself rebuilds when the header or anything it includes changes.
+
+    Note that gcc will silently ignore the precompiled header if it was compiled with different
+    arguments (we enable a warning for this) or as a different language. By default the
+    language is determined by the header's extension and the compiler: ``g++`` treats ".h" files
+    as C++ headers, but ``gcc`` does not.
+    """
+
+    def __init__(self, header, language=None):
+        """
+        :param header: header path; note that this should be an *absolute* path
+        :type header: str or ~types.FunctionType
+        :param language: "c-header" or "c++-header"; defaults to the compiler's choice
+        :type language: str or ~types.FunctionType
+        """
+
+        super(PrecompiledHeader, self).__init__()
+        self.header = header
+        self.language = language
+        self._include = None
+
+    def apply_to_phase(self, phase):
+        verify_type(phase.executor, GccCompile)
+        with current_context() as ctx:
+            project = ctx.current.project
+        phase_name = project.get_phase_name(phase)
+        if phase_name is None:
+            raise ValueError('precompiled header phase is not in the project')
+        header = stringify(self.header)
+        output_path = join_path(phase.output_path, 'pch')
+        self._include = join_path(output_path, os.path.basename(header))
+
+        pch_name = '{} pch'.format(phase_name)
+        if pch_name not in project.phases:
+            executor = copy.copy(phase.executor)
+            executor._arguments = list(phase.executor._arguments)
+            executor._inputs_transform = None
+            executor._compilation_database = False
+            executor.output_extension = None
+            language = stringify(self.language)
+            if language is not None:
+                # Must come before "$in"
+                executor._arguments.insert(0, (True, False, '-x {}'.format(language)))
+            Phase(project=project,
+                  name=pch_name,
+                  executor=executor,
+                  inputs=[header],
+                  extensions=[_ExecutorExtensions([v for v in phase.extensions
+                                                   if v is not self])],
+                  output=os.path.basename(header) + '.gch',
+                  output_path=output_path)
+
+        # gcc does not list the ".gch" in our deps file, so it must be an implicit dependency
+        # rather than an order-only one
+        if pch_name not in phase.rebuild_on_from:
+            phase.rebuild_on_from.append(pch_name)
+
+    def apply_to_executor_gcc_compile(self, executor):
+        if self._include is not None:
+            executor.add_argument('-include', self._include)
+            executor.enable_warning('invalid-pch')
+
+
+class _ExecutorExtensions(Extension):
+    # Applies only the executor side of other extensions
+
+    def __init__(self, extensions):
+        super(_ExecutorExtensions, self).__init__()
+        self._wrapped = extensions
+
+    def apply_to_executor(self, executor):
+        for extension in self._wrapped:
+            if isclass(extension):
+                extension = extension()
+            extension.apply_to_executor(executor)
+            _ExecutorExtensions(extension.extensions).apply_to_executor(executor)
 
 
 def _debug_hook(executor):
@@ -422,3 +823,187 @@ def _debug_hook(executor):
         if ctx.get('build.debug', False):
             executor.enable_debug()
             executor.optimize('g')
+
+
+def _prefix_map_hook(executor):
+    base_path = compiler_cache_base_path()
+    if base_path is not None:
+        executor.map_file_prefix(base_path)
+
+
+def _lto_hook(executor):
+    with current_context() as ctx:
+        if not bool_stringify(ctx.get('build.lto', False)):
+            return
+        phase = ctx.get('current.phase')
+    if 'gcc_link' not in executor.command_types:
+        executor.enable_lto()
+        return
+    if phase is not None:
+        # The pool that the Ninja file will use (see _lto_pool)
+        executor.enable_lto(gcc_lto_jobs(phase.pool if phase.pool is not None else _lto_pool()))
+    else:
+        executor.enable_lto('auto')
+
+
+def _lto_pool():
+    # LTO links use a lot of CPU and memory (see Executor._default_pool)
+    with current_context() as ctx:
+        if not bool_stringify(ctx.get('build.lto', False)):
+            return None
+        links = ctx.get('gcc.lto_links', DEFAULT_LTO_LINKS)
+    return Pool('lto', links)
+
+
+class _Unity(object):
+    # Bundles sources for GccCompile.enable_unity (see Executor._inputs_transform)
+
+    def __init__(self, files, size, by_directory, exclude):
+        self.files = files
+        self.size = size
+        self.by_directory = by_directory
+        self.exclude = stringify_list(exclude) if exclude else []
+
+    def __call__(self, phase, inputs):
+        input_path = os.path.join(stringify(phase.input_path), '')
+        unity_path = join_path(phase.output_path, 'unity')
+
+        # Group sources by directory and extension
+        new_inputs = []
+        groups = {}
+        for the_input in inputs:
+            relative = the_input[len(input_path):] if the_input.startswith(input_path) \
+                else the_input
+            extension = os.path.splitext(the_input)[1]
+            if (extension not in UNITY_EXTENSIONS) or self._excluded(relative):
+                new_inputs.append(the_input)
+                continue
+            directory = os.path.dirname(relative) if self.by_directory else ''
+            groups.setdefault((directory, extension), []).append((relative, the_input))
+
+        members = {}
+        for (directory, extension), sources in sorted(groups.items()):
+            for bundle in self._bundles(sorted(sources)):
+                if len(bundle) == 1:
+                    # No point in bundling a single source
+                    new_inputs.append(bundle[0][1])
+                    continue
+                first = os.path.splitext(bundle[0][0])[0]
+                first = os.path.basename(first) if self.by_directory \
+                    else first.replace(os.sep, '-')
+                path = join_path(unity_path, directory, 'unity-{}{}'.format(first, extension))
+                _write_bundle(path, [v[1] for v in bundle])
+                new_inputs.append(path)
+                members[path] = [v[1] for v in bundle]
+        return new_inputs, members
+
+    def _bundles(self, sources):
+        bundle = []
+        bundle_size = 0
+        for relative, the_input in sources:
+            bundle.append((relative, the_input))
+            if self.size is not None:
+                try:
+                    bundle_size += os.path.getsize(the_input)
+                except OSError:
+                    pass
+            if ((zlib.crc32(relative.encode('utf-8')) & 0xffffffff) % self.files == 0) or \
+                (len(bundle) >= self.files * 2) or \
+                ((self.size is not None) and (bundle_size >= self.size)):
+                yield bundle
+                bundle = []
+                bundle_size = 0
+        if bundle:
+            yield bundle
+
+    def _excluded(self, relative):
+        filename = os.path.basename(relative)
+        for pattern in self.exclude:
+            if fnmatch.fnmatchcase(relative, pattern) or fnmatch.fnmatchcase(filename, pattern):
+                return True
+        return False
+
+
+def _write_bundle(path, sources):
+    directory = os.path.dirname(path)
+    content = '// Unity bundle generated by Ronin\n\n'
+    for source in sources:
+        source = os.path.relpath(os.path.abspath(source), os.path.abspath(directory))
+        content += '#include "{}"\n'.format(source.replace(os.sep, '/').replace('"', '\\"'))
+    if os.path.isfile(path):
+        with io.open(path, encoding='utf-8') as f:
+            if f.read() == content:
+                return
+    elif not os.path.isdir(directory):
+        os.makedirs(directory)
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    announce("Unity bundle written to '{}'".format(path))
+
+
+def _pgo_hook(executor):
+    with current_context() as ctx:
+        mode = stringify(ctx.get('build.pgo'))
+        if mode is None:
+            return
+        path = ctx.get('build.pgo_path')
+        if path is None:
+            path = join_path(ctx.paths.output, 'pgo-profiles')
+    if mode == 'generate':
+        executor.profile_generate(path)
+    elif mode == 'use':
+        executor.profile_use(path)
+    else:
+        raise ValueError('"build.pgo" must be "generate" or "use": "{}"'.format(mode))
+
+
+def _fast_link_hook(executor):
+    with current_context() as ctx:
+        debug = ctx.get('build.debug', False)
+        lto = bool_stringify(ctx.get('build.lto', False))
+    linker = gcc_fast_linker(stringify(executor.command))
+    if linker is not None:
+        executor.use_linker(linker)
+        if linker == 'gold':
+            # mold and lld use threads by default
+            executor.add_linker_argument('--threads')
+        if debug:
+            executor.add_linker_argument('--gdb-index')
+    if debug and (not lto) and ('gcc_compile' in executor.command_types):
+        # The DWARF of link-time optimized code is generated when linking, so it cannot be split
+        executor.add_argument('-gsplit-dwarf')
+
+
+def _split_dwarf_hook(executor):
+    # Split DWARF for compile phases feeding phases with GccExecutor.enable_fast_link
+    with current_context() as ctx:
+        if (not ctx.get('build.debug', False)) or bool_stringify(ctx.get('build.lto', False)):
+            return
+        project = ctx.get('current.project')
+        phase = ctx.get('current.phase')
+        phase_name = ctx.get('current.phase_name')
+    if (project is None) or (phase is None):
+        return
+    for p in project.phases.values():
+        if isinstance(p.executor, GccExecutor) and p.executor._fast_link:
+            for value in p.inputs_from:
+                if (value is phase) or (stringify(value) == phase_name):
+                    executor.add_argument('-gsplit-dwarf')
+                    return
+
+
+def _probe_linker(command, linker):
+    directory = tempfile.mkdtemp(prefix='ronin-')
+    try:
+        process = Popen([command, '-fuse-ld={}'.format(linker), '-x', 'c', '-',
+                         '-o', os.path.join(directory, 'probe')],
+                        stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        process.communicate(b'int main(void) { return 0; }\n')
+        return process.returncode == 0
+    except OSError:
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+_fast_linkers = {}
@@ -54,6 +54,8 @@ class GoExecutor(ExecutorWithArguments):
         self.command = lambda ctx: which(ctx.fallback(command, 'go.go_command',
                                                       DEFAULT_GO_COMMAND))
         self.command_types = ['go']
+        self._response_file_format = '@{}'
+        self._response_file_content = '$in_newline' # one argument per line
 
 
 class GoCompile(GoExecutor):
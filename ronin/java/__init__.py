@@ -64,6 +64,8 @@ class JavaCompile(ExecutorWithArguments):
         self.output_type = 'object'
         self.output_extension = 'class'
         self.add_argument_unfiltered('$in')
+        self._response_file_format = '@{}'
+        self._cache = False # inner classes are written to their own files
         self.hooks.append(_debug_hook)
         self.hooks.append(_compile_hook)
         self.hooks.append(_classpath_hook)
@@ -96,6 +98,8 @@ class Jar(ExecutorWithArguments):
         self.command_types = ['java_jar']
         self.output_type = 'binary'
         self.output_extension = 'jar'
+        self._response_file_format = '@{}'
+        self._response_file_argument = '$inputs' # see JavaClasses
         if manifest:
             self.add_argument_unfiltered('cfm')
             self.add_argument_unfiltered('$out')
@@ -0,0 +1,849 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This module is run by Ninja as a standalone script (see ronin.launcher_log), so it must only
+# depend on the Python standard library. For the same reason it should import as little as
+# possible: it is started for every action.
+
+from __future__ import unicode_literals
+from subprocess import Popen
+import sys, os, io, re, json, stat, errno, time
+
+
+CACHE_VERSION = 2
+CACHE_MANIFEST_ENTRIES = 16
+COMPILER_LAUNCHERS = ('ccache', 'sccache', 'distcc', 'icecc')
+CACHE_ADDED_NAME = 'added' # must match ronin.cache
+BASE_TOKEN = '${base}'
+
+DEFAULT_REMOTE_TIMEOUT = 10.0
+REMOTE_UPLOAD_THREADS = 4
+REMOTE_RETRY_DELAY = 60
+REMOTE_DOWN_NAME = 'remote-down'
+
+
+class ActionCache(object):
+    """
+    Content-addressed store of action outputs.
+
+    An action's key is a hash of its command line, the working directory, the executables it runs
+    (see :meth:`hash_tool`), an optional salt, and the contents of its inputs. Because the
+    dependencies discovered by the command (in its deps file) are only known after running it,
+    the key leads to a manifest listing the dependencies of previous runs with their hashes. If
+    all the dependencies of one of those runs still have the same hashes, we restore its outputs
+    (including the deps file, which Ninja reads) instead of running the command.
+
+    With a base path (usually the project's root) the paths under it in the key, the manifests and
+    the deps file are stored relative to it, so that checkouts in different directories (e.g. on
+    different machines) share entries.
+
+    The cache is thus as correct as the dependency information that Ninja itself has. Note that
+    the output of the command (e.g. warnings) is not stored.
+
+    Files are touched when used, so that :func:`~ronin.cache.evict` can remove the least recently
+    used ones.
+
+    With a :class:`RemoteCache`, actions that are not in the local cache are looked up in the
+    remote cache, and the blobs of the run we restore are downloaded into the local cache. Stored
+    actions are also uploaded to the remote cache. If the remote cache fails we continue without
+    it, and stop using it for :data:`REMOTE_RETRY_DELAY` seconds (in all actions that use this
+    cache path).
+    """
+
+    def __init__(self, path, remote=None, upload=True, salt=None, base=None):
+        """
+        :param path: cache path
+        :type path: str
+        :param remote: remote cache
+        :type remote: :class:`RemoteCache`
+        :param upload: set to False to only read from the remote cache
+        :type upload: bool
+        :param salt: value to include in action keys
+        :type salt: str
+        :param base: absolute base path
+        :type base: str
+        """
+
+        self.path = path
+        self.remote = remote
+        self.upload = upload
+        self.salt = salt
+        self.base = base.rstrip('/\\') if base else None
+        self._base_pattern = re.compile(re.escape(self.base) + r'(?=[/\\=:;,\s]|$)') \
+            if self.base else None
+        self._hashes = {}
+        if (remote is not None) and self._remote_down():
+            self.remote = None
+
+    def key(self, command, inputs):
+        """
+        :param command: command arguments
+        :type command: [str]
+        :param inputs: input paths
+        :type inputs: [str]
+        :returns: action key
+        :rtype: str
+        """
+
+        tools = [self.hash_tool(v) for v in _command_tools(command)]
+        h = _sha256()
+        h.update(json.dumps([CACHE_VERSION, self.salt, self.relativize(os.getcwd()),
+                             [self.relativize(v) for v in command], tools],
+                            ensure_ascii=False).encode('utf-8'))
+        for path in inputs:
+            h.update(b'\0')
+            h.update(self.relativize(path).encode('utf-8'))
+            h.update(b'\0')
+            h.update(self.hash_file(path).encode('utf-8'))
+        # Response files (gcc syntax) stand for their content
+        for argument in command:
+            if argument.startswith('@') and os.path.isfile(argument[1:]):
+                for path in _response_file_paths(argument[1:]):
+                    h.update(b'\0')
+                    h.update(self.hash_file(path).encode('utf-8'))
+        return h.hexdigest()
+
+    def hash_file(self, path):
+        """
+        :param path: file path
+        :type path: str
+        :returns: hash of the file's content, or "-" if it is not a file
+        :rtype: str
+        """
+
+        h = self._hashes.get(path)
+        if h is None:
+            h = _hash_file(path)
+            self._hashes[path] = h
+        return h
+
+    def relativize(self, value):
+        """
+        :param value: value
+        :type value: str
+        :returns: the value with the base path replaced by :data:`BASE_TOKEN`
+        :rtype: str
+        """
+
+        if self._base_pattern is None:
+            return value
+        return self._base_pattern.sub(lambda _: BASE_TOKEN, value)
+
+    def absolutize(self, value):
+        """
+        :param value: value returned by :meth:`relativize`
+        :type value: str
+        :returns: the value with :data:`BASE_TOKEN` replaced by the base path
+        :rtype: str
+        """
+
+        if self.base is None:
+            return value
+        return value.replace(BASE_TOKEN, self.base)
+
+    def hash_tool(self, command):
+        """
+        Identifies an executable by its content, so that actions are not restored from the cache
+        after it is upgraded. The hash is remembered (in the cache) for as long as the file's size
+        and modification time stay the same.
+
+        :param command: executable name (looked up in the ``PATH``) or path
+        :type command: str
+        :returns: hash of the executable's content, or "-" if it is not found
+        :rtype: str
+        """
+
+        path = _which(command)
+        if path is None:
+            return '-'
+        path = os.path.realpath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return '-'
+        stamp = [st.st_size, st.st_mtime]
+        tool_path = self._path('tools', _sha256(path.encode('utf-8')).hexdigest())
+        tool = _read_json(tool_path)
+        if isinstance(tool, dict) and (tool.get('stamp') == stamp):
+            return tool['hash']
+        h = self.hash_file(path)
+        _write_json(tool_path, {'path': path, 'stamp': stamp, 'hash': h})
+        return h
+
+    def restore(self, key, outputs):
+        """
+        Restores the outputs of a previous run of the action, if its dependencies are unchanged.
+
+        :param key: action key
+        :type key: str
+        :param outputs: output paths (the first is the output, the second is the deps file)
+        :type outputs: [str]
+        :returns: True if restored
+        :rtype: bool
+        """
+
+        manifest_path = self._path('manifests', key)
+        manifest = _read_json(manifest_path) or []
+        for entry in manifest:
+            if self._restore_entry(entry, outputs):
+                _touch(manifest_path)
+                return True
+
+        if self.remote is None:
+            return False
+        try:
+            remote_manifest = self.remote.get_manifest(key)
+            for entry in remote_manifest:
+                if not self._matches(entry, outputs):
+                    continue
+                added = 0
+                for f in entry['files']:
+                    blob = self._path('blobs', f['hash'])
+                    if not os.path.isfile(blob):
+                        if not self.remote.download(f['hash'], blob):
+                            break
+                        added += os.path.getsize(blob)
+                else:
+                    if self._restore_entry(entry, outputs):
+                        _write_json(manifest_path, _merge_manifest(manifest, entry))
+                        self._added(added + os.path.getsize(manifest_path))
+                        return True
+        except RemoteCacheError as ex:
+            self._remote_failed(ex)
+        return False
+
+    def store(self, key, outputs, dependencies):
+        """
+        Stores the outputs of a successful run of the action.
+
+        :param key: action key
+        :type key: str
+        :param outputs: output paths (the first is the output, the second is the deps file)
+        :type outputs: [str]
+        :param dependencies: dependency paths discovered by the command
+        :type dependencies: [str]
+        """
+
+        files = []
+        added = 0
+        for index, output in enumerate(outputs):
+            if (index == 1) and (self.base is not None):
+                # The deps file lists paths
+                try:
+                    with io.open(output, 'rb') as f:
+                        data = f.read()
+                except (IOError, OSError):
+                    return
+                data = self._relativize_bytes(data)
+                h = _sha256(data).hexdigest()
+                blob = self._path('blobs', h)
+                if not os.path.isfile(blob):
+                    _write_bytes(blob, data)
+                    added += len(data)
+            else:
+                h = _hash_file(output)
+                if h == '-':
+                    return
+                blob = self._path('blobs', h)
+                if not os.path.isfile(blob):
+                    _copy(output, blob)
+                    added += os.path.getsize(blob)
+            _touch(blob)
+            files.append({'hash': h, 'mode': stat.S_IMODE(os.stat(output).st_mode)})
+
+        entry = {
+            'dependencies': dict((self.relativize(path), self.hash_file(path))
+                                 for path in dependencies),
+            'files': files}
+        manifest_path = self._path('manifests', key)
+        _write_json(manifest_path, _merge_manifest(_read_json(manifest_path) or [], entry))
+        self._added(added + os.path.getsize(manifest_path))
+
+        if (self.remote is None) or not self.upload:
+            return
+        try:
+            # The blobs must be there before the manifest refers to them
+            errors = _parallel([(self.remote.upload, (v['hash'], self._path('blobs', v['hash'])))
+                                for v in files], REMOTE_UPLOAD_THREADS)
+            if errors:
+                raise errors[0]
+            self.remote.put_manifest(key, _merge_manifest(self.remote.get_manifest(key), entry))
+        except RemoteCacheError as ex:
+            self._remote_failed(ex)
+
+    def _matches(self, entry, outputs):
+        dependencies = entry.get('dependencies') or {}
+        if any(self.hash_file(self.absolutize(path)) != h for path, h in dependencies.items()):
+            return False
+        return len(entry.get('files') or []) == len(outputs)
+
+    def _restore_entry(self, entry, outputs):
+        if not self._matches(entry, outputs):
+            return False
+        files = entry['files']
+        blobs = [self._path('blobs', v['hash']) for v in files]
+        if not all(os.path.isfile(v) for v in blobs):
+            return False
+        for index, (output, blob, f) in enumerate(zip(outputs, blobs, files)):
+            if (index == 1) and (self.base is not None):
+                # The deps file lists paths
+                with io.open(blob, 'rb') as b:
+                    _write_bytes(output, self._absolutize_bytes(b.read()))
+            else:
+                _copy(blob, output, f.get('mode'))
+            _touch(blob)
+        return True
+
+    def _relativize_bytes(self, data):
+        # Deps files escape spaces in paths
+        base = re.escape(self.base.replace(' ', '\\ ').encode('utf-8'))
+        token = BASE_TOKEN.encode('utf-8')
+        return re.sub(base + br'(?=[/\\\s:]|$)', lambda _: token, data)
+
+    def _absolutize_bytes(self, data):
+        return data.replace(BASE_TOKEN.encode('utf-8'),
+                            self.base.replace(' ', '\\ ').encode('utf-8'))
+
+    def _remote_down(self):
+        try:
+            return time.time() - os.path.getmtime(os.path.join(self.path, REMOTE_DOWN_NAME)) < \
+                REMOTE_RETRY_DELAY
+        except OSError:
+            return False
+
+    def _remote_failed(self, ex):
+        sys.stderr.write('ronin launcher: remote cache error (not using it for {:d} seconds): {}\n'
+                         .format(REMOTE_RETRY_DELAY, ex))
+        self.remote = None
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            with io.open(os.path.join(self.path, REMOTE_DOWN_NAME), 'wb'):
+                pass
+        except (IOError, OSError):
+            pass
+
+    def _added(self, size):
+        # Counted so that eviction need not walk the cache after every build (see
+        # ronin.cache.maybe_evict)
+        _append(os.path.join(self.path, CACHE_ADDED_NAME), size)
+
+    def _path(self, kind, h):
+        return os.path.join(self.path, kind, h[:2], h)
+
+
+class RemoteCache(object):
+    """
+    Client for a remote cache that uses the REST layout of `Bazel's HTTP caching protocol
+    <https://bazel.build/remote/caching#http-caching>`__: "ac/" followed by the action key for
+    manifests (see :class:`ActionCache`), and "cas/" followed by the SHA-256 of the content for
+    blobs, both relative to the base URL. Entries are read with GET (a 404 means a miss) and
+    written with PUT.
+
+    Any HTTP server that supports these methods can be used, such as nginx with WebDAV,
+    bazel-remote, or :mod:`ronin.cache_server`. Note that the manifests are JSON, not Bazel's
+    protocol buffers, so the cache cannot be shared with Bazel itself.
+
+    Because action keys include the working directory and the command line, hits require that the
+    builds use the same paths relative to the base path of the :class:`ActionCache`.
+    """
+
+    def __init__(self, url, timeout=None):
+        """
+        :param url: base URL
+        :type url: str
+        :param timeout: timeout for each request in seconds; defaults to
+         :data:`DEFAULT_REMOTE_TIMEOUT`
+        :type timeout: float
+        """
+
+        self.url = url.rstrip('/')
+        self.timeout = timeout if timeout is not None else DEFAULT_REMOTE_TIMEOUT
+
+    def get_manifest(self, key):
+        """
+        :param key: action key
+        :type key: str
+        :returns: manifest (empty if not found)
+        :rtype: list
+        :raises RemoteCacheError: if the request failed
+        """
+
+        data = self._request('GET', 'ac', key)
+        if data is None:
+            return []
+        try:
+            manifest = json.loads(data.decode('utf-8'))
+        except ValueError:
+            # Not ours
+            return []
+        return manifest if isinstance(manifest, list) else []
+
+    def put_manifest(self, key, manifest):
+        """
+        :param key: action key
+        :type key: str
+        :param manifest: manifest
+        :type manifest: list
+        :raises RemoteCacheError: if the request failed
+        """
+
+        self._request('PUT', 'ac', key,
+                      json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+    def download(self, h, path):
+        """
+        Downloads a blob, verifying its hash.
+
+        :param h: content hash
+        :type h: str
+        :param path: destination path
+        :type path: str
+        :returns: True if downloaded, False if not found
+        :rtype: bool
+        :raises RemoteCacheError: if the request failed
+        """
+
+        data = self._request('GET', 'cas', h)
+        if data is None:
+            return False
+        if _sha256(data).hexdigest() != h:
+            raise RemoteCacheError('corrupt blob: {}'.format(h))
+        _write_bytes(path, data)
+        return True
+
+    def upload(self, h, path):
+        """
+        Uploads a blob.
+
+        :param h: content hash
+        :type h: str
+        :param path: source path
+        :type path: str
+        :raises RemoteCacheError: if the request failed
+        """
+
+        with io.open(path, 'rb') as f:
+            data = f.read()
+        self._request('PUT', 'cas', h, data)
+
+    def _request(self, method, kind, h, data=None):
+        # Imported only when needed, because they are slow to import, and most actions do not use
+        # a remote cache
+        import socket
+        try:
+            from urllib.request import Request, urlopen # Python 3
+            from urllib.error import URLError, HTTPError
+            from http.client import HTTPException
+        except ImportError:
+            from urllib2 import Request, urlopen, URLError, HTTPError # Python 2
+            from httplib import HTTPException
+
+        request = Request('{}/{}/{}'.format(self.url, kind, h), data=data)
+        request.get_method = lambda: method # Python 2 has no "method" argument
+        if data is not None:
+            request.add_header('Content-Type', 'application/octet-stream')
+        try:
+            response = urlopen(request, timeout=self.timeout)
+            try:
+                return response.read()
+            finally:
+                response.close()
+        except HTTPError as ex:
+            if (method == 'GET') and (ex.code == 404):
+                return None
+            raise RemoteCacheError('{} {}: HTTP {:d}'.format(method, request.get_full_url(),
+                                                              ex.code))
+        except (URLError, HTTPException, socket.error, socket.timeout) as ex:
+            raise RemoteCacheError('{} {}: {}'.format(method, request.get_full_url(),
+                                                       getattr(ex, 'reason', ex)))
+
+
+class RemoteCacheError(Exception):
+    """
+    Failed request to a :class:`RemoteCache`.
+    """
+
+
+def read_depfile(path):
+    """
+    Reads the dependencies in a Makefile-style deps file, as written by gcc's ``-MD``.
+
+    :param path: deps file path
+    :type path: str
+    :returns: dependency paths
+    :rtype: [str]
+    """
+
+    try:
+        with io.open(path, encoding='utf-8', errors='replace') as f:
+            content = f.read()
+    except (IOError, OSError):
+        return []
+    content = content.replace('\\\r\n', ' ').replace('\\\n', ' ')
+    dependencies = []
+    for line in content.splitlines():
+        # Targets end with the first ": " (Windows drive letters have no space after the colon)
+        index = line.find(': ')
+        if index == -1:
+            continue
+        for token in _split_escaped(line[index + 2:]):
+            if token not in dependencies:
+                dependencies.append(token)
+    return dependencies
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    log_path = None
+    phase_name = None
+    output = None
+    depfile = None
+    cache_path = None
+    remote_url = None
+    remote_timeout = None
+    remote_upload = True
+    salt = None
+    base = None
+    remove_output = False
+    inputs = []
+    while args and (args[0] != '--'):
+        if args[0] == '--remove-output':
+            remove_output = True
+            args = args[1:]
+            continue
+        if args[0] == '--inputs':
+            # Values until the next option
+            args = args[1:]
+            while args and not args[0].startswith('--'):
+                inputs.append(args[0])
+                args = args[1:]
+            continue
+        if len(args) < 2:
+            return _usage()
+        option, value = args[0], args[1]
+        if option == '--log':
+            log_path = value
+        elif option == '--phase':
+            phase_name = value
+        elif option == '--output':
+            output = value
+        elif option == '--depfile':
+            depfile = value
+        elif option == '--cache':
+            cache_path = value
+        elif option == '--salt':
+            salt = value
+        elif option == '--base':
+            base = value
+        elif option == '--remote':
+            remote_url = value
+        elif option == '--remote-timeout':
+            try:
+                remote_timeout = float(value)
+            except ValueError:
+                return _usage()
+        elif option == '--remote-upload':
+            remote_upload = value not in ('0', 'false', 'no')
+        else:
+            return _usage()
+        args = args[2:]
+    command = args[1:]
+    if (not command) or ((log_path is None) and (cache_path is None) and not remove_output):
+        return _usage()
+
+    # Cache
+    cache = None
+    if (cache_path is not None) and (output is not None):
+        remote = RemoteCache(remote_url, remote_timeout) if remote_url is not None else None
+        cache = ActionCache(cache_path, remote, remote_upload, salt, base)
+        outputs = [output] if depfile is None else [output, depfile]
+        try:
+            key = cache.key(command, inputs)
+            if cache.restore(key, outputs):
+                # Not logged: the log is about the resources used by running actions
+                return 0
+        except (IOError, OSError) as ex:
+            # The cache is only an optimization
+            sys.stderr.write('ronin launcher: cache error: {}\n'.format(ex))
+            cache = None
+
+    if remove_output and (output is not None):
+        try:
+            os.remove(output)
+        except OSError as ex:
+            if ex.errno != errno.ENOENT:
+                sys.stderr.write('ronin launcher: could not remove "{}": {}\n'.format(output, ex))
+                return 1
+
+    start = time.time()
+    try:
+        process = Popen(command)
+    except OSError as ex:
+        sys.stderr.write('ronin launcher: could not run "{}": {}\n'.format(command[0], ex))
+        return 127
+
+    _, status, rusage = _wait4(process.pid)
+    wall = time.time() - start
+    if os.WIFSIGNALED(status):
+        code = 128 + os.WTERMSIG(status)
+    else:
+        code = os.WEXITSTATUS(status)
+    process.returncode = code # so that Popen won't try to reap the process again
+
+    if (cache is not None) and (code == 0):
+        try:
+            dependencies = read_depfile(depfile) if depfile is not None else []
+            cache.store(key, outputs, [v for v in dependencies if v not in inputs])
+        except (IOError, OSError) as ex:
+            sys.stderr.write('ronin launcher: cache error: {}\n'.format(ex))
+
+    if log_path is not None:
+        _append(log_path, {
+            'output': output,
+            'phase': phase_name,
+            'exit': code,
+            'wall': int(wall * 1000),
+            'user': int(rusage.ru_utime * 1000),
+            'sys': int(rusage.ru_stime * 1000),
+            'max_rss': _max_rss_bytes(rusage),
+            'read_bytes': _block_bytes(rusage.ru_inblock),
+            'write_bytes': _block_bytes(rusage.ru_oublock)})
+
+    return code
+
+
+def _wait4(pid):
+    while True:
+        try:
+            return os.wait4(pid, 0)
+        except OSError as ex:
+            # Python 2 does not retry on EINTR
+            if ex.errno != errno.EINTR:
+                raise
+
+
+def _max_rss_bytes(rusage):
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss
+    return rusage.ru_maxrss * 1024
+
+
+def _block_bytes(blocks):
+    # Linux counts 512-byte blocks; other operating systems count operations of unknown size
+    if sys.platform.startswith('linux'):
+        return blocks * 512
+    return None
+
+
+def _append(path, record):
+    line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+    # A single write to a file opened for appending is atomic enough for concurrent actions
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _sha256(data=b''):
+    # Imported only when needed, because most actions do not use the action cache
+    import hashlib
+    return hashlib.sha256(data)
+
+
+def _hash_file(path):
+    h = _sha256()
+    try:
+        with io.open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                h.update(chunk)
+    except (IOError, OSError):
+        return '-'
+    return h.hexdigest()
+
+
+def _command_tools(command):
+    # The executables run by the command: skips "env" and its variables, and includes the compiler
+    # after a compiler launcher
+    arguments = list(command)
+    if arguments and (os.path.basename(arguments[0]) == 'env'):
+        arguments = arguments[1:]
+        while arguments and ('=' in arguments[0]) and not arguments[0].startswith('-'):
+            arguments = arguments[1:]
+    if not arguments:
+        return []
+    tools = [arguments[0]]
+    if (os.path.splitext(os.path.basename(arguments[0]))[0] in COMPILER_LAUNCHERS) and \
+        (len(arguments) > 1):
+        tools.append(arguments[1])
+    return tools
+
+
+def _which(command):
+    if os.path.dirname(command):
+        return command if os.path.isfile(command) else None
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(directory, command)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def _response_file_paths(path):
+    # Arguments in the response file that are files
+    try:
+        with io.open(path, encoding='utf-8', errors='replace') as f:
+            content = f.read()
+    except (IOError, OSError):
+        return []
+    return [v for v in _split_escaped(content) if os.path.isfile(v)]
+
+
+def _split_escaped(value):
+    # Splits on whitespace that is not escaped with a backslash
+    tokens = []
+    token = ''
+    escaped = False
+    for c in value:
+        if escaped:
+            token += c
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif c.isspace():
+            if token:
+                tokens.append(token)
+            token = ''
+        else:
+            token += c
+    if token:
+        tokens.append(token)
+    return tokens
+
+
+def _copy(source, destination, mode=None):
+    # Via a temporary file, so that concurrent readers never see a partial file
+    directory = os.path.dirname(destination)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+    temporary = '{}.{:d}.tmp'.format(destination, os.getpid())
+    with io.open(source, 'rb') as s, io.open(temporary, 'wb') as d:
+        while True:
+            chunk = s.read(1 << 20)
+            if not chunk:
+                break
+            d.write(chunk)
+    if mode is not None:
+        os.chmod(temporary, mode)
+    os.rename(temporary, destination)
+
+
+def _write_bytes(path, data):
+    # Via a temporary file, so that concurrent readers never see a partial file
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+    temporary = '{}.{:d}.tmp'.format(path, os.getpid())
+    with io.open(temporary, 'wb') as f:
+        f.write(data)
+    os.rename(temporary, path)
+
+
+def _merge_manifest(manifest, entry):
+    # Most recent first
+    manifest = [entry] + [v for v in manifest if v != entry]
+    return manifest[:CACHE_MANIFEST_ENTRIES]
+
+
+def _parallel(tasks, threads):
+    # Runs (function, args) tasks in a pool of threads and returns the exceptions they raised
+    tasks = list(tasks)
+    import threading # only needed for uploads
+    errors = []
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                if not tasks:
+                    return
+                function, args = tasks.pop()
+            try:
+                function(*args)
+            except Exception as ex:
+                with lock:
+                    errors.append(ex)
+
+    pool = [threading.Thread(target=work) for _ in range(min(threads, len(tasks)))]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return errors
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _read_json(path):
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _write_json(path, value):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+    temporary = '{}.{:d}.tmp'.format(path, os.getpid())
+    with io.open(temporary, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(value, ensure_ascii=False, sort_keys=True))
+    os.rename(temporary, path)
+
+
+def _usage():
+    sys.stderr.write('usage: launcher.py [--log PATH] [--cache PATH] [--salt VALUE] [--base PATH] '
+                     '[--remote URL] [--remote-timeout SECONDS] [--remote-upload 0|1] '
+                     '[--remove-output] [--phase NAME] [--inputs PATH...] [--output PATH] '
+                     '[--depfile PATH] -- COMMAND...\n')
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+import sys, os, io, json
+
+try:
+    from shlex import quote # Python 3
+except ImportError:
+    from pipes import quote # Python 2
+
+
+# The launcher itself (see ronin.launcher) is kept out of this module, because it is slower to
+# import and only needed when Ninja runs actions
+
+
+LOG_NAME = '.ronin_log'
+LOG_COMPACT_FACTOR = 2
+
+LAUNCHER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'launcher.py')
+
+
+def launcher_prefix(log_path, phase_name, cache_path=None, cache_salt=None, cache_base=None,
+                    remote_url=None, remote_timeout=None, remote_upload=True, remove_output=False):
+    """
+    The command line prefix that runs a command under the launcher. It should be followed by
+    "--output", the output path, "--", and then the wrapped command's arguments.
+
+    With ``cache_path`` it should also be followed by "--depfile" and the deps file path if the
+    command writes one, and by "--inputs" and the input paths (before "--output").
+
+    Note that the wrapped command is executed directly and not via a shell, so it may not contain
+    shell syntax (redirection, pipes, etc.).
+
+    :param log_path: absolute path to the launcher log, or None to not log
+    :type log_path: str
+    :param phase_name: phase name to record
+    :type phase_name: str
+    :param cache_path: absolute path to the action cache (see
+     :class:`~ronin.launcher.ActionCache`), or None to not cache
+    :type cache_path: str
+    :param cache_salt: value to include in action keys, e.g. to tell toolchains apart
+    :type cache_salt: str
+    :param cache_base: absolute base path against which the action cache relativizes paths
+    :type cache_base: str
+    :param remote_url: base URL of a remote cache (see :class:`~ronin.launcher.RemoteCache`) to
+     use in addition to the action cache
+    :type remote_url: str
+    :param remote_timeout: timeout for each request to the remote cache in seconds; defaults to
+     :data:`~ronin.launcher.DEFAULT_REMOTE_TIMEOUT`
+    :type remote_timeout: float
+    :param remote_upload: set to False to only read from the remote cache
+    :type remote_upload: bool
+    :param remove_output: set to True to delete the output before running the command, for tools
+     that would otherwise update it in place
+    :type remove_output: bool
+    :returns: shell command line prefix
+    :rtype: str
+    """
+
+    prefix = '{python} {launcher} --phase {phase}'.format(
+        python=quote(sys.executable),
+        launcher=quote(LAUNCHER_PATH),
+        phase=quote(phase_name))
+    if log_path is not None:
+        prefix += ' --log {}'.format(quote(log_path))
+    if cache_path is not None:
+        prefix += ' --cache {}'.format(quote(cache_path))
+        if cache_salt is not None:
+            prefix += ' --salt {}'.format(quote(cache_salt))
+        if cache_base is not None:
+            prefix += ' --base {}'.format(quote(cache_base))
+        if remote_url is not None:
+            prefix += ' --remote {}'.format(quote(remote_url))
+            if remote_timeout is not None:
+                prefix += ' --remote-timeout {}'.format(quote('{}'.format(remote_timeout)))
+            if not remote_upload:
+                prefix += ' --remote-upload 0'
+    if remove_output:
+        prefix += ' --remove-output'
+    return prefix
+
+
+def launcher_log_size(path):
+    """
+    Current size of the launcher log. Use it as the ``offset`` for :func:`read_launcher_log` in
+    order to read only records added after this call.
+
+    :param path: path to the launcher log
+    :type path: str
+    :returns: size in bytes (0 if the log does not exist)
+    :rtype: int
+    """
+
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def read_launcher_log(path, offset=0, compact=False):
+    """
+    Reads the launcher log. Later records for an output replace earlier ones, so the result
+    reflects the most recent run of each action.
+
+    Each record has the keys "output", "phase", "exit" (exit code), "wall", "user" and "sys"
+    (wall time and CPU times in milliseconds), "max_rss" (peak memory in bytes), and "read_bytes"
+    and "write_bytes" (file system I/O; None where the operating system does not report it in
+    bytes). Records written by older versions may lack some of these keys.
+
+    :param path: path to the launcher log
+    :type path: str
+    :param offset: byte offset from which to read, e.g. the size of the log before a build in
+     order to read only the records of that build
+    :type offset: int
+    :param compact: set to True to rewrite the log with only the returned records if it has more
+     than :data:`LOG_COMPACT_FACTOR` times as many; must not be used while actions are running
+    :type compact: bool
+    :returns: records per output
+    :rtype: {:obj:`str`: :obj:`dict`}
+    """
+
+    records = {}
+    if not os.path.isfile(path):
+        return records
+    count = 0
+    with io.open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            count += 1
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                # Partially written line (interrupted build)
+                continue
+            output = record.get('output')
+            if output is not None:
+                records[output] = record
+    if compact and (offset == 0) and (count > LOG_COMPACT_FACTOR * len(records)):
+        _write_log(path, records)
+    return records
+
+
+def phase_max_rss(path):
+    """
+    The peak memory used by any single action of each phase, according to the launcher log.
+
+    Because the log is appended to by every build, it is compacted here (see
+    :func:`read_launcher_log`), so that reading it on every generation stays cheap.
+
+    :param path: path to the launcher log
+    :type path: str
+    :returns: peak memory in bytes per phase name
+    :rtype: {:obj:`str`: :obj:`int`}
+    """
+
+    max_rss = {}
+    for record in read_launcher_log(path, compact=True).values():
+        phase_name = record.get('phase')
+        rss = record.get('max_rss')
+        if (phase_name is None) or (rss is None):
+            continue
+        if rss > max_rss.get(phase_name, 0):
+            max_rss[phase_name] = rss
+    return max_rss
+
+
+def _write_log(path, records):
+    # Via a temporary file, so that concurrent readers never see a partial file
+    temporary = '{}.{:d}.tmp'.format(path, os.getpid())
+    with io.open(temporary, 'wb') as f:
+        for record in records.values():
+            f.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+    os.rename(temporary, path)
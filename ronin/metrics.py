@@ -0,0 +1,434 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .timings import output_phases
+from .utils.paths import join_path
+from .utils.strings import stringify, bool_stringify
+from .utils.types import verify_type
+from .utils.messages import announce, warning
+from subprocess import check_output, CalledProcessError
+from datetime import datetime
+import sys, os, io, re
+
+
+DEFAULT_METRICS_FILE_NAME = '.ronin_metrics.db'
+DEFAULT_HISTORY = 10
+DEFAULT_THRESHOLD = 0.1
+DEFAULT_RETENTION = 1000
+PERCENTILES = (50, 90, 99)
+
+_SCHEMA_VERSION = 1
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    project TEXT NOT NULL,
+    revision TEXT,
+    variant TEXT,
+    debug INTEGER NOT NULL,
+    exit INTEGER NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS actions (
+    build INTEGER NOT NULL REFERENCES builds (id),
+    output TEXT NOT NULL,
+    phase TEXT,
+    duration INTEGER,
+    exit INTEGER NOT NULL,
+    max_rss INTEGER
+);
+CREATE INDEX IF NOT EXISTS actions_build ON actions (build);
+'''
+
+
+def configure_metrics(enabled=None, file_name=None, history=None, threshold=None,
+                      retention=None):
+    """
+    Configures the current context's build metrics database.
+
+    :param enabled: whether to record builds; defaults to True (see also the ``--metrics`` command
+     line argument)
+    :type enabled: bool
+    :param file_name: database file name in the project's output path; defaults to
+     ".ronin_metrics.db"
+    :type file_name: str or ~types.FunctionType
+    :param history: number of recent builds to consider for trends and percentiles; defaults to 10
+    :type history: int
+    :param threshold: relative change in duration to report as a regression (or improvement);
+     defaults to 0.1
+    :type threshold: float
+    :param retention: number of recent builds to keep; older builds are deleted when recording a
+     build; defaults to 1000
+    :type retention: int
+    """
+
+    with current_context(False) as ctx:
+        ctx.metrics.enabled = enabled
+        ctx.metrics.file_name = file_name
+        ctx.metrics.history = history
+        ctx.metrics.threshold = threshold
+        ctx.metrics.retention = retention
+
+
+def metrics_path(project):
+    """
+    Path to the metrics database for a project.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: path to the database
+    :rtype: str
+    """
+
+    with current_context() as ctx:
+        file_name = stringify(ctx.get('metrics.file_name')) or DEFAULT_METRICS_FILE_NAME
+    return join_path(project.output_path, file_name)
+
+
+def metrics_enabled():
+    """
+    Whether builds should be recorded, according to the context's ``metrics.enabled`` and the
+    ``--metrics`` command line argument.
+
+    :returns: True if enabled
+    :rtype: bool
+    """
+
+    if _sqlite3() is None:
+        return False
+    with current_context() as ctx:
+        enabled = ctx.get('metrics.enabled')
+        if (enabled is not None) and (not bool_stringify(enabled)):
+            return False
+        return bool_stringify(ctx.get('build.metrics', True))
+
+
+def source_revision(path):
+    """
+    The git commit of the working tree in which ``path`` resides.
+
+    It is read from the repository's files where possible, so that we do not run ``git`` for
+    every build.
+
+    :param path: path
+    :type path: str
+    :returns: commit hash or None if not in a git working tree
+    :rtype: str
+    """
+
+    git_path = _git_path(path)
+    if git_path is None:
+        return None
+    revision = _read_revision(git_path)
+    if revision is not None:
+        return revision
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return check_output(['git', 'rev-parse', 'HEAD'], cwd=path,
+                                stderr=devnull).decode().strip() or None
+    except (CalledProcessError, OSError):
+        return None
+
+
+def record_build(project, start, end, exit_code, entries, launcher_records=None):
+    """
+    Appends a build and its actions to the project's metrics database, and deletes the builds
+    before the last ``metrics.retention`` ones (see :func:`configure_metrics`).
+
+    Actions come from the Ninja log entries of the build. Ninja does not log failed actions, so
+    these are only recorded if the build was measured (see the ``--measure`` command line
+    argument), in which case the launcher records also provide their peak memory use.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param start: build start time (from :func:`time.time`)
+    :type start: float
+    :param end: build end time (from :func:`time.time`)
+    :type end: float
+    :param exit_code: Ninja's exit code
+    :type exit_code: int
+    :param entries: Ninja log entries of the build
+    :type entries: [:class:`~ronin.ninja_log.NinjaLogEntry`]
+    :param launcher_records: launcher records of the build per output
+    :type launcher_records: {:obj:`str`: :obj:`dict`}
+    :returns: build ID
+    :rtype: int
+    """
+
+    verify_type(project, 'ronin.projects.Project')
+    if launcher_records is None:
+        launcher_records = {}
+
+    with current_context() as ctx:
+        debug = bool_stringify(ctx.get('build.debug', False))
+        root_path = stringify(ctx.get('paths.root'))
+        retention = ctx.get('metrics.retention')
+    retention = int(stringify(retention)) if retention is not None else DEFAULT_RETENTION
+
+    phases = output_phases(project)
+    actions = []
+    for entry in entries:
+        record = launcher_records.get(entry.output, {})
+        actions.append((entry.output, phases.get(entry.output), entry.duration,
+                        record.get('exit', 0), record.get('max_rss')))
+    logged = set(entry.output for entry in entries)
+    for output, record in launcher_records.items():
+        if (output not in logged) and record.get('exit'):
+            actions.append((output, record.get('phase') or phases.get(output), None,
+                            record['exit'], record.get('max_rss')))
+
+    connection = _connect(metrics_path(project))
+    try:
+        with connection:
+            cursor = connection.execute(
+                'INSERT INTO builds (time, project, revision, variant, debug, exit, duration) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (start, '{}'.format(project),
+                 source_revision(root_path) if root_path else None, stringify(project.variant),
+                 1 if debug else 0, exit_code, int((end - start) * 1000)))
+            build_id = cursor.lastrowid
+            connection.executemany(
+                'INSERT INTO actions (build, output, phase, duration, exit, max_rss) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(build_id,) + v for v in actions])
+            # IDs are never reused (AUTOINCREMENT)
+            connection.execute('DELETE FROM actions WHERE build <= ?', (build_id - retention,))
+            connection.execute('DELETE FROM builds WHERE id <= ?', (build_id - retention,))
+        return build_id
+    finally:
+        connection.close()
+
+
+def write_stats(project, compare=None, f=None):
+    """
+    Writes a report from the project's metrics database: recent builds, duration percentiles per
+    phase, and regressions between two builds.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param compare: IDs of the two builds to compare; defaults to the two most recent successful
+     builds with the same variant and debug flag as the most recent build
+    :type compare: (int, int)
+    :param f: where to write; defaults to stdout
+    :type f: file-like
+    """
+
+    verify_type(project, 'ronin.projects.Project')
+    if f is None:
+        f = sys.stdout
+
+    if _sqlite3() is None:
+        warning('Build metrics are not supported: this Python has no sqlite3 module')
+        return
+    path = metrics_path(project)
+    if not os.path.isfile(path):
+        announce('No build metrics recorded yet')
+        return
+
+    with current_context() as ctx:
+        history = ctx.get('metrics.history')
+        threshold = ctx.get('metrics.threshold')
+    history = int(stringify(history)) if history is not None else DEFAULT_HISTORY
+    threshold = float(stringify(threshold)) if threshold is not None else DEFAULT_THRESHOLD
+
+    connection = _connect(path)
+    try:
+        builds = connection.execute(
+            'SELECT builds.id, builds.time, builds.revision, builds.variant, builds.debug, '
+            'builds.exit, builds.duration, COUNT(actions.build), SUM(actions.duration) '
+            'FROM builds LEFT JOIN actions ON actions.build = builds.id '
+            'GROUP BY builds.id ORDER BY builds.id DESC LIMIT ?', (history,)).fetchall()
+        if not builds:
+            announce('No build metrics recorded yet')
+            return
+        builds.reverse()
+
+        # Trends
+        announce('Last {:d} builds:'.format(len(builds)))
+        f.write('  {:>5}  {:<19}  {:<12}  {:<10}  {:<5}  {:>4}  {:>10}  {:>7}  {:>10}\n'.format(
+            'id', 'time', 'revision', 'variant', 'debug', 'exit', 'wall', 'actions',
+            'cpu'))
+        for build_id, start, revision, variant, debug, exit_code, duration, count, total \
+            in builds:
+            f.write('  {:>5d}  {:<19}  {:<12}  {:<10}  {:<5}  {:>4d}  {:>10}  {:>7d}  {:>10}\n'
+                    .format(build_id,
+                            datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M:%S'),
+                            (revision or '')[:12], variant or '', 'yes' if debug else 'no',
+                            exit_code, _seconds(duration), count, _seconds(total or 0)))
+
+        # Percentiles
+        build_ids = [v[0] for v in builds]
+        rows = connection.execute(
+            'SELECT phase, duration FROM actions WHERE duration IS NOT NULL AND build IN ({}) '
+            'ORDER BY phase'.format(', '.join('?' * len(build_ids))), build_ids).fetchall()
+        durations = {}
+        for phase_name, duration in rows:
+            durations.setdefault(phase_name or '', []).append(duration)
+        if durations:
+            announce('Action durations per phase over the last {:d} builds:'.format(len(builds)))
+            width = max(len('phase'), max(len(v) for v in durations))
+            f.write('  {:<{width}}  {:>7}  {}\n'.format(
+                'phase', 'actions', '  '.join('{:>10}'.format('p{:d}'.format(v))
+                                              for v in PERCENTILES), width=width))
+            for phase_name, phase_durations in sorted(durations.items()):
+                phase_durations.sort()
+                f.write('  {:<{width}}  {:>7d}  {}\n'.format(
+                    phase_name, len(phase_durations),
+                    '  '.join('{:>10}'.format(_seconds(_percentile(phase_durations, v)))
+                              for v in PERCENTILES), width=width))
+
+        # Regressions
+        if compare is None:
+            last = builds[-1]
+            comparable = [v[0] for v in builds
+                          if (v[3] == last[3]) and (v[4] == last[4]) and (v[5] == 0)]
+            if len(comparable) < 2:
+                return
+            compare = comparable[-2:]
+        _write_comparison(connection, compare[0], compare[1], threshold, f)
+    finally:
+        connection.close()
+
+
+def _write_comparison(connection, old_id, new_id, threshold, f):
+    old = _action_durations(connection, old_id)
+    new = _action_durations(connection, new_id)
+
+    # Only actions that ran in both builds are comparable
+    phases = {}
+    for output, (phase_name, new_duration) in new.items():
+        if output not in old:
+            continue
+        old_duration = old[output][1]
+        phase = phases.setdefault(phase_name or '', [0, 0, 0])
+        phase[0] += 1
+        phase[1] += old_duration
+        phase[2] += new_duration
+
+    announce('Build {:d} compared to build {:d} ({:d} common actions):'.format(
+        new_id, old_id, sum(v[0] for v in phases.values())))
+    changed = [(phase_name, count, old_total, new_total)
+               for phase_name, (count, old_total, new_total) in sorted(phases.items())
+               if _change(old_total, new_total) is not None
+               and abs(_change(old_total, new_total)) >= threshold]
+    if not changed:
+        f.write('  No phase changed by {:.0f}% or more\n'.format(threshold * 100))
+        return
+    width = max(len('phase'), max(len(v[0]) for v in changed))
+    f.write('  {:<{width}}  {:>7}  {:>10}  {:>10}  {:>8}\n'.format(
+        'phase', 'actions', 'before', 'after', 'change', width=width))
+    for phase_name, count, old_total, new_total in changed:
+        f.write('  {:<{width}}  {:>7d}  {:>10}  {:>10}  {:>+7.1f}%\n'.format(
+            phase_name, count, _seconds(old_total), _seconds(new_total),
+            _change(old_total, new_total) * 100, width=width))
+
+
+def _action_durations(connection, build_id):
+    rows = connection.execute(
+        'SELECT output, phase, duration FROM actions WHERE build = ? AND duration IS NOT NULL',
+        (build_id,)).fetchall()
+    return dict((output, (phase_name, duration)) for output, phase_name, duration in rows)
+
+
+def _connect(path):
+    connection = _sqlite3().connect(path)
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version < _SCHEMA_VERSION:
+        connection.executescript(_SCHEMA)
+        connection.execute('PRAGMA user_version = {:d}'.format(_SCHEMA_VERSION))
+    return connection
+
+
+def _git_path(path):
+    # The ".git" directory of the working tree, which may be elsewhere for worktrees and
+    # submodules
+    path = os.path.abspath(path)
+    while True:
+        git_path = os.path.join(path, '.git')
+        if os.path.isdir(git_path):
+            return git_path
+        if os.path.isfile(git_path):
+            content = _read_line(git_path)
+            if (content is not None) and content.startswith('gitdir:'):
+                return os.path.join(path, content[len('gitdir:'):].strip())
+            return None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _read_revision(git_path):
+    # Resolves HEAD, or returns None if git itself is needed
+    head = _read_line(os.path.join(git_path, 'HEAD'))
+    if head is None:
+        return None
+    if not head.startswith('ref:'):
+        return head if _REVISION_RE.match(head) else None
+    ref = head[len('ref:'):].strip()
+    common_path = _read_line(os.path.join(git_path, 'commondir'))
+    common_path = os.path.join(git_path, common_path) if common_path else git_path
+    for path in (git_path, common_path):
+        revision = _read_line(os.path.join(path, *ref.split('/')))
+        if (revision is not None) and _REVISION_RE.match(revision):
+            return revision
+    try:
+        with io.open(os.path.join(common_path, 'packed-refs'), encoding='utf-8') as f:
+            for line in f:
+                fields = line.split()
+                if (len(fields) == 2) and (fields[1] == ref) and _REVISION_RE.match(fields[0]):
+                    return fields[0]
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def _read_line(path):
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            return f.readline().strip()
+    except (IOError, OSError):
+        return None
+
+
+_REVISION_RE = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+
+
+def _change(old, new):
+    if not old:
+        return None
+    return float(new - old) / old
+
+
+def _percentile(values, percentile):
+    # Nearest-rank method; values must be sorted
+    index = max(0, -(-len(values) * percentile // 100) - 1)
+    return values[index]
+
+
+def _seconds(milliseconds):
+    return '{:.3f}s'.format(milliseconds / 1000.0)
+
+
+def _sqlite3():
+    # Imported only when needed, because it is relatively slow to import
+    try:
+        import sqlite3
+        return sqlite3
+    except ImportError:
+        # Some Python distributions are built without it
+        return None
@@ -19,9 +19,20 @@ from .contexts import current_context, new_child_context
 from .projects import Project
 from .phases import Phase
 from .executors import Executor
+from .pools import Pool, auto_pool_depth, auto_pools_enabled
+from .launcher_log import LOG_NAME, launcher_prefix, phase_max_rss, launcher_log_size, \
+    read_launcher_log
+from .ninja_log import ninja_log_path, ninja_log_size, read_ninja_log, latest_ninja_log_entries
+from .timings import output_phases, phase_timings, write_timings
+from .trace import current_tracer, trace_span
+from .metrics import metrics_enabled, record_build
+from .cache import action_cache_path, action_cache_size, action_cache_salt, \
+    action_cache_base_path, remote_cache, maybe_evict
+from .compiler_cache import compiler_launcher_prefix, compiler_cache_snapshot, \
+    phase_compiler_cache_stats, write_compiler_cache_stats
 from .utils.paths import join_path
-from .utils.strings import stringify, stringify_list
-from .utils.platform import which
+from .utils.strings import stringify, stringify_list, bool_stringify
+from .utils.platform import which, host_cpu_count
 from .utils.collections import dedup, StrictDict
 from .utils.types import verify_type
 from .utils.messages import announce
@@ -29,8 +40,9 @@ from io import StringIO
 from os import makedirs
 from subprocess import check_call, CalledProcessError
 from datetime import datetime
+from collections import OrderedDict
 from textwrap import wrap
-import sys, os, io
+import sys, os, io, re, json, time
 
 
 # See:
@@ -41,9 +53,17 @@ import sys, os, io
 DEFAULT_NAME = 'build'
 DEFAULT_ENCODING = 'utf-8'
 DEFAULT_COLUMNS = 100
+DEFAULT_RESPONSE_FILE_INPUTS = 256
+DEFAULT_RESPONSE_FILE_LENGTH = 8192
 
+RESPONSE_FILE = '$out.rsp'
 
-def configure_ninja(ninja_command=None, encoding=None, file_name=None, columns=None, strict=None):
+COMPILATION_DATABASE_NAME = 'compile_commands.json'
+
+
+def configure_ninja(ninja_command=None, encoding=None, file_name=None, columns=None, strict=None,
+                    response_file_inputs=None, response_file_length=None,
+                    compilation_database=None):
     """
     :param ninja_command: ``ninja`` command; defaults to "ninja"
     :type ninja_command: str or ~types.FunctionType
@@ -55,6 +75,15 @@ def configure_ninja(ninja_command=None, encoding=None, file_name=None, columns=N
     :type columns: int
     :param strict: strict column mode; defaults to False
     :type strict: bool
+    :param response_file_inputs: use a response file for executors that support it when a build has
+     more inputs than this; defaults to 256
+    :type response_file_inputs: int
+    :param response_file_length: use a response file for executors that support it when a command
+     would be longer than this; defaults to 8192
+    :type response_file_length: int
+    :param compilation_database: whether to write a "compile_commands.json" next to the Ninja
+     file; defaults to True
+    :type compilation_database: bool
     """
     
     with current_context(False) as ctx:
@@ -63,6 +92,42 @@ def configure_ninja(ninja_command=None, encoding=None, file_name=None, columns=N
         ctx.ninja.file_name = file_name
         ctx.ninja.file_columns = columns
         ctx.ninja.file_strict = strict
+        ctx.ninja.response_file_inputs = response_file_inputs
+        ctx.ninja.response_file_length = response_file_length
+        ctx.ninja.compilation_database = compilation_database
+
+
+def build_jobs():
+    """
+    The number of parallel jobs Ninja should run, according to the context's ``build.jobs``
+    (see the ``--jobs`` command line argument).
+
+    The value "auto" uses the same heuristic as Ninja, but based on
+    :func:`~ronin.utils.platform.host_cpu_count`, so that it respects container CPU quotas.
+
+    :returns: number of jobs, or None to let Ninja decide
+    :rtype: int
+    :raises ~exceptions.ValueError: if ``build.jobs`` is not an integer or "auto"
+    """
+
+    with current_context() as ctx:
+        jobs = stringify(ctx.get('build.jobs'))
+    if jobs is None:
+        return None
+    if jobs == 'auto':
+        cpu_count = host_cpu_count()
+        if cpu_count <= 1:
+            return 2
+        elif cpu_count == 2:
+            return 3
+        return cpu_count + 2
+    try:
+        jobs = int(jobs)
+    except ValueError:
+        raise ValueError('"build.jobs" must be an integer or "auto": "{}"'.format(jobs))
+    if jobs < 0:
+        raise ValueError('"build.jobs" cannot be negative: {:d}'.format(jobs))
+    return jobs
 
 
 def escape(value):
@@ -99,7 +164,7 @@ class NinjaFile(object):
     """
     
     def __init__(self, project, command=None, encoding=None, file_name=None, columns=None,
-                 strict=None):
+                 strict=None, response_file_inputs=None, response_file_length=None):
         """
         :param project: project
         :type project: ~ronin.projects.Project
@@ -114,6 +179,12 @@ class NinjaFile(object):
         :type columns: int
         :param strict: strict column mode; defaults to the context's ``ninja.strict``
         :type strict: bool
+        :param response_file_inputs: use a response file for executors that support it when a build
+         has more inputs than this; defaults to the context's ``ninja.response_file_inputs``
+        :type response_file_inputs: int
+        :param response_file_length: use a response file for executors that support it when a
+         command would be longer than this; defaults to the context's ``ninja.response_file_length``
+        :type response_file_length: int
         """
         
         verify_type(project, Project)
@@ -123,6 +194,8 @@ class NinjaFile(object):
         self.file_name = file_name
         self.columns = columns
         self.strict = strict
+        self.response_file_inputs = response_file_inputs
+        self.response_file_length = response_file_length
     
     def __str__(self):
         return self.__unicode__()
@@ -200,7 +273,79 @@ class NinjaFile(object):
         if not os.path.isdir(output_path):
             makedirs(output_path)
         with io.open(path, 'w', encoding=self.encoding) as f:
-            self.write(f)
+            with trace_span('generate', project='{}'.format(self._project)):
+                self.write(f)
+        from .profiling import count, BYTES_WRITTEN
+        count(BYTES_WRITTEN, os.path.getsize(path))
+        with current_context() as ctx:
+            compilation_database = bool_stringify(ctx.get('ninja.compilation_database', True))
+        if compilation_database:
+            self.write_compilation_database()
+
+    def write_compilation_database(self):
+        """
+        Writes :attr:`compilation_database_path` with the commands of phases whose executors
+        support it (for example :class:`~ronin.gcc.GccCompile`), as recorded by the last
+        :meth:`write`.
+
+        The file is only rewritten if its content changed, because tools such as clangd reindex
+        everything when it does.
+
+        :returns: True if the file was written
+        :rtype: bool
+        """
+
+        with current_context() as ctx:
+            root_path = ctx.get('paths.root')
+            project_actions = ctx.get('current.project_actions')
+        actions = project_actions.get(self._project) if project_actions is not None else None
+        if not actions:
+            return False
+
+        entries = []
+        for output, action in actions.items():
+            phase = self._project.phases.get(action.phase_name)
+            if (phase is None) or (not phase.executor._compilation_database):
+                continue
+            command = action.command_line
+            for input_path in action.inputs:
+                entries.append(OrderedDict((
+                    ('directory', root_path),
+                    ('command', command),
+                    ('file', input_path),
+                    ('output', output))))
+            if action.members:
+                # Sources in unity bundles get the command that would compile them on their own
+                for member, member_output in zip(action.members, action.member_outputs):
+                    entries.append(OrderedDict((
+                        ('directory', root_path),
+                        ('command', action.expand_command([member], member_output)),
+                        ('file', member),
+                        ('output', member_output))))
+        if not entries:
+            return False
+        entries.sort(key=lambda v: (v['file'], v['output']))
+        content = json.dumps(entries, indent=2, ensure_ascii=False, separators=(',', ': ')) + '\n'
+
+        path = self.compilation_database_path
+        if os.path.isfile(path):
+            with io.open(path, encoding='utf-8') as f:
+                if f.read() == content:
+                    return False
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        announce("Compilation database written to '{}'".format(path))
+        return True
+
+    @property
+    def compilation_database_path(self):
+        """
+        Full path to the "compile_commands.json" file, next to the Ninja file.
+
+        :type: :obj:`str`
+        """
+
+        return join_path(self._project.output_path, COMPILATION_DATABASE_NAME)
 
     def remove(self):
         """
@@ -211,26 +356,67 @@ class NinjaFile(object):
         if os.path.isfile(path):
             os.remove(path)
 
-    def build(self):
+    def build(self, generate=True):
         """
         Calls :meth:`generate` and runs Ninja as a subprocess in build mode.
         
+        :param generate: set to False to run Ninja on the existing Ninja file
+        :type generate: bool
         :returns: subprocess exit code
         :rtype: int
         """
 
-        self.generate()
+        if generate:
+            self.generate()
         path = self.path
         with current_context() as ctx:
             verbose = ctx.get('cli.verbose', False)
+            load_average = stringify(ctx.get('build.load_average'))
+            keep_going = bool_stringify(ctx.get('build.keep_going', False))
+            timings = stringify(ctx.get('build.timings'))
+        jobs = build_jobs()
         args = [self.command, '-f', path]
+        if jobs is not None:
+            args += ['-j', str(jobs)]
+        if load_average is not None:
+            args += ['-l', load_average]
+        if keep_going:
+            args += ['-k', '0'] # unlimited failures
         if verbose:
             args.append('-v')
+        log_path = ninja_log_path(self._project)
+        log_offset = ninja_log_size(log_path)
+        launcher_log_path = join_path(self._project.output_path, LOG_NAME)
+        launcher_log_offset = launcher_log_size(launcher_log_path)
+        compiler_cache = compiler_cache_snapshot(self._project)
+        ninja_start = time.time()
         try:
-            check_call(args)
+            with trace_span('ninja', 'build', project='{}'.format(self._project)):
+                check_call(args)
+            r = 0
         except CalledProcessError as ex:
-            return ex.returncode
-        return 0
+            r = ex.returncode
+        ninja_end = time.time()
+        if compiler_cache is not None:
+            write_compiler_cache_stats(self._project,
+                                       phase_compiler_cache_stats(self._project, compiler_cache))
+        cache_path = action_cache_path()
+        if cache_path is not None:
+            with trace_span('evict', 'cache'):
+                maybe_evict(cache_path, action_cache_size())
+        tracer = current_tracer()
+        record = metrics_enabled()
+        if (timings is not None) or (tracer is not None) or record:
+            entries = latest_ninja_log_entries(read_ninja_log(log_path, log_offset))
+            if tracer is not None:
+                tracer.add_ninja_entries(entries, ninja_start, output_phases(self._project))
+            if record:
+                record_build(self._project, ninja_start, ninja_end, r, entries,
+                             read_launcher_log(launcher_log_path, launcher_log_offset))
+            if timings is not None:
+                write_timings(self._project, phase_timings(self._project, entries),
+                              timings == 'json')
+        return r
 
     def clean(self):
         """
@@ -246,6 +432,14 @@ class NinjaFile(object):
             if project_outputs is not None:
                 if self._project in project_outputs:
                     del project_outputs[self._project]
+            project_dependencies = ctx.get('current.project_dependencies')
+            if project_dependencies is not None:
+                if self._project in project_dependencies:
+                    del project_dependencies[self._project]
+            project_actions = ctx.get('current.project_actions')
+            if project_actions is not None:
+                if self._project in project_actions:
+                    del project_actions[self._project]
                 
         path = self.path
         if os.path.isfile(path):
@@ -283,6 +477,25 @@ class NinjaFile(object):
                 ctx.current.phase_outputs = StrictDict(key_type=str, value_type=list)
                 ctx.current.project = self._project
                 ctx.current.project_outputs[self._project] = ctx.current.phase_outputs
+                ctx.current.output_dependencies = StrictDict(key_type=str, value_type=list)
+                ctx.current.project_dependencies[self._project] = \
+                    ctx.current.output_dependencies
+                ctx.current.output_actions = StrictDict(key_type=str, value_type=BuildAction)
+                ctx.current.project_actions[self._project] = ctx.current.output_actions
+                ctx.current.pools = StrictDict(key_type=str, value_type=int)
+
+                # Measurements
+                launcher_log = join_path(self._project.output_path, LOG_NAME)
+                ctx.current.launcher_log = launcher_log if ctx.get('build.measure', False) \
+                    else None
+                ctx.current.action_cache = action_cache_path()
+                ctx.current.action_cache_salt = action_cache_salt()
+                ctx.current.action_cache_base = action_cache_base_path()
+                ctx.current.remote_cache = remote_cache()
+                ctx.current.phase_max_rss = phase_max_rss(launcher_log) \
+                    if auto_pools_enabled() else {}
+                ctx.current.pool_shares = _pool_shares(self._project,
+                                                       ctx.current.phase_max_rss)
                 
                 # Header
                 w.comment('Ninja file for {}'.format(self._project))
@@ -295,19 +508,24 @@ class NinjaFile(object):
                 w.line()
                 w.line('builddir = {}'.format(pathify(self._project.output_path)))
                 
-                # Rules
-                for phase_name, phase in self._project.phases.items():
+                # Rules (phases may add phases when applied)
+                for phase_name, phase in list(self._project.phases.items()):
                     verify_type(phase, Phase)
                     self._write_rule(ctx, phase_name, phase)
 
     def _write_rule(self, ctx, phase_name, phase):
-        phase_outputs = ctx.current.phase_outputs
-
         # Check if already written
-        if phase_name in phase_outputs:
+        if phase_name in ctx.current.phase_outputs:
             return
-        
-        phase.apply()
+
+        with trace_span('rule {}'.format(phase_name), 'rule'):
+            self._write_phase_rule(ctx, phase_name, phase)
+
+    def _write_phase_rule(self, ctx, phase_name, phase):
+        phase_outputs = ctx.current.phase_outputs
+
+        with trace_span('apply {}'.format(phase_name), 'apply'):
+            phase.apply()
 
         ctx.current.phase_name = phase_name
         ctx.current.phase = phase
@@ -318,8 +536,72 @@ class NinjaFile(object):
         rebuild_on_from = self._get_phase_names(ctx, phase, 'rebuild_on_from')
         build_if_from = self._get_phase_names(ctx, phase, 'build_if_from')
         
+        # Command
+        verify_type(phase.executor, Executor)
+        with trace_span('command {}'.format(phase_name), 'command'):
+            command = phase.command_as_str(escape)
+
+        # Implicit dependencies
+        implicit_dependencies = phase.rebuild_on
+        for n in rebuild_on_from:
+            implicit_dependencies += [v.file for v in phase_outputs[n]]
+        implicit_dependencies = dedup(implicit_dependencies)
+
+        # Order dependencies
+        order_dependencies = phase.build_if
+        for n in build_if_from:
+            order_dependencies += [v.file for v in phase_outputs[n]]
+        order_dependencies = dedup(order_dependencies)
+
+        # Inputs
+        inputs = stringify_list(phase.inputs)
+        for n in inputs_from:
+            inputs += [v.file for v in phase_outputs[n]]
+        inputs = dedup(inputs)
+        members = {}
+        if phase.executor._inputs_transform is not None:
+            with trace_span('inputs {}'.format(phase_name), 'inputs'):
+                inputs, members = phase.executor._inputs_transform(phase, inputs)
+        
+        # Outputs
+        with trace_span('outputs {}'.format(phase_name), 'outputs'):
+            combine_inputs, outputs = phase.get_outputs(inputs)
+
+        # Store outputs in state
+        phase_outputs[phase_name] = outputs
+
+        # Builds
+        if combine_inputs:
+            builds = [(outputs[0], inputs)]
+        else:
+            builds = [(output, [inputs[index]]) for index, output in enumerate(outputs)]
+        builds = [(output, build_inputs, self._get_vars(phase, output, build_inputs))
+                  for output, build_inputs in builds]
+
+        # Store dependencies and actions in state
+        for output, build_inputs, build_vars in builds:
+            build_members = []
+            for build_input in build_inputs:
+                build_members += members.get(build_input, [])
+            build_member_outputs = [v.file for v in phase.get_outputs(build_members)[1]] \
+                if build_members and not combine_inputs else None
+            ctx.current.output_dependencies[output.file] = \
+                dedup(stringify_list(build_inputs + build_members + implicit_dependencies +
+                                     order_dependencies))
+            ctx.current.output_actions[output.file] = BuildAction(phase_name, output.file,
+                                                                  stringify_list(build_inputs),
+                                                                  command, build_vars,
+                                                                  stringify_list(build_members),
+                                                                  build_member_outputs)
+
+        # Response file
+        response_file = self._get_response_file(ctx, phase, command, builds)
+        if response_file is not None:
+            command, response_file_content = response_file
+
         # Rule
         rule_name = phase_name.replace(' ', '_')
+        pool_name = self._write_pool(ctx, phase_name, rule_name, phase)
         w.line()
         w.line('rule {}'.format(rule_name))
         
@@ -330,73 +612,155 @@ class NinjaFile(object):
         w.line('description = {}'.format(description), 1)
 
         # Command
-        verify_type(phase.executor, Executor)
-        command = phase.command_as_str(escape)
+        compiler_launcher = compiler_launcher_prefix(phase.executor, self._project)
+        if compiler_launcher is not None:
+            command = '{} {}'.format(escape(compiler_launcher), command)
+        deps_file = stringify(phase.executor._deps_file)
+        launcher_log = ctx.current.launcher_log
+        cache_path = ctx.current.action_cache \
+            if _cacheable(phase.executor, command) else None
+        remove_output = bool_stringify(phase.executor._remove_output)
+        if (launcher_log is not None) or (cache_path is not None):
+            options = ''
+            if cache_path is not None:
+                # With a response file $in is too long, so the launcher looks in it instead
+                options += ' --inputs'
+                if response_file is None:
+                    options += ' $in'
+                for v in implicit_dependencies:
+                    options += ' ' + pathify(v)
+                if deps_file:
+                    options += ' --depfile {}'.format(deps_file)
+            remote = ctx.current.remote_cache if cache_path is not None else None
+            remote_url, remote_timeout, remote_upload = remote or (None, None, True)
+            prefix = launcher_prefix(launcher_log, phase_name, cache_path,
+                                     cache_salt=ctx.current.action_cache_salt,
+                                     cache_base=ctx.current.action_cache_base,
+                                     remote_url=remote_url, remote_timeout=remote_timeout,
+                                     remote_upload=remote_upload, remove_output=remove_output)
+            command = '{}{} --output $out -- {}'.format(escape(prefix), options, command)
+        elif remove_output:
+            # Not worth starting the launcher just for this
+            command = 'rm -f $out && {}'.format(command)
         w.line('command = {}'.format(command), 1)
+        if response_file is not None:
+            w.line('rspfile = {}'.format(RESPONSE_FILE), 1)
+            w.line('rspfile_content = {}'.format(response_file_content), 1)
         
         # Deps
-        deps_file = stringify(phase.executor._deps_file)
         if deps_file:
             w.line('depfile = {}'.format(deps_file), 1)
             deps_type = stringify(phase.executor._deps_type)
             if deps_type:
                 w.line('deps = {}'.format(deps_type), 1)
 
-        # Implicit dependencies
-        implicit_dependencies = phase.rebuild_on
-        for n in rebuild_on_from:
-            implicit_dependencies += [v.file for v in phase_outputs[n]]
-        implicit_dependencies = dedup(implicit_dependencies)
+        # Pool
+        if pool_name is not None:
+            w.line('pool = {}'.format(pool_name), 1)
+
         if implicit_dependencies:
             implicit_dependencies = ' | {}'.format(' '.join(pathify(v)
                                                             for v in implicit_dependencies))
         else:
             implicit_dependencies = ''
-
-        # Order dependencies
-        order_dependencies = phase.build_if
-        for n in build_if_from:
-            order_dependencies += [v.file for v in phase_outputs[n]]
-        order_dependencies = dedup(order_dependencies)
         if order_dependencies:
             order_dependencies = ' || {}'.format(' '.join(pathify(v) for v in order_dependencies))
         else:
             order_dependencies = ''
-            
-        # Inputs
-        inputs = stringify_list(phase.inputs)
-        for n in inputs_from:
-            inputs += [v.file for v in phase_outputs[n]]
-        inputs = dedup(inputs)
-        
-        # Outputs
-        combine_inputs, outputs = phase.get_outputs(inputs)
 
-        # Store outputs in state
-        phase_outputs[phase_name] = outputs
-        
-        def build(output, inputs):
+        if builds:
+            w.line()
+        for output, build_inputs, build_vars in builds:
             line = 'build {}: {}'.format(pathify(output.file), rule_name)
-            if inputs:
-                line += ' ' + ' '.join([pathify(v) for v in inputs])
+            if build_inputs:
+                line += ' ' + ' '.join([pathify(v) for v in build_inputs])
             line += implicit_dependencies
             line += order_dependencies
             w.line(line)
             
             # Vars
-            for var_name, var in phase.vars.items():
-                if hasattr(var, '__call__'):
-                    var = var(output, inputs)
+            for var_name, var in build_vars:
                 w.line('{} = {}'.format(var_name, var), 1)
-    
-        if combine_inputs:
-            w.line()
-            build(outputs[0], inputs)
-        elif outputs:
-            w.line()
-            for index, output in enumerate(outputs):
-                the_input = inputs[index]
-                build(output, [the_input])
+
+    def _get_vars(self, phase, output, inputs):
+        build_vars = []
+        for var_name, var in phase.vars.items():
+            if hasattr(var, '__call__'):
+                var = var(output, inputs)
+            build_vars.append((var_name, var))
+        return build_vars
+
+    def _get_response_file(self, ctx, phase, command, builds):
+        executor = phase.executor
+        response_file_format = stringify(executor._response_file_format)
+        if (not response_file_format) or (not builds):
+            return None
+        argument = stringify(executor._response_file_argument)
+        content = stringify(executor._response_file_content) or argument
+        argument_re = re.compile(r'(?<!\$){}(?![\w-])'.format(re.escape(argument)))
+        if not argument_re.search(command):
+            return None
+
+        # The longest expansion of the argument among our builds
+        max_inputs = 0
+        max_length = 0
+        for _, build_inputs, build_vars in builds:
+            if argument in ('$in', '$in_newline'):
+                length = sum(len(pathify(v)) + 1 for v in build_inputs)
+            else:
+                length = 0
+                for var_name, var in build_vars:
+                    if argument == '${}'.format(var_name):
+                        length = len(stringify(var))
+                        break
+            max_inputs = max(max_inputs, len(build_inputs))
+            max_length = max(max_length, length)
+
+        threshold_inputs = ctx.fallback(self.response_file_inputs, 'ninja.response_file_inputs')
+        if threshold_inputs is None:
+            threshold_inputs = DEFAULT_RESPONSE_FILE_INPUTS
+        threshold_length = ctx.fallback(self.response_file_length, 'ninja.response_file_length')
+        if threshold_length is None:
+            threshold_length = DEFAULT_RESPONSE_FILE_LENGTH
+        if (max_inputs <= int(threshold_inputs)) and \
+            (len(command) + max_length <= int(threshold_length)):
+            return None
+
+        command = argument_re.sub(lambda _: response_file_format.format(RESPONSE_FILE), command)
+        return command, content
+
+    def _write_pool(self, ctx, phase_name, rule_name, phase):
+        pool = _phase_pool(phase)
+        if pool is None:
+            # Automatic pool based on measured memory use
+            if not _auto_pool(phase_name, phase, ctx.current.phase_max_rss):
+                return None
+            max_rss = ctx.current.phase_max_rss[phase_name]
+            depth = auto_pool_depth(max_rss, build_jobs(),
+                                    ctx.current.pool_shares.get(phase_name, 1))
+            if depth is None:
+                return None
+            pool = Pool('{}_pool'.format(rule_name), depth)
+
+        verify_type(pool, Pool)
+        pool_name = stringify(pool.name)
+        if pool_name == 'console':
+            # Built-in pool
+            return pool_name
+
+        depth = int(stringify(pool.depth))
+        pools = ctx.current.pools
+        if pool_name in pools:
+            if pools[pool_name] != depth:
+                raise ValueError('pool "{}" used with different depths'.format(pool_name))
+            return pool_name
+        pools[pool_name] = depth
+
+        w = ctx.current.writer
+        w.line()
+        w.line('pool {}'.format(pool_name))
+        w.line('depth = {:d}'.format(depth), 1)
+        return pool_name
 
     def _get_phase_names(self, ctx, phase, attr):
         phase_names = []
@@ -413,10 +777,140 @@ class NinjaFile(object):
         return phase_names
 
 
+def _phase_pool(phase):
+    # The phase's pool or else its executor's default pool
+    pool = phase.pool
+    if (pool is None) and (phase.executor._default_pool is not None):
+        pool = phase.executor._default_pool()
+    return pool
+
+
+def _auto_pool(phase_name, phase, phase_max_rss):
+    # Whether the phase gets an automatic pool; single-output phases have one action, so they get
+    # none
+    return (phase_name in phase_max_rss) and (not phase.output) and (_phase_pool(phase) is None)
+
+
+def _pool_shares(project, phase_max_rss):
+    # Automatic pools share the memory with those of the other phases whose actions may run at the
+    # same time, that is unless one phase waits for all the actions of the other
+    names = [k for k, v in project.phases.items() if _auto_pool(k, v, phase_max_rss)]
+    waits = {}
+    ancestors = {}
+    for name in names:
+        _phase_waits(project, name, waits, ancestors)
+    shares = {}
+    for name in names:
+        shares[name] = 1 + sum(1 for v in names if (v != name) and
+                               (v not in waits[name]) and (name not in waits[v]))
+    return shares
+
+
+def _phase_waits(project, phase_name, waits, ancestors):
+    # The phases all the actions of which finish before any action of the phase starts; also
+    # collects all the phases it depends on in "ancestors"
+    if phase_name in waits:
+        return waits[phase_name], ancestors[phase_name]
+    waits[phase_name] = set()
+    ancestors[phase_name] = set()
+    phase = project.phases[phase_name]
+    for attr in ('inputs_from', 'rebuild_on_from', 'build_if_from'):
+        for value in getattr(phase, attr):
+            name, _ = project.get_phase_for(value, attr)
+            if name == phase_name:
+                continue
+            name_waits, name_ancestors = _phase_waits(project, name, waits, ancestors)
+            waits[phase_name] |= name_waits
+            ancestors[phase_name] |= name_ancestors | set((name,))
+            # Each action depends on all of the other phase's outputs, unless we have one output
+            # per input
+            if (attr != 'inputs_from') or phase.output:
+                waits[phase_name] |= name_ancestors | set((name,))
+    return waits[phase_name], ancestors[phase_name]
+
+
+def _cacheable(executor, command):
+    if not executor._cache:
+        return False
+    uncacheable_arguments = tuple(executor._uncacheable_arguments)
+    if uncacheable_arguments:
+        for argument in command.split():
+            if argument.startswith(uncacheable_arguments):
+                return False
+    return True
+
+
 _MINIMUM_COLUMNS_STRICT = 30 # lesser than this can lead to breakage
 _INDENT = '  '
 
 
+class BuildAction(object):
+    """
+    A build statement in the Ninja file.
+
+    Generation records these per output in the context's ``current.project_actions``, for tools
+    that need the exact command lines.
+
+    :ivar phase_name: phase name
+    :vartype phase_name: str
+    :ivar output: output file
+    :vartype output: str
+    :ivar inputs: input files
+    :vartype inputs: [str]
+    :ivar members: source files included by the inputs (e.g. the sources of unity bundles), which
+     are not in the command line
+    :vartype members: [str]
+    :ivar member_outputs: the output file of each member if it were built on its own
+    :vartype member_outputs: [str]
+    :ivar command: command, in Ninja syntax
+    :vartype command: str
+    :ivar vars: build variables, in Ninja syntax
+    :vartype vars: [(str, str)]
+    """
+
+    def __init__(self, phase_name, output, inputs, command, the_vars, members=None,
+                 member_outputs=None):
+        self.phase_name = phase_name
+        self.output = output
+        self.inputs = inputs
+        self.members = members or []
+        self.member_outputs = member_outputs or [output] * len(self.members)
+        self.command = command
+        self.vars = the_vars
+
+    @property
+    def command_line(self):
+        """
+        The command line as Ninja would run it, with the variables (including ``$in`` and
+        ``$out``) expanded.
+
+        :type: :obj:`str`
+        """
+
+        return self.expand_command(self.inputs, self.output)
+
+    def expand_command(self, inputs, output):
+        """
+        The command line as Ninja would run it for other inputs and output, for example to compile
+        a member on its own.
+
+        :param inputs: input files
+        :type inputs: [str]
+        :param output: output file
+        :type output: str
+        :returns: command line
+        :rtype: str
+        """
+
+        variables = {
+            'in': ' '.join(_shell_quote(v) for v in inputs),
+            'in_newline': '\n'.join(_shell_quote(v) for v in inputs),
+            'out': _shell_quote(output)}
+        for name, value in self.vars:
+            variables[name] = _expand(stringify(value), variables)
+        return _expand(self.command, variables)
+
+
 class _Writer(object):
     def __init__(self, f, columns, strict):
         self._f = f
@@ -491,3 +985,27 @@ class _Writer(object):
             dollar_count += 1
             dollar_index -= 1
         return dollar_count % 2 == 0
+
+
+_VARIABLE_RE = re.compile(r'\$(\$|:| |\n[ ]*|\{([\w.-]+)\}|([\w-]+))')
+
+_SHELL_SAFE_RE = re.compile(r'^[\w@%+=:,./-]+$')
+
+
+def _expand(value, variables):
+    # Ninja's variable expansion and unescaping
+    def replace(match):
+        token = match.group(1)
+        if token in ('$', ':', ' '):
+            return token
+        if token.startswith('\n'):
+            return ''
+        return variables.get(match.group(2) or match.group(3), '')
+    return _VARIABLE_RE.sub(replace, value)
+
+
+def _shell_quote(value):
+    # Like Ninja, quote only paths that need it
+    if _SHELL_SAFE_RE.match(value) or (os.name == 'nt'):
+        return value
+    return "'{}'".format(value.replace("'", "'\\''"))
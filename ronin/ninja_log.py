@@ -0,0 +1,198 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .utils.paths import join_path
+from subprocess import Popen, PIPE
+import os, io
+
+
+# See:
+# https://github.com/ninja-build/ninja/blob/master/src/build_log.cc
+# https://ninja-build.org/manual.html#_extra_tools
+
+
+NINJA_LOG_NAME = '.ninja_log'
+NINJA_DEPS_NAME = '.ninja_deps'
+
+
+def ninja_log_path(project):
+    """
+    Path to the Ninja log for a project. Ninja writes it to the ``builddir``, which is the
+    project's ``output_path``.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: path to the Ninja log
+    :rtype: str
+    """
+
+    return join_path(project.output_path, NINJA_LOG_NAME)
+
+
+def ninja_log_size(path):
+    """
+    Current size of the Ninja log. Use it as the ``offset`` for :func:`read_ninja_log` in order to
+    read only entries added after this call.
+
+    :param path: path to the Ninja log
+    :type path: str
+    :returns: size in bytes (0 if the log does not exist)
+    :rtype: int
+    """
+
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def read_ninja_log(path, offset=0):
+    """
+    Reads entries from the Ninja log.
+
+    Note that Ninja occasionally recompacts its log, in which case the log would be shorter than
+    ``offset``. We then have no choice but to read the whole log.
+
+    :param path: path to the Ninja log
+    :type path: str
+    :param offset: byte offset from which to read
+    :type offset: int
+    :returns: entries in log order
+    :rtype: [:class:`NinjaLogEntry`]
+    """
+
+    entries = []
+    if not os.path.isfile(path):
+        return entries
+    if offset > ninja_log_size(path):
+        offset = 0
+    with io.open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            line = line.decode('utf-8', 'replace').rstrip('\n')
+            if (not line) or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) < 5:
+                # Partially written line (interrupted build)
+                continue
+            try:
+                entries.append(NinjaLogEntry(int(fields[0]), int(fields[1]), int(fields[2]),
+                                             fields[3], fields[4]))
+            except ValueError:
+                continue
+    return entries
+
+
+def latest_ninja_log_entries(entries):
+    """
+    Keeps only the latest entry per output, in log order.
+
+    :param entries: entries
+    :type entries: [:class:`NinjaLogEntry`]
+    :returns: latest entries
+    :rtype: [:class:`NinjaLogEntry`]
+    """
+
+    latest = {}
+    for entry in entries:
+        latest[entry.output] = entry
+    return sorted(latest.values(), key=lambda v: (v.start, v.end))
+
+
+def ninja_deps_path(project):
+    """
+    Path to the Ninja deps log for a project, in which Ninja records the dependencies discovered
+    by commands (e.g. headers, via deps files). Ninja writes it to the ``builddir``, which is the
+    project's ``output_path``.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: path to the Ninja deps log
+    :rtype: str
+    """
+
+    return join_path(project.output_path, NINJA_DEPS_NAME)
+
+
+def read_ninja_deps(command, path):
+    """
+    Reads the dependencies recorded in the Ninja deps log, via ``ninja -t deps``.
+
+    :param command: ``ninja`` command
+    :type command: str
+    :param path: path to the Ninja file
+    :type path: str
+    :returns: absolute dependency paths per output (empty if Ninja failed)
+    :rtype: {:obj:`str`: [:obj:`str`]}
+    """
+
+    deps = {}
+    try:
+        process = Popen([command, '-f', path, '-t', 'deps'], stdout=PIPE, stderr=PIPE)
+        output, _ = process.communicate()
+    except OSError:
+        return deps
+    if process.returncode != 0:
+        return deps
+    paths = None
+    for line in output.decode('utf-8', 'replace').splitlines():
+        if not line.strip():
+            continue
+        if line[0].isspace():
+            if paths is not None:
+                paths.append(os.path.abspath(line.strip()))
+        else:
+            # "output: #deps 2, deps mtime 123 (VALID)"
+            paths = deps.setdefault(os.path.abspath(line.rsplit(': #deps', 1)[0]), [])
+    return deps
+
+
+class NinjaLogEntry(object):
+    """
+    A single action in the Ninja log.
+
+    Times are in milliseconds since the start of the Ninja run in which the action ran.
+    """
+
+    def __init__(self, start, end, mtime, output, command_hash):
+        """
+        :param start: start time in milliseconds
+        :type start: int
+        :param end: end time in milliseconds
+        :type end: int
+        :param mtime: modification time of the output as recorded by Ninja
+        :type mtime: int
+        :param output: output path
+        :type output: str
+        :param command_hash: hash of the command
+        :type command_hash: str
+        """
+
+        self.start = start
+        self.end = end
+        self.mtime = mtime
+        self.output = output
+        self.command_hash = command_hash
+
+    @property
+    def duration(self):
+        """
+        Wall time in milliseconds.
+
+        :type: :obj:`int`
+        """
+
+        return self.end - self.start
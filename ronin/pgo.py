@@ -0,0 +1,133 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# See:
+# https://gcc.gnu.org/onlinedocs/gcc/Instrumentation-Options.html
+# https://gcc.gnu.org/onlinedocs/gcc/Optimize-Options.html#index-fprofile-use
+
+from __future__ import unicode_literals
+from .contexts import new_child_context
+from .ninja import NinjaFile
+from .utils.messages import announce, error
+from .utils.paths import join_path
+from .utils.strings import stringify_list
+from subprocess import check_call, CalledProcessError
+import os, shutil
+
+
+INSTRUMENTED_NAME = 'pgo-instrumented'
+OPTIMIZED_NAME = 'pgo-optimized'
+PROFILES_NAME = 'pgo-profiles'
+
+
+def pgo(projects):
+    """
+    Builds the projects with profile-guided optimization, in three steps:
+
+    1. Builds an instrumented variant into :data:`INSTRUMENTED_NAME` in each project's output path,
+       with the context's ``build.pgo`` set to "generate"
+    2. Trains it by running the project's run commands (see the ``run_output`` and ``run_command``
+       arguments of :class:`~ronin.phases.Phase`), which write profiles into
+       :data:`PROFILES_NAME` in the project's output path
+    3. Builds an optimized variant into :data:`OPTIMIZED_NAME` in the project's output path, with
+       ``build.pgo`` set to "use"; it is always rebuilt from scratch, because Ninja does not know
+       that its objects depend on the new profiles
+
+    Executors that support it (for example :class:`~ronin.gcc.GccCompile`) add the right
+    arguments according to ``build.pgo`` and ``build.pgo_path``.
+
+    The run commands are used only for training, and are not run again afterwards.
+
+    :param projects: projects
+    :type projects: [~ronin.projects.Project]
+    :returns: exit code
+    :rtype: int
+    """
+
+    for project in projects:
+        announce('{}'.format(project))
+        original_output_path = project._output_path
+        output_path = project.output_path
+        profiles_path = join_path(output_path, PROFILES_NAME)
+        instrumented_path = join_path(output_path, INSTRUMENTED_NAME)
+        optimized_path = join_path(output_path, OPTIMIZED_NAME)
+        try:
+            # Instrumented
+            announce('Building instrumented variant')
+            if os.path.isdir(profiles_path):
+                # Profiles of older builds would be merged into the new ones
+                shutil.rmtree(profiles_path)
+            project.run.clear()
+            r = _build(project, instrumented_path, 'generate', profiles_path)
+            if r != 0:
+                error('Build failed with code: {:d}'.format(r))
+                return r
+
+            # Training
+            if not project.run:
+                error('No run commands to train with: set "run_output" on a phase')
+                return 1
+            for _, run in sorted(project.run.items()):
+                run = stringify_list(run)
+                run_string = ' '.join(run)
+                announce("Training: '{}'".format(run_string))
+                try:
+                    check_call(run)
+                except CalledProcessError as ex:
+                    error("'{}' failed with code: {:d}".format(run_string, ex.returncode))
+                    return ex.returncode
+            _relocate_profiles(profiles_path, instrumented_path, optimized_path)
+
+            # Optimized
+            announce('Building optimized variant')
+            r = _clean(project, optimized_path)
+            if r != 0:
+                error('Clean failed with code: {:d}'.format(r))
+                return r
+            r = _build(project, optimized_path, 'use', profiles_path)
+            if r != 0:
+                error('Build failed with code: {:d}'.format(r))
+                return r
+        finally:
+            project.output_path = original_output_path
+            project.run.clear()
+    return 0
+
+
+def _build(project, output_path, mode, profiles_path):
+    project.output_path = output_path
+    with new_child_context() as ctx:
+        ctx.build.pgo = mode
+        ctx.build.pgo_path = profiles_path
+        return NinjaFile(project).build()
+
+
+def _clean(project, output_path):
+    project.output_path = output_path
+    return NinjaFile(project).clean()
+
+
+def _relocate_profiles(profiles_path, instrumented_path, optimized_path):
+    # gcc stores the profile of an object with an absolute path under the profiles path, and
+    # looks for it with the object's path in the optimized build
+    source = join_path(profiles_path, os.path.abspath(instrumented_path))
+    if not os.path.isdir(source):
+        return
+    destination = join_path(profiles_path, os.path.abspath(optimized_path))
+    if os.path.isdir(destination):
+        shutil.rmtree(destination)
+    parent = os.path.dirname(destination)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    shutil.move(source, destination)
@@ -17,13 +17,14 @@
 from __future__ import unicode_literals
 from .executors import Executor
 from .extensions import Extension
+from .pools import Pool
 from .contexts import current_context
-from .utils.types import verify_type, verify_type_or_subclass
+from .utils.types import isclass, verify_type, verify_type_or_subclass
 from .utils.paths import join_path, change_extension
 from .utils.strings import stringify
 from .utils.collections import StrictList, StrictDict
+from .trace import trace_span
 from types import FunctionType
-from inspect import isclass
 import os
 
 
@@ -77,7 +78,8 @@ class Phase(object):
                  rebuild_on=None,
                  rebuild_on_from=None,
                  build_if=None,
-                 build_if_from=None):
+                 build_if_from=None,
+                 pool=None):
         """
         :param project: project to which this phase will be added (if set must also set ``name``)
         :type project: ~ronin.projects.Project
@@ -129,6 +131,10 @@ class Phase(object):
         :param build_if_from: names or instances of other phases in the project, the outputs of
          which we add to this phase's ``build_if``
         :type build_if_from: [:obj:`str` or :obj:`~types.FunctionType` or :class:`Phase`]
+        :param pool: Ninja pool limiting how many of this phase's actions can run in parallel;
+         when not set a pool may be created automatically based on measured memory use (see
+         :mod:`ronin.pools`)
+        :type pool: ~ronin.pools.Pool
         """
         
         if project:
@@ -139,6 +145,8 @@ class Phase(object):
             project.phases[name] = self
         if executor:
             verify_type(executor, Executor)
+        if pool:
+            verify_type(pool, Pool)
         if run_output and (not output):
             raise ValueError('"run_output" cannot be True or non-zero when "output" is None')
         if run_command and (not output):
@@ -165,6 +173,7 @@ class Phase(object):
         self.build_if = StrictList(build_if, value_type=(str, FunctionType))
         self.build_if_from = StrictList(build_if_from, value_type=(str, FunctionType,
                                                                    'ronin.phases.Phase'))
+        self.pool = pool
         self.vars = StrictDict(key_type=str, value_type=(str, FunctionType))
         self.hooks = StrictList(value_type=FunctionType)
 
@@ -202,7 +211,8 @@ class Phase(object):
                 extension.apply_to_executor(self.executor)
                 apply_extensions(extension.extensions)
 
-        apply_extensions(self.extensions)
+        with trace_span('extensions', 'extensions'):
+            apply_extensions(self.extensions)
 
         return self.executor.command_as_str(argument_filter)
 
@@ -310,13 +320,19 @@ class Phase(object):
             if not output_strip_prefix.endswith(os.sep):
                 output_strip_prefix += os.sep
             output_strip_prefix_length = len(output_strip_prefix)
+
+            # Inputs generated into our output path (e.g. unity bundles) keep their place in it
+            generated_prefix = join_path(output_path, '')
+            generated_prefix_length = len(generated_prefix)
     
             outputs = []            
             for the_input in inputs:
                 output = the_input
                 
                 # Strip prefix
-                if output.startswith(output_strip_prefix):
+                if output.startswith(generated_prefix):
+                    output = output[generated_prefix_length:]
+                elif output.startswith(output_strip_prefix):
                     output = output[output_strip_prefix_length:]
 
                 # Filename changes
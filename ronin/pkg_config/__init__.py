@@ -17,6 +17,7 @@ from ..contexts import current_context
 from ..extensions import Extension
 from ..utils.strings import stringify, UNESCAPED_STRING_RE
 from ..utils.platform import which
+from ..trace import trace_span
 from subprocess import check_output, CalledProcessError
 import os
 
@@ -94,7 +95,8 @@ class Package(Extension):
             args.append(stringify(self.name))
      
             try:
-                output = check_output(args).decode().strip()
+                with trace_span(' '.join(args), 'probe'):
+                    output = check_output(args).decode().strip()
                 return UNESCAPED_STRING_RE.split(output)
             except CalledProcessError:
                 raise Exception("failed to run: '{}'".format(' '.join(args)))
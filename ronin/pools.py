@@ -0,0 +1,116 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .utils.platform import host_cpu_count, host_memory
+from .utils.strings import stringify, bool_stringify
+
+
+DEFAULT_MEMORY_FRACTION = 0.8
+
+
+def configure_pools(auto=None, memory=None, memory_fraction=None):
+    """
+    Configures the current context's Ninja pools support.
+
+    :param auto: whether to automatically create pools for phases with measured memory use (see
+     the ``--measure`` command line argument); defaults to True
+    :type auto: bool
+    :param memory: memory in bytes available for builds; defaults to
+     :func:`~ronin.utils.platform.host_memory`
+    :type memory: int
+    :param memory_fraction: fraction of ``memory`` that actions may use together; defaults to 0.8
+    :type memory_fraction: float
+    """
+
+    with current_context(False) as ctx:
+        ctx.pools.auto = auto
+        ctx.pools.memory = memory
+        ctx.pools.memory_fraction = memory_fraction
+
+
+class Pool(object):
+    """
+    A `Ninja pool <https://ninja-build.org/manual.html#ref_pool>`__, which limits how many actions
+    that use it can run in parallel.
+
+    Assign pools to phases via their ``pool`` attribute. Pools are declared in the Ninja file
+    automatically.
+    """
+
+    def __init__(self, name, depth):
+        """
+        :param name: pool name
+        :type name: str or ~types.FunctionType
+        :param depth: maximum number of parallel actions
+        :type depth: int or ~types.FunctionType
+        """
+
+        self.name = name
+        self.depth = depth
+
+
+CONSOLE_POOL = Pool('console', 1)
+"""
+Ninja's built-in pool for actions that need direct access to the console. Its depth is always 1.
+"""
+
+
+def auto_pool_depth(max_rss, jobs=None, shares=1):
+    """
+    Calculates how many actions with the given peak memory use can run in parallel without
+    exceeding the memory available for builds.
+
+    The memory is divided equally between the ``shares`` automatic pools whose actions may run at
+    the same time, so that together they do not exceed it either. Note that actions of phases
+    without measured memory use are not accounted for.
+
+    :param max_rss: peak memory use of a single action in bytes
+    :type max_rss: int
+    :param jobs: number of parallel jobs that Ninja will run; defaults to
+     :func:`~ronin.utils.platform.host_cpu_count`
+    :type jobs: int
+    :param shares: number of automatic pools sharing the memory
+    :type shares: int
+    :returns: pool depth, or None if a pool is not needed because the memory suffices for ``jobs``
+     such actions
+    :rtype: int
+    """
+
+    if jobs is None:
+        jobs = host_cpu_count()
+    with current_context() as ctx:
+        memory = ctx.get('pools.memory')
+        memory_fraction = ctx.get('pools.memory_fraction')
+    memory = int(stringify(memory)) if memory is not None else host_memory()
+    memory_fraction = float(stringify(memory_fraction)) if memory_fraction is not None \
+        else DEFAULT_MEMORY_FRACTION
+    if (not memory) or (not max_rss):
+        return None
+    depth = max(1, int(memory * memory_fraction / shares // max_rss))
+    return depth if depth < jobs else None
+
+
+def auto_pools_enabled():
+    """
+    Whether pools should be created automatically, according to the context's ``pools.auto``.
+
+    :returns: True if enabled
+    :rtype: bool
+    """
+
+    with current_context() as ctx:
+        auto = ctx.get('pools.auto')
+    return True if auto is None else bool_stringify(auto)
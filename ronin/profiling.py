@@ -0,0 +1,202 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The counters are incremented from hot paths (stringify, context lookups), so this module keeps
+# the active profiler in a global rather than in the context. For the same reason it must not
+# import modules that depend on ronin.contexts. Those hot paths do not even import this module
+# unless their "_profiling" flag is set (see _set_profiling).
+
+from __future__ import unicode_literals
+from .utils.messages import announce
+import sys
+
+
+DEFAULT_TOP = 10
+
+STRINGIFY = 'stringify calls'
+CONTEXT_LOOKUPS = 'context lookups'
+SUBPROCESSES = 'subprocesses'
+BYTES_WRITTEN = 'bytes written'
+DIRECTORY_LISTINGS = 'directory listings'
+
+_profiler = None
+
+
+def current_profiler():
+    """
+    The active generation profiler, which is set when the ``--profile-generation`` command line
+    argument is used.
+
+    :returns: profiler or None
+    :rtype: :class:`GenerationProfiler`
+    """
+
+    return _profiler
+
+
+def start_profiler(profile_path=None):
+    """
+    Activates a new generation profiler.
+
+    :param profile_path: if set, will also run :mod:`cProfile` and dump its statistics to this
+     path (readable with :mod:`pstats`)
+    :type profile_path: str
+    :returns: profiler
+    :rtype: :class:`GenerationProfiler`
+    """
+
+    global _profiler
+    _profiler = GenerationProfiler(profile_path)
+    _set_profiling(True)
+    return _profiler
+
+
+def stop_profiler():
+    """
+    Deactivates the generation profiler.
+
+    :returns: the profiler that was active, or None
+    :rtype: :class:`GenerationProfiler`
+    """
+
+    global _profiler
+    profiler = _profiler
+    _profiler = None
+    if profiler is not None:
+        _set_profiling(False)
+        profiler.stop()
+    return profiler
+
+
+def count(name, value=1):
+    """
+    Increments a counter of the active profiler. Does nothing if there is no profiler.
+
+    :param name: counter name
+    :type name: str
+    :param value: increment
+    :type value: int
+    """
+
+    if _profiler is not None:
+        _profiler.counters[name] = _profiler.counters.get(name, 0) + value
+
+
+class GenerationProfiler(object):
+    """
+    Collects timings of generation spans (see :func:`~ronin.trace.trace_span`) and hot-path
+    counters.
+
+    Note that span times are inclusive: for example, writing the rule of a phase includes writing
+    the rules of the phases it depends on.
+    """
+
+    def __init__(self, profile_path=None):
+        """
+        :param profile_path: if set, will also run :mod:`cProfile` and dump its statistics to this
+         path
+        :type profile_path: str
+        """
+
+        self.spans = {}
+        self.counters = {}
+        self.profile_path = profile_path
+        self._profile = None
+        if profile_path is not None:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def add_span(self, name, category, duration, project=None):
+        """
+        Adds a span.
+
+        :param name: span name
+        :type name: str
+        :param category: span category
+        :type category: str
+        :param duration: duration in seconds
+        :type duration: float
+        :param project: project name
+        :type project: str
+        """
+
+        key = (category, name, project)
+        span = self.spans.get(key)
+        if span is None:
+            self.spans[key] = [1, duration]
+        else:
+            span[0] += 1
+            span[1] += duration
+        if category == 'probe':
+            count(SUBPROCESSES)
+
+    def stop(self):
+        """
+        Stops :mod:`cProfile`, if it was running, and dumps its statistics.
+        """
+
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_path)
+            self._profile = None
+
+    def write(self, top=DEFAULT_TOP, f=None):
+        """
+        Writes a report.
+
+        :param top: how many of the slowest spans to list
+        :type top: int
+        :param f: where to write; defaults to stdout
+        :type f: file-like
+        """
+
+        if f is None:
+            f = sys.stdout
+
+        categories = {}
+        for (category, _, _), (calls, duration) in self.spans.items():
+            total = categories.setdefault(category, [0, 0.0])
+            total[0] += calls
+            total[1] += duration
+
+        announce('Generation time per category:')
+        for category, (calls, duration) in sorted(categories.items(), key=lambda v: v[1][1],
+                                                  reverse=True):
+            f.write('  {:<12}  {:>7d}  {:>10}\n'.format(category, calls, _seconds(duration)))
+
+        announce('Slowest spans:')
+        spans = sorted(self.spans.items(), key=lambda v: v[1][1], reverse=True)[:top]
+        for (category, name, project), (calls, duration) in spans:
+            if project is not None:
+                name = '{} ({})'.format(name, project)
+            f.write('  {:>10}  {:>7d}  {}\n'.format(_seconds(duration), calls, name))
+
+        announce('Counters:')
+        for name, value in sorted(self.counters.items()):
+            f.write('  {:<16}  {:>12d}\n'.format(name, value))
+
+        if self.profile_path is not None:
+            announce("Profile statistics written to '{}'".format(self.profile_path))
+
+
+def _set_profiling(profiling):
+    # Imported here, because they depend on ronin.contexts
+    from . import contexts, trace
+    from .utils import strings, paths
+    contexts._profiling = trace._profiling = strings._profiling = paths._profiling = profiling
+
+
+def _seconds(seconds):
+    return '{:.3f}s'.format(seconds)
@@ -56,6 +56,7 @@ class QtMetaObjectCompile(ExecutorWithArguments):
         self.output_type = 'source'
         self.output_extension = 'cpp'
         self.output_prefix = 'moc_'
+        self._compilation_database = True
         self.add_argument_unfiltered('-o$out')
         self.add_argument_unfiltered('$in')
 
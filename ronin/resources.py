@@ -0,0 +1,211 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .launcher_log import LOG_NAME
+from .utils.collections import StrictDict
+from .utils.messages import announce
+from .utils.paths import join_path
+from .utils.types import verify_type
+import sys
+
+
+DEFAULT_TOP = 5
+
+IO_BOUND_UTILIZATION = 0.5
+"""
+Actions that keep the CPU busy for less than this fraction of their wall time are reported as
+waiting on I/O.
+"""
+
+
+def launcher_log_path(project):
+    """
+    Path to the launcher log for a project, which is written when building with the
+    ``--measure`` command line argument.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: path to the launcher log
+    :rtype: str
+    """
+
+    return join_path(project.output_path, LOG_NAME)
+
+
+def phase_resources(records):
+    """
+    Summarizes launcher records per phase.
+
+    :param records: launcher records per output, as returned by
+     :func:`~ronin.launcher_log.read_launcher_log`
+    :type records: {:obj:`str`: :obj:`dict`}
+    :returns: resources per phase name, most CPU time first
+    :rtype: {:obj:`str`: :class:`PhaseResources`}
+    """
+
+    resources = {}
+    for record in records.values():
+        phase_name = record.get('phase') or ''
+        phase_resource = resources.get(phase_name)
+        if phase_resource is None:
+            phase_resource = PhaseResources(phase_name)
+            resources[phase_name] = phase_resource
+        phase_resource.add(record)
+
+    r = StrictDict(key_type=str, value_type=PhaseResources)
+    for phase_resource in sorted(resources.values(), key=lambda v: v.cpu, reverse=True):
+        r[phase_resource.phase_name] = phase_resource
+    return r
+
+
+def write_resources(project, records, top=DEFAULT_TOP, f=None):
+    """
+    Writes a resource use report: totals per phase, the actions with the highest peak memory use,
+    and the actions that mostly waited on I/O.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param records: launcher records per output, as returned by
+     :func:`~ronin.launcher_log.read_launcher_log`
+    :type records: {:obj:`str`: :obj:`dict`}
+    :param top: how many actions to list
+    :type top: int
+    :param f: where to write; defaults to stdout
+    :type f: file-like
+    """
+
+    verify_type(project, 'ronin.projects.Project')
+    if f is None:
+        f = sys.stdout
+
+    if not records:
+        announce('No resource use recorded: build with --measure first')
+        return
+
+    resources = phase_resources(records)
+    announce('Resource use for {:d} actions:'.format(len(records)))
+    width = max(len('phase'), max(len(v) for v in resources.keys()))
+    f.write('  {:<{width}}  {:>7}  {:>10}  {:>10}  {:>6}  {:>10}  {:>10}  {:>10}\n'.format(
+        'phase', 'actions', 'wall', 'cpu', 'cpu%', 'max rss', 'read', 'write', width=width))
+    for phase_resource in resources.values():
+        f.write('  {:<{width}}  {:>7d}  {:>10}  {:>10}  {:>6}  {:>10}  {:>10}  {:>10}\n'.format(
+            phase_resource.phase_name, phase_resource.count, _seconds(phase_resource.wall),
+            _seconds(phase_resource.cpu), _percent(phase_resource.utilization),
+            _bytes(phase_resource.max_rss), _bytes(phase_resource.read_bytes),
+            _bytes(phase_resource.write_bytes), width=width))
+
+    by_rss = sorted((v for v in records.values() if v.get('max_rss')),
+                    key=lambda v: v['max_rss'], reverse=True)[:top]
+    if by_rss:
+        announce('Highest peak memory:')
+        for record in by_rss:
+            f.write('  {:>10}  {}\n'.format(_bytes(record['max_rss']), record.get('output')))
+
+    io_bound = [v for v in records.values()
+                if (_utilization(v) is not None) and (_utilization(v) < IO_BOUND_UTILIZATION)]
+    io_bound = sorted(io_bound, key=lambda v: v['wall'], reverse=True)[:top]
+    if io_bound:
+        announce('Waiting on I/O (CPU busy for less than {:.0f}% of wall time):'.format(
+            IO_BOUND_UTILIZATION * 100))
+        for record in io_bound:
+            f.write('  {:>10}  {:>6}  {:>10}  {:>10}  {}\n'.format(
+                _seconds(record['wall']), _percent(_utilization(record)),
+                _bytes(record.get('read_bytes')), _bytes(record.get('write_bytes')),
+                record.get('output')))
+
+
+class PhaseResources(object):
+    """
+    Resource use summary for a phase.
+
+    Times are in milliseconds and sizes are in bytes.
+
+    :ivar phase_name: phase name
+    :vartype phase_name: str
+    :ivar count: number of actions
+    :vartype count: int
+    :ivar wall: total wall time
+    :vartype wall: int
+    :ivar cpu: total CPU time (user and system)
+    :vartype cpu: int
+    :ivar max_rss: highest peak memory use of a single action
+    :vartype max_rss: int
+    :ivar read_bytes: total bytes read, or None if unknown
+    :vartype read_bytes: int
+    :ivar write_bytes: total bytes written, or None if unknown
+    :vartype write_bytes: int
+    """
+
+    def __init__(self, phase_name):
+        self.phase_name = phase_name
+        self.count = 0
+        self.wall = 0
+        self.cpu = 0
+        self.max_rss = 0
+        self.read_bytes = None
+        self.write_bytes = None
+
+    @property
+    def utilization(self):
+        """
+        CPU time as a fraction of wall time. Values much lower than 1 mean that actions mostly
+        waited (usually on I/O), while values higher than 1 mean that actions were multithreaded.
+
+        :type: :obj:`float`
+        """
+
+        return float(self.cpu) / self.wall if self.wall else None
+
+    def add(self, record):
+        self.count += 1
+        self.wall += record.get('wall') or 0
+        self.cpu += (record.get('user') or 0) + (record.get('sys') or 0)
+        max_rss = record.get('max_rss') or 0
+        if max_rss > self.max_rss:
+            self.max_rss = max_rss
+        read_bytes = record.get('read_bytes')
+        if read_bytes is not None:
+            self.read_bytes = (self.read_bytes or 0) + read_bytes
+        write_bytes = record.get('write_bytes')
+        if write_bytes is not None:
+            self.write_bytes = (self.write_bytes or 0) + write_bytes
+
+
+def _utilization(record):
+    wall = record.get('wall')
+    if not wall:
+        return None
+    return float((record.get('user') or 0) + (record.get('sys') or 0)) / wall
+
+
+def _seconds(milliseconds):
+    return '{:.3f}s'.format(milliseconds / 1000.0)
+
+
+def _percent(fraction):
+    if fraction is None:
+        return '-'
+    return '{:.0f}%'.format(fraction * 100)
+
+
+def _bytes(size):
+    if size is None:
+        return '-'
+    if size < 1024:
+        return '{:d}B'.format(size)
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024.0
+        if (size < 1024) or (unit == 'GiB'):
+            return '{:.1f}{}'.format(size, unit)
@@ -15,9 +15,10 @@
 from __future__ import unicode_literals
 from ..executors import ExecutorWithArguments
 from ..contexts import current_context
-from ..utils.platform import which
+from ..compiler_cache import compiler_cache_base_path
+from ..utils.platform import which, host_cpu_count
 from ..utils.paths import join_path
-from multiprocessing import cpu_count
+from ..utils.strings import format_later
 
 
 DEFAULT_RUSTC_COMMAND = 'rustc'
@@ -58,11 +59,18 @@ class RustBuild(ExecutorWithArguments):
                                                       DEFAULT_RUSTC_COMMAND))
         self.add_argument_unfiltered('$in')
         self.add_argument_unfiltered('-o', '$out')
+        self._response_file_format = '@{}'
+        self._response_file_content = '$in_newline' # one argument per line
+        self._compiler_launchers = ('sccache',)
         self.hooks.append(_build_debug_hook)
+        self.hooks.append(_remap_path_prefix_hook)
 
     def enable_debug(self):
         self.add_argument('-g')
 
+    def remap_path_prefix(self, old, new='.'):
+        self.add_argument('--remap-path-prefix', format_later('{old}={new}', old=old, new=new))
+
 
 class CargoBuild(ExecutorWithArguments):
     """
@@ -88,8 +96,11 @@ class CargoBuild(ExecutorWithArguments):
                                                       DEFAULT_CARGO_COMMAND))
         self.add_argument('build')
         self.add_argument_unfiltered('--manifest-path', '$in')
+        self._cache = False # Cargo has its own target directory
+        self._compiler_launchers = ('sccache',)
+        self._compiler_launcher_variable = 'RUSTC_WRAPPER'
         if jobs is None:
-            jobs = cpu_count() + 1
+            jobs = host_cpu_count() + 1
         self.jobs(jobs)
         self.hooks.append(_cargo_output_path_hook)
         self.hooks.append(_cargo_debug_hook)
@@ -107,6 +118,12 @@ def _build_debug_hook(executor):
             executor.enable_debug()
 
 
+def _remap_path_prefix_hook(executor):
+    base_path = compiler_cache_base_path()
+    if base_path is not None:
+        executor.remap_path_prefix(base_path)
+
+
 def _cargo_output_path_hook(executor):
     with current_context() as ctx:
         debug = ctx.get('build.debug', False)
@@ -18,6 +18,7 @@ from ..extensions import Extension
 from ..pkg_config import _add_cflags_to_executor, _add_libs_to_executor
 from ..utils.strings import stringify, bool_stringify, UNESCAPED_STRING_RE
 from ..utils.platform import which
+from ..trace import trace_span
 from subprocess import check_output, CalledProcessError
 
 
@@ -98,7 +99,8 @@ class SDL(Extension):
             args.append('--exec-prefix={}'.format(sdl_config_exec_prefix))
         
         try:
-            output = check_output(args).decode().strip()
+            with trace_span(' '.join(args), 'probe'):
+                output = check_output(args).decode().strip()
             return UNESCAPED_STRING_RE.split(output)
         except CalledProcessError:
             raise Exception("failed to run: '{}'".format(' '.join(args)))
@@ -0,0 +1,506 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# See:
+# https://www.jsonrpc.org/specification
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .ninja import NinjaFile
+from .ninja_log import ninja_deps_path, read_ninja_deps
+from .watch import create_watcher, watched_directories, redo_globs, DEFAULT_DEBOUNCE
+from .utils.messages import announce, error, warning
+from .utils.paths import join_path
+from .utils.platform import WhichException
+from .utils.strings import stringify
+from .utils.unicode import to_str
+import sys, os, json, errno, runpy, select, shlex, socket, threading
+
+
+DEFAULT_SOCKET_NAME = '.ronin.sock'
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+# Collects the results of serve while _Server.reload reruns the build script
+_reloaded = None
+
+
+def socket_path():
+    """
+    The context's ``serve.socket`` or :data:`DEFAULT_SOCKET_NAME` in the context's
+    ``paths.output``.
+
+    :returns: socket path
+    :rtype: str
+    """
+
+    with current_context() as ctx:
+        path = stringify(ctx.get('serve.socket'))
+        if path is None:
+            path = join_path(ctx.get('paths.output'), DEFAULT_SOCKET_NAME)
+    return os.path.abspath(path)
+
+
+def serve(projects):
+    """
+    Generates the projects and then answers queries about their build graph over a Unix socket,
+    using JSON-RPC 2.0 with one request per line, until interrupted.
+
+    Methods (see :class:`BuildGraph`):
+
+    * ``projects``: the projects and their phases
+    * ``owner`` (``file``): the actions that use the file as an input or produce it
+    * ``flags`` (``file``): the command lines of the actions that use the file as an input
+    * ``outputs`` (``phase``, optional ``project``): the output files of a phase
+    * ``dependents`` (``file``, optional ``transitive``): the outputs that depend on a file
+    * ``refresh``: check for source changes right now
+
+    The sources are watched as in :func:`~ronin.watch.watch`. If files are added or removed so
+    that the globs in the build script have different results, or if the build script changes,
+    we rerun the build script in this process in order to regenerate, keeping the clients
+    connected (if the script fails we keep the previous graph). Other changes do not affect the
+    graph, except for the dependencies discovered by builds (see :meth:`BuildGraph.dependents`).
+
+    :param projects: projects
+    :type projects: [~ronin.projects.Project]
+    """
+
+    with current_context() as ctx:
+        debounce = ctx.get('watch.debounce')
+    debounce = float(debounce) if debounce is not None else DEFAULT_DEBOUNCE
+    generated = _generate(projects)
+    if _reloaded is not None:
+        # The build script is being rerun by _Server.reload
+        _reloaded.append(generated)
+        return
+    graph, directories, glob_calls = generated
+
+    script = os.path.abspath(sys.argv[0])
+    watcher = create_watcher()
+    directories.add(os.path.dirname(script))
+    watcher.watch(directories)
+    changes = _Changes(watcher, debounce)
+
+    path = socket_path()
+    server = _Server(path, graph, changes, script, directories, glob_calls, watcher)
+    announce("Serving on '{}' (watching {:d} directories with {})".format(path, len(directories),
+                                                                         watcher.name))
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        announce('Stopped serving')
+    finally:
+        server.close()
+        watcher.close()
+
+
+def query(method, params=None, path=None):
+    """
+    Sends a query to a running server.
+
+    :param method: method name
+    :type method: str
+    :param params: parameters
+    :type params: dict
+    :param path: socket path; defaults to :func:`socket_path`
+    :type path: str
+    :returns: result
+    :raises ServerError: if the server returned an error
+    """
+
+    if path is None:
+        path = socket_path()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        request = {'jsonrpc': '2.0', 'id': 1, 'method': method}
+        if params is not None:
+            request['params'] = params
+        client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        client.close()
+    response = json.loads(data.decode('utf-8'))
+    if 'error' in response:
+        raise ServerError(response['error'].get('message'), response['error'].get('code'))
+    return response.get('result')
+
+
+class ServerError(Exception):
+    """
+    Error returned by the server.
+    """
+
+    def __init__(self, message, code=None):
+        super(ServerError, self).__init__(message)
+        self.code = code
+
+
+class BuildGraph(object):
+    """
+    Index of the build actions of generated projects (see :class:`~ronin.ninja.BuildAction`).
+
+    The sources in unity bundles count as inputs of the actions that compile their bundles.
+    """
+
+    def __init__(self, projects):
+        """
+        :param projects: projects (must have been generated)
+        :type projects: [~ronin.projects.Project]
+        """
+
+        self.projects = []
+        self._actions = {}
+        self._consumers = {}
+        self._dependents = {}
+        self._ninja_files = []
+        self._ninja_stamps = None
+        self._ninja_dependents = {}
+        with current_context() as ctx:
+            for project in projects:
+                name = '{}'.format(project)
+                ninja_file = NinjaFile(project)
+                try:
+                    self._ninja_files.append((ninja_file.command, ninja_file.path,
+                                              ninja_deps_path(project)))
+                except WhichException:
+                    # Ninja is only needed for the dependencies discovered by builds
+                    pass
+                actions = ctx.current.project_actions.get(project) or {}
+                dependencies = ctx.current.project_dependencies.get(project) or {}
+                phases = {}
+                for output, action in actions.items():
+                    self._actions[_normalize(output)] = (name, action)
+                    phases.setdefault(action.phase_name, []).append(output)
+                    for input_path in action.inputs + action.members:
+                        self._consumers.setdefault(_normalize(input_path), []).append(
+                            (name, action))
+                for output, paths in dependencies.items():
+                    for dependency in paths:
+                        self._dependents.setdefault(_normalize(dependency), set()).add(output)
+                self.projects.append({
+                    'name': name,
+                    'phases': dict((k, sorted(v)) for k, v in phases.items())})
+
+    def owner(self, file):
+        """
+        :param file: file path
+        :type file: str
+        :returns: the actions that use the file as an input (role "input") or produce it (role
+         "output")
+        :rtype: [dict]
+        """
+
+        path = _normalize(file)
+        owners = [_describe(name, action, role='input')
+                  for name, action in self._consumers.get(path, ())]
+        producer = self._actions.get(path)
+        if producer is not None:
+            owners.append(_describe(producer[0], producer[1], role='output'))
+        return owners
+
+    def flags(self, file):
+        """
+        :param file: file path
+        :type file: str
+        :returns: the command lines (as a string and as arguments) of the actions that use the
+         file as an input
+        :rtype: [dict]
+        """
+
+        flags = []
+        for name, action in self._consumers.get(_normalize(file), ()):
+            command = action.command_line
+            flags.append(_describe(name, action, command=command,
+                                   arguments=shlex.split(to_str(command))))
+        return flags
+
+    def outputs(self, phase, project=None):
+        """
+        :param phase: phase name
+        :type phase: str
+        :param project: project name (either with or without the variant); defaults to all
+        :type project: str
+        :returns: output files
+        :rtype: [str]
+        """
+
+        outputs = []
+        for p in self.projects:
+            if (project is not None) and (project != p['name']) and \
+                not p['name'].startswith(project + ' '):
+                continue
+            outputs += p['phases'].get(phase, [])
+        return outputs
+
+    def dependents(self, file, transitive=False):
+        """
+        :param file: file path
+        :type file: str
+        :param transitive: set to True to include outputs depending on those outputs, etc.
+        :type transitive: bool
+        :returns: outputs that depend on the file, including via dependencies discovered by the
+         last builds (e.g. headers; see :func:`~ronin.ninja_log.read_ninja_deps`)
+        :rtype: [str]
+        """
+
+        ninja_dependents = self._read_ninja_dependents()
+
+        def direct(path):
+            path = _normalize(path)
+            return self._dependents.get(path, set()) | ninja_dependents.get(path, set())
+
+        dependents = direct(file)
+        if transitive:
+            pending = list(dependents)
+            while pending:
+                for output in direct(pending.pop()):
+                    if output not in dependents:
+                        dependents.add(output)
+                        pending.append(output)
+        return sorted(dependents)
+
+    def _read_ninja_dependents(self):
+        # Only when the deps logs changed since the last time
+        stamps = []
+        for _, _, deps_path in self._ninja_files:
+            try:
+                stamps.append(os.path.getmtime(deps_path))
+            except OSError:
+                stamps.append(None)
+        if stamps != self._ninja_stamps:
+            self._ninja_stamps = stamps
+            self._ninja_dependents = {}
+            for command, path, deps_path in self._ninja_files:
+                if not os.path.isfile(deps_path):
+                    continue
+                for output, paths in read_ninja_deps(command, path).items():
+                    for dependency in paths:
+                        self._ninja_dependents.setdefault(_normalize(dependency), set()) \
+                            .add(output)
+        return self._ninja_dependents
+
+
+class _Changes(object):
+    # Collects changes from the watcher in a background thread
+
+    def __init__(self, watcher, debounce):
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._structural = False
+        self.event = threading.Event()
+        thread = threading.Thread(target=self._run, args=(watcher, debounce))
+        thread.daemon = True
+        thread.start()
+
+    def take(self):
+        with self._lock:
+            changed, structural = self._changed, self._structural
+            self._changed = set()
+            self._structural = False
+            self.event.clear()
+        return changed, structural
+
+    def _run(self, watcher, debounce):
+        while True:
+            changed, structural = watcher.wait(debounce)
+            with self._lock:
+                self._changed.update(changed)
+                self._structural = self._structural or structural
+                self.event.set()
+
+
+class _Server(object):
+    def __init__(self, path, graph, changes, script, directories, glob_calls, watcher):
+        self.path = path
+        self.graph = graph
+        self.changes = changes
+        self.script = script
+        self.directories = directories
+        self.glob_calls = glob_calls
+        self.watcher = watcher
+        self.clients = {}
+
+        if os.path.exists(path):
+            # Left over from a previous server that did not exit cleanly
+            os.remove(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen(16)
+
+    def run(self):
+        while True:
+            readable = _select([self.listener] + list(self.clients.keys()), 0.5)
+            self.refresh()
+            for sock in readable:
+                if sock is self.listener:
+                    client, _ = self.listener.accept()
+                    self.clients[client] = b''
+                else:
+                    self.read(sock)
+
+    def refresh(self):
+        if not self.changes.event.is_set():
+            return
+        changed, structural = self.changes.take()
+        if self.script in changed:
+            self.reload('Build script changed')
+        elif structural:
+            directories = redo_globs(self.glob_calls or ())
+            if directories is None:
+                self.reload('Files added or removed')
+            else:
+                self.watch(directories)
+
+    def reload(self, reason):
+        # The build script runs in its own thread so that its context is not a child of ours
+        global _reloaded
+        announce('{}: regenerating'.format(reason))
+        _reloaded = []
+        try:
+            thread = threading.Thread(target=_run_script, args=(self.script,))
+            thread.start()
+            thread.join()
+            reloaded = _reloaded
+        finally:
+            _reloaded = None
+        if not reloaded:
+            warning('Build script did not serve: keeping the previous build graph')
+            return
+        self.graph, directories, self.glob_calls = reloaded[0]
+        self.watch(directories)
+
+    def watch(self, directories):
+        directories = directories - self.directories
+        if directories:
+            self.directories.update(directories)
+            self.watcher.watch(directories)
+
+    def read(self, client):
+        try:
+            data = client.recv(65536)
+        except socket.error:
+            data = None
+        if not data:
+            self.clients.pop(client, None)
+            client.close()
+            return
+        data = self.clients[client] + data
+        while b'\n' in data:
+            line, data = data.split(b'\n', 1)
+            if line.strip():
+                response = self.handle(line)
+                if response is not None:
+                    try:
+                        client.sendall((json.dumps(response, ensure_ascii=False) + '\n')
+                                       .encode('utf-8'))
+                    except socket.error:
+                        pass
+        self.clients[client] = data
+
+    def handle(self, line):
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError as ex:
+            return _error(None, PARSE_ERROR, to_str(ex))
+        if (not isinstance(request, dict)) or not isinstance(request.get('method'), type('')):
+            return _error(request.get('id') if isinstance(request, dict) else None,
+                          INVALID_REQUEST, 'Invalid request')
+        request_id = request.get('id')
+        method = request['method']
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return _error(request_id, INVALID_PARAMS, 'Params must be an object')
+
+        if method == 'refresh':
+            self.refresh()
+            result = True
+        elif method == 'projects':
+            result = self.graph.projects
+        elif method in ('owner', 'flags', 'outputs', 'dependents'):
+            try:
+                result = getattr(self.graph, method)(**params)
+            except TypeError as ex:
+                return _error(request_id, INVALID_PARAMS, to_str(ex))
+        else:
+            return _error(request_id, METHOD_NOT_FOUND, "Unknown method: '{}'".format(method))
+
+        if 'id' not in request:
+            # Notification
+            return None
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.clients = {}
+        self.listener.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _generate(projects):
+    # The build graph, the directories to watch and the glob calls
+    with current_context() as ctx:
+        output_path = stringify(ctx.get('paths.output'))
+        glob_calls = ctx.get('current.glob_calls')
+    for project in projects:
+        announce('{}'.format(project))
+        NinjaFile(project).generate()
+    return BuildGraph(projects), watched_directories(projects, output_path), glob_calls
+
+
+def _run_script(script):
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit:
+        # The CLI exits when done (or reports the error and exits)
+        pass
+    except Exception as ex:
+        error(ex)
+
+
+def _describe(project_name, action, **kwargs):
+    description = {
+        'project': project_name,
+        'phase': action.phase_name,
+        'output': action.output,
+        'inputs': action.inputs}
+    description.update(kwargs)
+    return description
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def _select(sockets, timeout):
+    try:
+        return select.select(sockets, [], [], timeout)[0]
+    except (OSError, select.error) as ex:
+        if ex.args[0] == errno.EINTR:
+            return []
+        raise
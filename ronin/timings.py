@@ -0,0 +1,174 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .utils.collections import StrictDict
+from .utils.messages import announce
+from .utils.types import verify_type
+from .utils.unicode import to_str
+import sys, json, heapq
+
+
+DEFAULT_SLOWEST = 5
+
+
+def output_phases(project):
+    """
+    Maps outputs back to the names of the phases that produce them, using the outputs stored in
+    the context when the project's Ninja file was last written.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :returns: phase name per output path
+    :rtype: {:obj:`str`: :obj:`str`}
+    """
+
+    with current_context() as ctx:
+        project_outputs = ctx.get('current.project_outputs')
+    phases = {}
+    if project_outputs is None:
+        return phases
+    phase_outputs = project_outputs.get(project)
+    if phase_outputs is None:
+        return phases
+    for phase_name, outputs in phase_outputs.items():
+        for output in outputs:
+            phases[output.file] = phase_name
+    return phases
+
+
+def phase_timings(project, entries, slowest=DEFAULT_SLOWEST):
+    """
+    Summarizes Ninja log entries per phase. Entries for outputs that do not belong to any of the
+    project's phases are ignored.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param entries: Ninja log entries
+    :type entries: [:class:`~ronin.ninja_log.NinjaLogEntry`]
+    :param slowest: how many of the slowest outputs to keep per phase
+    :type slowest: int
+    :returns: timings per phase name, slowest phases (by total time) first
+    :rtype: {:obj:`str`: :class:`PhaseTimings`}
+    """
+
+    phases = output_phases(project)
+    timings = {}
+    for entry in entries:
+        phase_name = phases.get(entry.output)
+        if phase_name is None:
+            continue
+        phase_timing = timings.get(phase_name)
+        if phase_timing is None:
+            phase_timing = PhaseTimings(phase_name)
+            timings[phase_name] = phase_timing
+        phase_timing.add(entry)
+
+    r = StrictDict(key_type=str, value_type=PhaseTimings)
+    for phase_timing in sorted(timings.values(), key=lambda v: v.total, reverse=True):
+        phase_timing.slowest = heapq.nlargest(slowest, phase_timing.slowest,
+                                              key=lambda v: v.duration)
+        r[phase_timing.phase_name] = phase_timing
+    return r
+
+
+def write_timings(project, timings, json_format=False, f=None):
+    """
+    Writes a timings report.
+
+    :param project: project
+    :type project: ~ronin.projects.Project
+    :param timings: timings per phase name, as returned by :func:`phase_timings`
+    :type timings: {:obj:`str`: :class:`PhaseTimings`}
+    :param json_format: set to True to write JSON instead of human-readable text
+    :type json_format: bool
+    :param f: where to write; defaults to stdout
+    :type f: file-like
+    """
+
+    verify_type(project, 'ronin.projects.Project')
+    if f is None:
+        f = sys.stdout
+
+    if json_format:
+        report = {
+            'project': to_str(project),
+            'phases': [v.as_dict() for v in timings.values()]}
+        f.write(json.dumps(report, indent=2))
+        f.write('\n')
+        return
+
+    if not timings:
+        announce('No actions were run')
+        return
+    announce('Timings for {:d} actions:'.format(sum(v.count for v in timings.values())))
+    width = max(len('phase'), max(len(v) for v in timings.keys()))
+    f.write('  {:<{width}}  {:>8}  {:>10}  {:>10}\n'.format('phase', 'actions', 'total', 'max',
+                                                           width=width))
+    for phase_timing in timings.values():
+        f.write('  {:<{width}}  {:>8d}  {:>10}  {:>10}\n'.format(
+            phase_timing.phase_name, phase_timing.count, _seconds(phase_timing.total),
+            _seconds(phase_timing.max), width=width))
+        for entry in phase_timing.slowest:
+            f.write('      {:>10}  {}\n'.format(_seconds(entry.duration), entry.output))
+
+
+class PhaseTimings(object):
+    """
+    Timings summary for a phase.
+
+    All times are in milliseconds.
+
+    :ivar phase_name: phase name
+    :vartype phase_name: str
+    :ivar count: number of actions
+    :vartype count: int
+    :ivar total: total wall time of all actions
+    :vartype total: int
+    :ivar max: wall time of the slowest action
+    :vartype max: int
+    :ivar slowest: entries for the slowest actions, slowest first (all entries, unsorted, until
+     :func:`phase_timings` is done)
+    :vartype slowest: [:class:`~ronin.ninja_log.NinjaLogEntry`]
+    """
+
+    def __init__(self, phase_name):
+        self.phase_name = phase_name
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.slowest = []
+
+    def add(self, entry):
+        duration = entry.duration
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        # Sorted once all entries are added (see phase_timings)
+        self.slowest.append(entry)
+
+    def as_dict(self):
+        return {
+            'phase': self.phase_name,
+            'actions': self.count,
+            'total': self.total / 1000.0,
+            'max': self.max / 1000.0,
+            'slowest': [{'output': v.output, 'duration': v.duration / 1000.0}
+                        for v in self.slowest]}
+
+
+def _seconds(milliseconds):
+    return '{:.3f}s'.format(milliseconds / 1000.0)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from contextlib import contextmanager
+import os, io, json, time
+
+
+# See:
+# https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+
+GENERATION_PROCESS_ID = 1
+BUILD_PROCESS_ID = 2
+
+_profiling = False # set by ronin.profiling
+
+
+def current_tracer():
+    """
+    The context's ``current.tracer``, which is set when the ``--trace`` command line argument is
+    used.
+
+    :returns: tracer or None
+    :rtype: :class:`Tracer`
+    """
+
+    with current_context() as ctx:
+        return ctx.get('current.tracer')
+
+
+@contextmanager
+def trace_span(name, category='generation', **args):
+    """
+    Records the enclosed code as a span in the current tracer and generation profiler. Does
+    nothing if there is neither.
+
+    :param name: span name
+    :type name: str
+    :param category: span category
+    :type category: str
+    :param args: extra values to show for the span
+    """
+
+    tracer = current_tracer()
+    profiler = None
+    if _profiling:
+        from .profiling import current_profiler
+        profiler = current_profiler()
+    if (tracer is None) and (profiler is None):
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        end = time.time()
+        if tracer is not None:
+            tracer.span(name, category, tracer.timestamp(start), tracer.timestamp(end), args)
+        if profiler is not None:
+            profiler.add_span(name, category, end - start, args.get('project'))
+
+
+class Tracer(object):
+    """
+    Collects spans for a `Chrome trace <https://ui.perfetto.dev/>`__.
+
+    Generation spans go on a single track. Ninja actions go on per-thread tracks of their own
+    process, because Ninja does not tell us which of its jobs ran an action, so we assign each
+    action to the first track that is free at the time it started.
+
+    All times are in microseconds since the tracer was created.
+    """
+
+    def __init__(self, origin=None):
+        """
+        :param origin: time (from :func:`time.time`) that counts as the start of the trace;
+         defaults to now
+        :type origin: float
+        """
+
+        self.origin = origin if origin is not None else time.time()
+        self.events = []
+        self._build_tracks = []
+        self._metadata(GENERATION_PROCESS_ID, None, 'process_name', 'rōnin')
+        self._metadata(GENERATION_PROCESS_ID, 1, 'thread_name', 'generation')
+        self._metadata(BUILD_PROCESS_ID, None, 'process_name', 'ninja')
+
+    def now(self):
+        """
+        Current time.
+
+        :returns: microseconds since the start of the trace
+        :rtype: int
+        """
+
+        return self.timestamp(time.time())
+
+    def timestamp(self, t):
+        """
+        Converts a time to trace time.
+
+        :param t: time (from :func:`time.time`)
+        :type t: float
+        :returns: microseconds since the start of the trace
+        :rtype: int
+        """
+
+        return int((t - self.origin) * 1000000)
+
+    def span(self, name, category, start, end, args=None):
+        """
+        Adds a generation span.
+
+        :param name: span name
+        :type name: str
+        :param category: span category
+        :type category: str
+        :param start: start time in microseconds
+        :type start: int
+        :param end: end time in microseconds
+        :type end: int
+        :param args: extra values to show for the span
+        :type args: dict
+        """
+
+        self._complete(name, category, start, end, GENERATION_PROCESS_ID, 1, args)
+
+    def add_ninja_entries(self, entries, ninja_start, phases=None):
+        """
+        Adds Ninja actions.
+
+        :param entries: Ninja log entries from a single Ninja run
+        :type entries: [:class:`~ronin.ninja_log.NinjaLogEntry`]
+        :param ninja_start: time (from :func:`time.time`) at which the Ninja run started
+        :type ninja_start: float
+        :param phases: phase name per output path
+        :type phases: {:obj:`str`: :obj:`str`}
+        """
+
+        base = self.timestamp(ninja_start)
+        for entry in sorted(entries, key=lambda v: (v.start, v.end)):
+            start = base + entry.start * 1000
+            end = base + entry.end * 1000
+            phase_name = phases.get(entry.output) if phases else None
+            self._complete(os.path.basename(entry.output), phase_name or 'ninja', start, end,
+                           BUILD_PROCESS_ID, self._build_track(start, end),
+                           {'output': entry.output, 'phase': phase_name})
+
+    def write(self, path):
+        """
+        Writes the trace as JSON.
+
+        :param path: path to the trace file
+        :type path: str
+        """
+
+        trace = {'traceEvents': self.events, 'displayTimeUnit': 'ms'}
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(trace, ensure_ascii=False))
+
+    def _build_track(self, start, end):
+        for index, track_end in enumerate(self._build_tracks):
+            if track_end <= start:
+                self._build_tracks[index] = end
+                return index + 1
+        self._build_tracks.append(end)
+        tid = len(self._build_tracks)
+        self._metadata(BUILD_PROCESS_ID, tid, 'thread_name', 'job {:d}'.format(tid))
+        return tid
+
+    def _complete(self, name, category, start, end, pid, tid, args):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start,
+            'dur': max(0, end - start),
+            'pid': pid,
+            'tid': tid}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def _metadata(self, pid, tid, name, value):
+        event = {
+            'name': name,
+            'ph': 'M',
+            'pid': pid,
+            'args': {'name': value}}
+        if tid is not None:
+            event['tid'] = tid
+        self.events.append(event)
@@ -41,10 +41,9 @@
 
 from __future__ import unicode_literals
 from __future__ import absolute_import # so we can import 'collections'
-from .types import type_name, import_symbol
+from .types import isclass, type_name, import_symbol
 from .unicode import string
 from collections import OrderedDict
-from inspect import isclass
 
 
 def dedup(values):
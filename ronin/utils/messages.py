@@ -16,18 +16,45 @@
 
 from __future__ import unicode_literals
 from .unicode import to_str
-from blessings import Terminal
-import colorama, atexit
+import atexit
 
 
-colorama.init()
+_terminal = None
+
+def get_terminal():
+    """
+    The terminal, created when first needed: importing and initializing colorama and blessings is
+    relatively slow, and many runs never write a message.
+
+    :returns: terminal
+    :rtype: :class:`blessings.Terminal`
+    """
+
+    global _terminal
+    if _terminal is None:
+        from blessings import Terminal
+        import colorama
+        colorama.init()
+        atexit.register(_restore_terminal)
+        _terminal = Terminal()
+    return _terminal
+
 
 def _restore_terminal():
+    import colorama
     colorama.deinit()
-    
-atexit.register(_restore_terminal)
 
-terminal = Terminal()
+
+class _LazyTerminal(object):
+    def __getattr__(self, name):
+        return getattr(get_terminal(), name)
+
+
+terminal = _LazyTerminal()
+"""
+The terminal (see :func:`get_terminal`), which is created when one of its attributes is first
+used.
+"""
 
 
 def announce(message, prefix='rōnin', color='green'):
@@ -41,7 +68,7 @@ def announce(message, prefix='rōnin', color='green'):
     """
     
     if color:
-        prefix = getattr(terminal, color)(prefix)
+        prefix = getattr(get_terminal(), color)(prefix)
     print('{}: {}'.format(prefix, message))
 
 
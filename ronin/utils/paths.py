@@ -13,10 +13,32 @@
 # limitations under the License.
 
 from __future__ import unicode_literals
-from .strings import stringify, stringify_list
+from .strings import stringify, stringify_list, bool_stringify
 from ..contexts import current_context
-from glob2 import glob as glob2
-import os
+import os, io, re, json, time
+
+try:
+    from os import scandir as _scandir
+except ImportError:
+    try:
+        from scandir import scandir as _scandir # Python 2 backport
+    except ImportError:
+        _scandir = None
+
+
+DEFAULT_GLOB_EXCLUDES = ('.git/', '.hg/', '.svn/', 'node_modules/')
+
+GLOB_CACHE_NAME = '.ronin_glob_cache'
+
+GLOB_CACHE_RACY_SECONDS = 2.0
+"""
+Listings of directories modified more recently than this are not cached, because a change within
+the same mtime tick would go unnoticed.
+"""
+
+_GLOB_CACHE_VERSION = 1
+
+_profiling = False # set by ronin.profiling
 
 
 def join_path(*segments):
@@ -85,19 +107,25 @@ def input_path(*segments):
         return join_path(ctx.get('paths.input'), *segments)
 
 
-def glob(pattern, path=None, hidden=False, dirs=False):
+def glob(pattern, path=None, hidden=False, dirs=False, excludes=None):
     """
-    Returns a list of real path strings matching the pattern. If ``path`` is not specified,
-    the pattern is implicitly joined to the context's ``paths.input``.
-    
-    Use "?" to match a single character, "\*" to match zero or more characters, and "\*\*" to match
-    zero or more path segments.
+    Returns a list of path strings matching the pattern (or patterns), sorted. If ``path`` is not
+    specified, the pattern is implicitly joined to the context's ``paths.input``.
     
-    Note that this implementation improves on Python's standard :func:`glob.glob` by supporting
-    "\*\*" correctly.
+    Use "?" to match a single character, "\*" to match zero or more characters, "[...]" to match
+    a character set, and "\*\*" to match zero or more path segments.
+
+    Several patterns are matched in a single walk of the directory tree. Directories that cannot
+    match are never listed, and neither are directories matching ``excludes`` or the context's
+    ``paths.output`` (our own build output). Directory listings are cached across runs (see
+    :class:`GlobCache`).
+
+    Excludes are ".gitignore"-style: a rule without a "/" (other than a trailing one) matches the
+    name at any depth, a rule with a leading or inner "/" is relative to ``path``, a trailing "/"
+    matches only directories, and a leading "!" re-includes what a previous rule excluded.
     
-    :param pattern: pattern; calls :func:`ronin.utils.strings.stringify` on it
-    :type pattern: str|FunctionType
+    :param pattern: pattern or patterns; calls :func:`ronin.utils.strings.stringify` on them
+    :type pattern: str|FunctionType|[str|FunctionType]
     :param path: join the pattern to this path (when None, defaults to the context's
      ``paths.input``); calls :func:`ronin.utils.strings.stringify` on it
     :type path: str|FunctionType
@@ -105,16 +133,29 @@ def glob(pattern, path=None, hidden=False, dirs=False):
     :type hidden: bool
     :param dirs: set to True to include directories
     :type dirs: bool
+    :param excludes: exclude rules (when None, defaults to the context's ``paths.glob_excludes``,
+     which defaults to :data:`DEFAULT_GLOB_EXCLUDES`); calls
+     :func:`ronin.utils.strings.stringify` on each
+    :type excludes: [str|FunctionType]
     :returns: zero or more full paths to files (and optionally directories) matching the pattern
     :rtype: [str]
     """
 
-    if path is None:
-        with current_context() as ctx:
+    with current_context() as ctx:
+        if path is None:
             path = ctx.get('paths.input')
-    paths = glob2(join_path(path, pattern), include_hidden=hidden)
-    if not dirs:
-        paths = [v for v in paths if not os.path.isdir(v)]
+        if excludes is None:
+            excludes = ctx.get('paths.glob_excludes', DEFAULT_GLOB_EXCLUDES)
+        output_path = ctx.get('paths.output')
+        glob_calls = ctx.get('current.glob_calls')
+
+    patterns = pattern if isinstance(pattern, (list, tuple)) else [pattern]
+    call = _GlobCall(stringify_list(patterns), stringify(path), hidden, dirs,
+                     stringify_list(excludes or ()), stringify(output_path))
+    paths = call.run()
+    if glob_calls is not None:
+        # Recorded for the "watch" operation
+        glob_calls.append(call)
     return paths
 
 
@@ -141,3 +182,326 @@ def change_extension(path, new_extension):
     if dot != -1:
         path = path[:dot]
     return '{}.{}'.format(path, new_extension)
+
+
+def glob_cache():
+    """
+    The :class:`GlobCache` in the context's ``paths.output``, created when first used. The caches
+    are kept in the context's ``current.glob_caches`` and saved when the CLI exits.
+
+    :returns: glob cache, or None if the context's ``paths.glob_cache`` is false or the context was
+     not configured (see :func:`~ronin.contexts.configure_context`)
+    :rtype: :class:`GlobCache`
+    """
+
+    with current_context() as ctx:
+        if not bool_stringify(ctx.get('paths.glob_cache', True)):
+            return None
+        glob_caches = ctx.get('current.glob_caches')
+        output_path = ctx.get('paths.output')
+    if (glob_caches is None) or (output_path is None):
+        return None
+    path = join_path(stringify(output_path), GLOB_CACHE_NAME)
+    cache = glob_caches.get(path)
+    if cache is None:
+        cache = GlobCache(path)
+        glob_caches[path] = cache
+    return cache
+
+
+class GlobCache(object):
+    """
+    Directory listings used by :func:`glob`, persisted between runs. A cached listing is reused as
+    long as the directory's mtime and inode have not changed, so unchanged trees cost a single
+    ``stat`` per directory.
+
+    See :func:`glob_cache`.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: cache file path
+        :type path: str
+        """
+
+        self.path = path
+        self._directories = None
+        self._used = {}
+        self._changed = False
+
+    def list_directory(self, directory):
+        """
+        Lists a directory, from the cache if it is still valid.
+
+        :param directory: directory path
+        :type directory: str
+        :returns: (name, is directory) tuples
+        :rtype: [(str, bool)]
+        """
+
+        if self._directories is None:
+            self._directories = self._load()
+        try:
+            st = os.stat(directory)
+        except OSError:
+            return []
+        mtime = getattr(st, 'st_mtime_ns', None)
+        if mtime is None:
+            # Python 2
+            mtime = int(st.st_mtime * 1000000000)
+
+        entry = self._directories.get(directory)
+        if (entry is None) or (entry[0] != mtime) or (entry[1] != st.st_ino):
+            entries = _list_directory(directory)
+            if time.time() - st.st_mtime > GLOB_CACHE_RACY_SECONDS:
+                entry = [mtime, st.st_ino, entries]
+            else:
+                entry = None
+            self._changed = True
+        else:
+            entries = entry[2]
+        if entry is not None:
+            self._used[directory] = entry
+        return entries
+
+    def save(self):
+        """
+        Saves the listings used in this run, if any have changed. Listings that were not used are
+        dropped.
+        """
+
+        if (self._directories is None) or \
+            ((not self._changed) and (len(self._used) == len(self._directories))):
+            return
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': _GLOB_CACHE_VERSION, 'directories': self._used},
+                               ensure_ascii=False, separators=(',', ':')))
+
+    def _load(self):
+        try:
+            with io.open(self.path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if cache.get('version') != _GLOB_CACHE_VERSION:
+            return {}
+        return cache.get('directories') or {}
+
+
+_GLOB_MAGIC_RE = re.compile(r'[*?[]')
+
+
+def _glob_segments(pattern):
+    segments = []
+    for segment in re.split(r'[/\\]' if os.sep == '\\' else '/', pattern):
+        if (not segment) or (segment == '.'):
+            continue
+        if (segment == '**') and segments and segments[-1].recursive:
+            continue
+        segments.append(_GlobSegment(segment))
+    return segments
+
+
+def _glob_regex(pattern):
+    # Like fnmatch.translate, but "*" and "?" do not match "/", and "**" (as a whole segment)
+    # matches zero or more segments
+    regex = ''
+    index = 0
+    length = len(pattern)
+    while index < length:
+        c = pattern[index]
+        if pattern.startswith('**/', index):
+            regex += '(?:.*/)?'
+            index += 3
+            continue
+        if pattern.startswith('**', index):
+            regex += '.*'
+            index += 2
+            continue
+        index += 1
+        if c == '*':
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '[':
+            end = index
+            if (end < length) and (pattern[end] == '!'):
+                end += 1
+            if (end < length) and (pattern[end] == ']'):
+                end += 1
+            while (end < length) and (pattern[end] != ']'):
+                end += 1
+            if end >= length:
+                regex += '\\['
+            else:
+                characters = pattern[index:end].replace('\\', '\\\\')
+                index = end + 1
+                if characters.startswith('!'):
+                    characters = '^' + characters[1:]
+                elif characters.startswith('^'):
+                    characters = '\\' + characters
+                regex += '[{}]'.format(characters)
+        else:
+            regex += re.escape(c)
+    return re.compile('(?s)' + regex + '\\Z')
+
+
+class _GlobCall(object):
+    def __init__(self, patterns, path, hidden, dirs, excludes, output_path):
+        self.patterns = [v for v in (_glob_segments(v) for v in patterns) if v]
+        self.path = path
+        self.hidden = hidden
+        self.dirs = dirs
+        self.excludes = [_GlobExclude(v) for v in excludes if v]
+        self.output_path = os.path.normcase(os.path.abspath(output_path)) \
+            if output_path is not None else None
+        self.paths = None
+        self.directories = None
+
+    def run(self):
+        # Can be called again to see if the results have changed
+        cache = glob_cache()
+        walker = _GlobWalker(self.patterns, self.hidden, self.dirs, self.excludes,
+                             self.output_path, cache)
+        walker.walk(self.path, '', set((index, 0) for index in range(len(self.patterns))))
+        self.paths = sorted(walker.paths)
+        self.directories = walker.directories
+        return self.paths
+
+
+class _GlobSegment(object):
+    def __init__(self, segment):
+        self.recursive = segment == '**'
+        self.literal = segment if not _GLOB_MAGIC_RE.search(segment) else None
+        self.regex = _glob_regex(segment) if (self.literal is None) and not self.recursive \
+            else None
+        self.dot = segment.startswith('.')
+
+    def matches(self, name, hidden):
+        if self.literal is not None:
+            return name == self.literal
+        if name.startswith('.') and not (hidden or self.dot):
+            return False
+        if self.recursive:
+            return True
+        return self.regex.match(name) is not None
+
+
+class _GlobExclude(object):
+    def __init__(self, rule):
+        self.negate = rule.startswith('!')
+        if self.negate:
+            rule = rule[1:]
+        self.dirs_only = rule.endswith('/')
+        rule = rule.rstrip('/')
+        # A leading or inner slash anchors the rule to the glob's path
+        self.anchored = '/' in rule
+        self.regex = _glob_regex(rule.lstrip('/'))
+
+    def matches(self, relative_path, name, is_dir):
+        if self.dirs_only and not is_dir:
+            return False
+        return self.regex.match(relative_path if self.anchored else name) is not None
+
+
+class _GlobWalker(object):
+    def __init__(self, patterns, hidden, dirs, excludes, output_path, cache):
+        self.patterns = patterns
+        self.hidden = hidden
+        self.dirs = dirs
+        self.excludes = excludes
+        self.output_path = output_path
+        self.cache = cache
+        self.paths = set()
+        self.directories = set()
+
+    def walk(self, directory, relative_directory, states):
+        # A state is a (pattern index, segment index) tuple; "**" can also match zero segments
+        self.directories.add(directory)
+        expanded = set()
+        pending = list(states)
+        while pending:
+            state = pending.pop()
+            if state in expanded:
+                continue
+            expanded.add(state)
+            segments = self.patterns[state[0]]
+            if segments[state[1]].recursive and (state[1] + 1 < len(segments)):
+                pending.append((state[0], state[1] + 1))
+
+        segments = [(self.patterns[p][i], p, i) for p, i in expanded]
+        if all(v[0].literal is not None for v in segments):
+            # Only literal names: no need to list the directory
+            entries = []
+            for name in set(v[0].literal for v in segments):
+                entry_path = os.path.join(directory, name)
+                if os.path.isdir(entry_path):
+                    entries.append((name, True))
+                elif os.path.exists(entry_path):
+                    entries.append((name, False))
+        elif self.cache is not None:
+            entries = self.cache.list_directory(directory)
+        else:
+            entries = _list_directory(directory)
+
+        for name, is_dir in entries:
+            relative_path = relative_directory + '/' + name if relative_directory else name
+            if self._excluded(relative_path, name, is_dir):
+                continue
+            entry_path = os.path.join(directory, name)
+            if is_dir and (self.output_path is not None) and \
+                (os.path.normcase(os.path.abspath(entry_path)) == self.output_path):
+                continue
+
+            next_states = set()
+            matched = False
+            for segment, p, i in segments:
+                if not segment.matches(name, self.hidden):
+                    continue
+                last = i == len(self.patterns[p]) - 1
+                if segment.recursive:
+                    if last:
+                        matched = True
+                    if is_dir:
+                        next_states.add((p, i))
+                    continue
+                if last:
+                    matched = True
+                elif is_dir:
+                    next_states.add((p, i + 1))
+
+            if matched and (self.dirs or not is_dir):
+                self.paths.add(entry_path)
+            if next_states:
+                self.walk(entry_path, relative_path, next_states)
+
+    def _excluded(self, relative_path, name, is_dir):
+        excluded = False
+        for exclude in self.excludes:
+            if exclude.negate == excluded and exclude.matches(relative_path, name, is_dir):
+                excluded = not exclude.negate
+        return excluded
+
+
+def _list_directory(directory):
+    if _profiling:
+        from ..profiling import count, DIRECTORY_LISTINGS
+        count(DIRECTORY_LISTINGS)
+    try:
+        if _scandir is not None:
+            entries = []
+            for entry in _scandir(directory):
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+            return entries
+        return [(name, os.path.isdir(os.path.join(directory, name)))
+                for name in os.listdir(directory)]
+    except OSError:
+        # Does not exist, is not a directory, or we have no permission
+        return []
@@ -16,8 +16,9 @@ from __future__ import unicode_literals
 from __future__ import absolute_import # so we can import 'platform'
 from .strings import stringify
 from ..contexts import current_context
+from ..trace import trace_span
 from subprocess import check_output, CalledProcessError
-import sys, platform
+import sys, os, io, platform
 
 
 DEFAULT_WHICH_COMMAND = '/usr/bin/which'
@@ -178,6 +179,57 @@ def host_bits():
     return 64 if machine.endswith('64') else 32
 
 
+def host_cpu_count():
+    """
+    The number of CPUs available to this process on the host machine on which we are running.
+
+    Respects the CPU affinity mask where the operating system supports it, as well as the cgroup
+    CPU quota where there is one (for example, when running in a container, in which case the
+    operating system would otherwise report the CPUs of the container's host).
+
+    :returns: CPU count
+    :rtype: integer
+    """
+
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Python 2 or not supported by the operating system
+        from multiprocessing import cpu_count
+        count = cpu_count()
+
+    quota = _cgroup_cpu_quota()
+    if (quota is not None) and (quota < count):
+        count = quota
+
+    return count
+
+
+def host_memory():
+    """
+    The physical memory available to this process on the host machine on which we are running.
+
+    Respects the cgroup memory limit where there is one (for example, when running in a container).
+
+    :returns: memory in bytes or None if unknown
+    :rtype: integer
+    """
+
+    try:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        memory = None
+
+    for path in _CGROUP_MEMORY_LIMIT_PATHS:
+        limit = _read_cgroup_value(path)
+        if limit is not None:
+            if (memory is None) or (limit < memory):
+                memory = limit
+            break
+
+    return memory
+
+
 def which(command, exception=True):
     """
     Finds the absolute path to a command on this host machine.
@@ -201,7 +253,8 @@ def which(command, exception=True):
         with current_context() as ctx:
             which_command = ctx.get('platform.which_command', DEFAULT_WHICH_COMMAND)
             which_command = stringify(which_command)
-        found_command = check_output([which_command, command])
+        with trace_span('which {}'.format(command), 'probe'):
+            found_command = check_output([which_command, command])
         if not found_command:
             if exception:
                 raise WhichException("could not find '{}'".format(command))
@@ -231,3 +284,47 @@ _OPERATING_SYSTEMS_PREFIXES = {
     'os2':    'os2_', # underscore to separate from bits
     'riscos': 'riscos',
     'atheos': 'atheos'}
+
+# cgroup v2 first, then cgroup v1
+_CGROUP_MEMORY_LIMIT_PATHS = (
+    '/sys/fs/cgroup/memory.max',
+    '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+
+
+def _cgroup_cpu_quota():
+    # cgroup v2: "$MAX $PERIOD", where $MAX can be "max"
+    try:
+        with io.open('/sys/fs/cgroup/cpu.max', encoding='utf-8') as f:
+            values = f.read().split()
+        if (len(values) == 2) and (values[0] != 'max'):
+            return _cpus_for_quota(int(values[0]), int(values[1]))
+        return None
+    except (IOError, OSError, ValueError):
+        pass
+
+    # cgroup v1: quota is -1 if there is none
+    quota = _read_cgroup_value('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read_cgroup_value('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if (quota is not None) and (period is not None) and (quota > 0):
+        return _cpus_for_quota(quota, period)
+    return None
+
+
+def _cpus_for_quota(quota, period):
+    if period <= 0:
+        return None
+    return max(1, -(-quota // period)) # round up
+
+
+def _read_cgroup_value(path):
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            value = f.read().strip()
+    except (IOError, OSError):
+        return None
+    if (not value) or (value == 'max'):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
@@ -22,6 +22,8 @@ import re
 
 _ENCODING = 'utf-8'
 
+_profiling = False # set by ronin.profiling
+
 UNESCAPED_STRING_RE = re.compile(r'(?<!\\) ')
 
 
@@ -43,6 +45,9 @@ def stringify(value):
     :rtype: str
     """
     
+    if _profiling:
+        from ..profiling import count, STRINGIFY
+        count(STRINGIFY)
     if value is None:
         return None
     elif hasattr(value, '__call__'):
@@ -14,7 +14,12 @@
 
 from __future__ import unicode_literals
 from .unicode import string, to_str
-from inspect import isclass
+
+try:
+    from types import ClassType as _ClassType # Python 2 old-style classes
+    _CLASS_TYPES = (type, _ClassType)
+except ImportError:
+    _CLASS_TYPES = (type,)
 
 
 def import_symbol(name):
@@ -34,6 +39,20 @@ def import_symbol(name):
     raise ImportError('import not found: {}'.format(name))
 
 
+def isclass(value):
+    """
+    Whether the value is a class. Same as :func:`inspect.isclass`, without the cost of importing
+    :mod:`inspect`.
+
+    :param value: value
+    :type value: object
+    :returns: True if a class
+    :rtype: bool
+    """
+
+    return isinstance(value, _CLASS_TYPES)
+
+
 def type_name(the_type):
     """
     Human-readable name of type(s). Built-in types will avoid the "__builtin__" prefix.
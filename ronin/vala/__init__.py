@@ -17,7 +17,6 @@ from ..executors import ExecutorWithArguments
 from ..extensions import Extension
 from ..contexts import current_context
 from ..phases import Phase
-from ..ninja import pathify
 from ..pkg_config import Package
 from ..gcc import GccCompile
 from ..utils.platform import which
@@ -321,5 +320,6 @@ def _vala_fast_vapis_var(apis):
                 _, api_outputs = api.get_outputs(api_inputs)
                 outputs += api_outputs
         
+        from ..ninja import pathify
         return ' '.join(['--use-fast-vapi={}'.format(pathify(v.file)) for v in outputs])
     return var
@@ -0,0 +1,401 @@
+# Copyright 2016-2018 Tal Liron
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+from .contexts import current_context
+from .ninja import NinjaFile
+from .ninja_log import ninja_deps_path, read_ninja_deps
+from .utils.messages import announce, error, warning
+from .utils.strings import stringify, bool_stringify
+import sys, os, time, errno, select, struct
+
+
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+def watch(projects):
+    """
+    Builds the projects, and then keeps rebuilding them whenever their inputs change, until
+    interrupted.
+
+    Watches the directories of all phase inputs, the directories walked by
+    :func:`~ronin.utils.paths.glob`, and the build script. Changes to file contents just rerun
+    Ninja. Files being added or removed cause the globs to be redone, and if their results change
+    (or if the build script changes) we restart the build script in order to regenerate.
+
+    Uses inotify where available, otherwise polls. Bursts of changes (for example, an editor saving
+    several files) are handled together once they settle for the context's ``watch.debounce``
+    seconds.
+
+    The directories of the dependencies discovered by each build (e.g. headers) are then watched,
+    too (see :func:`discovered_directories`).
+
+    :param projects: projects
+    :type projects: [~ronin.projects.Project]
+    """
+
+    with current_context() as ctx:
+        debounce = ctx.get('watch.debounce')
+        output_path = stringify(ctx.get('paths.output'))
+    debounce = float(debounce) if debounce is not None else DEFAULT_DEBOUNCE
+
+    ninja_files = []
+    for project in projects:
+        announce('{}'.format(project))
+        ninja_file = NinjaFile(project)
+        ninja_file.build()
+        ninja_files.append(ninja_file)
+
+    script = os.path.abspath(sys.argv[0])
+    watcher = create_watcher()
+    directories = watched_directories(projects, output_path)
+    directories.add(os.path.dirname(script))
+    directories.update(discovered_directories(projects, output_path))
+    watcher.watch(directories)
+    announce('Watching {:d} directories ({})'.format(len(directories), watcher.name))
+
+    try:
+        while True:
+            changed, structural = watcher.wait(debounce)
+            if script in changed:
+                restart('Build script changed')
+            if structural:
+                new_directories = redo_globs()
+                if new_directories is None:
+                    restart('Files added or removed')
+                new_directories = new_directories - directories
+                if new_directories:
+                    directories.update(new_directories)
+                    watcher.watch(new_directories)
+            for ninja_file in ninja_files:
+                r = ninja_file.build(generate=False)
+                if r != 0:
+                    error('Build failed with code: {:d}'.format(r))
+                    break
+            new_directories = discovered_directories(projects, output_path) - directories
+            if new_directories:
+                directories.update(new_directories)
+                watcher.watch(new_directories)
+            announce('Watching for changes...')
+    except KeyboardInterrupt:
+        announce('Stopped watching')
+    finally:
+        watcher.close()
+
+
+def create_watcher():
+    """
+    Creates an :class:`InotifyWatcher` if supported, or a :class:`PollingWatcher` if not or if the
+    context's ``watch.poll`` is true.
+
+    :returns: watcher
+    :rtype: :class:`InotifyWatcher` or :class:`PollingWatcher`
+    """
+
+    with current_context() as ctx:
+        poll = bool_stringify(ctx.get('watch.poll', False))
+    watcher = None if poll else InotifyWatcher.create()
+    if watcher is None:
+        watcher = PollingWatcher()
+    return watcher
+
+
+def watched_directories(projects, output_path=None):
+    """
+    The directories containing phase inputs (after generation) and the directories walked by
+    :func:`~ronin.utils.paths.glob`, excluding our output path.
+
+    :param projects: projects
+    :type projects: [~ronin.projects.Project]
+    :param output_path: output path to exclude
+    :type output_path: str
+    :returns: directories
+    :rtype: set
+    """
+
+    directories = set()
+    with current_context() as ctx:
+        for project in projects:
+            dependencies = ctx.current.project_dependencies.get(project) or {}
+            for paths in dependencies.values():
+                for path in paths:
+                    directories.add(os.path.dirname(os.path.abspath(path)))
+        for call in ctx.get('current.glob_calls') or ():
+            directories.update(os.path.abspath(v) for v in call.directories)
+    return _existing_directories(directories, output_path)
+
+
+def discovered_directories(projects, output_path=None):
+    """
+    The directories containing the dependencies discovered by the last builds, such as headers
+    (see :func:`~ronin.ninja_log.read_ninja_deps`), excluding our output path.
+
+    :param projects: projects
+    :type projects: [~ronin.projects.Project]
+    :param output_path: output path to exclude
+    :type output_path: str
+    :returns: directories
+    :rtype: set
+    """
+
+    directories = set()
+    for project in projects:
+        if not os.path.isfile(ninja_deps_path(project)):
+            continue
+        ninja_file = NinjaFile(project)
+        for paths in read_ninja_deps(ninja_file.command, ninja_file.path).values():
+            for path in paths:
+                directories.add(os.path.dirname(path))
+    return _existing_directories(directories, output_path)
+
+
+class InotifyWatcher(object):
+    """
+    Watches directories using Linux's inotify (via :mod:`ctypes`).
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_IGNORED = 0x00008000
+    IN_CLOEXEC = 0o2000000
+
+    CONTENT = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+    STRUCTURE = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | \
+        IN_MOVE_SELF
+
+    _EVENT = struct.Struct('iIII')
+
+    name = 'inotify'
+
+    @staticmethod
+    def create():
+        """
+        :returns: a new watcher, or None if inotify is not supported
+        :rtype: :class:`InotifyWatcher`
+        """
+
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(InotifyWatcher.IN_CLOEXEC)
+        except (ImportError, OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return InotifyWatcher(libc, fd)
+
+    def __init__(self, libc, fd):
+        self._libc = libc
+        self._fd = fd
+        self._directories = {}
+
+    def watch(self, directories):
+        """
+        Adds directories to watch.
+
+        :param directories: directories
+        :type directories: [str]
+        """
+
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(self._fd,
+                                              directory.encode(sys.getfilesystemencoding()),
+                                              self.CONTENT | self.STRUCTURE)
+            if wd < 0:
+                import ctypes
+                code = ctypes.get_errno()
+                if code == errno.ENOSPC:
+                    warning('Reached the inotify watch limit (see '
+                            '/proc/sys/fs/inotify/max_user_watches)')
+                    return
+                continue
+            self._directories[wd] = directory
+
+    def wait(self, debounce):
+        """
+        Waits for changes, and then until they settle.
+
+        :param debounce: seconds without changes before returning
+        :type debounce: float
+        :returns: changed paths and whether files were added or removed
+        :rtype: (set, bool)
+        """
+
+        changed = set()
+        structural = False
+        timeout = None
+        while True:
+            if not _select(self._fd, timeout):
+                if changed or structural:
+                    return changed, structural
+                continue
+            data = os.read(self._fd, 65536)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                directory = self._directories.get(wd)
+                if mask & self.IN_IGNORED:
+                    self._directories.pop(wd, None)
+                if directory is None:
+                    continue
+                if mask & self.STRUCTURE:
+                    structural = True
+                if name:
+                    changed.add(os.path.join(directory,
+                                             name.decode(sys.getfilesystemencoding())))
+            timeout = debounce
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher(object):
+    """
+    Watches directories by periodically checking the modification times of their files.
+    """
+
+    name = 'polling'
+
+    def __init__(self, interval=DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._snapshots = {}
+
+    def watch(self, directories):
+        """
+        Adds directories to watch.
+
+        :param directories: directories
+        :type directories: [str]
+        """
+
+        for directory in directories:
+            self._snapshots[directory] = _snapshot(directory)
+
+    def wait(self, debounce):
+        """
+        Waits for changes, and then until they settle.
+
+        :param debounce: seconds without changes before returning
+        :type debounce: float
+        :returns: changed paths and whether files were added or removed
+        :rtype: (set, bool)
+        """
+
+        changed = set()
+        structural = False
+        while True:
+            time.sleep(self.interval if not changed else max(debounce, self.interval))
+            found = False
+            for directory, snapshot in list(self._snapshots.items()):
+                new_snapshot = _snapshot(directory)
+                if new_snapshot == snapshot:
+                    continue
+                found = True
+                if set(new_snapshot.keys()) != set(snapshot.keys()):
+                    structural = True
+                for name in set(new_snapshot.keys()) | set(snapshot.keys()):
+                    if new_snapshot.get(name) != snapshot.get(name):
+                        changed.add(os.path.join(directory, name))
+                self._snapshots[directory] = new_snapshot
+            if changed and not found:
+                return changed, structural
+
+    def close(self):
+        pass
+
+
+def redo_globs(calls=None):
+    """
+    Redoes the :func:`~ronin.utils.paths.glob` calls made by the build script.
+
+    :param calls: the calls; defaults to those recorded in the context's ``current.glob_calls``
+    :type calls: list
+    :returns: the directories walked, or None if any of the results changed
+    :rtype: set
+    """
+
+    directories = set()
+    if calls is None:
+        with current_context() as ctx:
+            calls = ctx.get('current.glob_calls') or ()
+    for call in calls:
+        paths = call.paths
+        if call.run() != paths:
+            return None
+        directories.update(os.path.abspath(v) for v in call.directories)
+    return directories
+
+
+def restart(reason):
+    """
+    Restarts the build script (with the same arguments) in order to regenerate. Does not return.
+
+    :param reason: message
+    :type reason: str
+    """
+
+    announce('{}: restarting'.format(reason))
+    with current_context() as ctx:
+        glob_caches = ctx.get('current.glob_caches')
+    if glob_caches:
+        for glob_cache in glob_caches.values():
+            glob_cache.save()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+def _existing_directories(directories, output_path):
+    if output_path is not None:
+        output_path = os.path.join(os.path.abspath(output_path), '')
+        directories = set(v for v in directories
+                          if not os.path.join(v, '').startswith(output_path))
+    return set(v for v in directories if os.path.isdir(v))
+
+
+def _select(fd, timeout):
+    while True:
+        try:
+            return bool(select.select([fd], [], [], timeout)[0])
+        except (OSError, select.error) as ex:
+            if ex.args[0] != errno.EINTR:
+                raise
+
+
+def _snapshot(directory):
+    snapshot = {}
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return snapshot
+    for name in names:
+        try:
+            st = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        snapshot[name] = (st.st_mtime, st.st_size)
+    return snapshot
@@ -75,5 +75,4 @@ setup(
     
     install_requires=(
         'blessings>=1.6, <2.0',
-        'colorama>=0.3.9, <2.0.0',
-        'glob2>=0.5, <=2.0'))
+        'colorama>=0.3.9, <2.0.0'))